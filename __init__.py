@@ -214,8 +214,8 @@ if import_succeeded:
 
     if options['preload help images']:
         ImagePreloader.start([
-            ('help'),
-            ('icons'),
+            ('help',),
+            ('icons',),
             ('addon_common', 'common', 'images'),
         ])
 
@@ -20,12 +20,13 @@ Created by Jonathan Denning, Jonathan Williamson
 '''
 
 import math
+from itertools import chain
 
+import numpy as np
 from mathutils import Vector, Matrix
 
 from .blender import matrix_vector_mult
 from .maths import Point, Vec
-from .utils import iter_running_sum
 
 
 def compute_quadratic_weights(t):
@@ -38,6 +39,41 @@ def compute_cubic_weights(t):
     return (t1**3, 3*t0*t1**2, 3*t0**2*t1, t0**3)
 
 
+def compute_cubic_weights_np(ts):
+    ''' returns (n,4) array of cubic weights for array of ts '''
+    t0 = np.asarray(ts, dtype=np.float64)
+    t1 = 1 - t0
+    return np.stack((t1**3, 3*t0*t1**2, 3*t0**2*t1, t0**3), axis=-1)
+
+
+def points_to_np(points):
+    ''' converts sequence of 3D points to (n,3) array '''
+    points = list(points)
+    return np.fromiter(
+        chain.from_iterable((p[0], p[1], p[2]) for p in points),
+        dtype=np.float64, count=3*len(points),
+    ).reshape((-1, 3))
+
+
+def np_to_points(arr):
+    return [Point(p) for p in arr.tolist()]
+
+
+def np_segment_lengths(ps, fn_dist=None):
+    ''' lengths between consecutive rows of ps.  fn_dist (on Points) is used if given '''
+    if fn_dist is None: return np.linalg.norm(ps[1:] - ps[:-1], axis=1)
+    pts = np_to_points(ps)
+    return np.array([fn_dist(p, q) for p, q in zip(pts[:-1], pts[1:])], dtype=np.float64)
+
+
+def np_chord_ts(co):
+    ''' normalized accumulated chord lengths of points co, or None if points do not span any distance '''
+    l_ad = np.concatenate(([0.0], np.cumsum(np_segment_lengths(co))))
+    dist = l_ad[-1]
+    if dist <= 0: return None
+    return l_ad / dist
+
+
 def interpolate_cubic(v0, v1, v2, v3, t):
     b0, b1, b2, b3 = compute_cubic_weights(t)
     return v0*b0 + v1*b1 + v2*b2 + v3*b3
@@ -111,6 +147,21 @@ def fit_cubicbezier(l_v, l_t):
     return (err, v0, v1, v2, v3)
 
 
+def fit_cubicbezier_np(co, ts):
+    '''
+    least squares fit of cubic bezier to all axes of points co ((n,3) array) at parameters ts.
+    returns (err, ctrl), where ctrl is (4,3) array of control points and err is summed over
+    axes (same as summing errors from fit_cubicbezier for each axis)
+    '''
+    B = compute_cubic_weights_np(ts)
+    try:
+        ctrl = np.linalg.solve(B.T @ B, B.T @ co)
+    except np.linalg.LinAlgError:
+        return (float('inf'), np.repeat(co[:1], 4, axis=0))
+    err = float(np.sqrt(((B @ ctrl - co) ** 2).sum(axis=0)).sum())
+    return (err, ctrl)
+
+
 def fit_cubicbezier_spline(
     l_co, error_scale, depth=0,
     t0=0, t3=-1, allow_split=True, force_split=False,
@@ -123,91 +174,71 @@ def fit_cubicbezier_spline(
     where t0 and t3 are the passed-in t0 and t3
     and p0,p1,p2,p3 are the control points of bezier
     '''
-    count = len(l_co)
+    co = l_co if type(l_co) is np.ndarray else points_to_np(l_co)
+    count = len(co)
     if t3 == -1:
         t3 = count-1
     assert count > 2, "Need at least 2 points to fit cubic bezier"
     if count == 2:
         # special case: line
-        p0, p3 = l_co[0], l_co[-1]
+        p0, p3 = co[0], co[-1]
         diff = p3 - p0
-        return [(t0, t3, p0, p0+diff*0.33, p0+diff*0.66, p3)]
+        return [(t0, t3, *np_to_points(np.array([p0, p0+diff*0.33, p0+diff*0.66, p3])))]
     if count == 3:
-        new_co = [
-            l_co[0],
-            Point.average(l_co[:2]),
-            l_co[1],
-            Point.average(l_co[1:]),
-            l_co[2]
-        ]
+        new_co = np.array([
+            co[0],
+            (co[0] + co[1]) / 2,
+            co[1],
+            (co[1] + co[2]) / 2,
+            co[2]
+        ])
         return fit_cubicbezier_spline(
             new_co, error_scale,
             depth=depth,
             t0=t0, t3=t3,
             allow_split=allow_split, force_split=force_split
         )
-    l_d = [0] + [(v0-v1).length for v0, v1 in zip(l_co[:-1], l_co[1:])]
-    l_ad = [s for d, s in iter_running_sum(l_d)]
-    dist = sum(l_d)
-    if dist <= 0:
+    l_t = np_chord_ts(co)
+    if l_t is None:
         # print(spc + 'fit_cubicbezier_spline: returning []')
         return []  # [(t0,t3,l_co[0],l_co[0],l_co[0],l_co[0])]
-    l_t = [ad/dist for ad in l_ad]
 
-    ex, x0, x1, x2, x3 = fit_cubicbezier([co[0] for co in l_co], l_t)
-    ey, y0, y1, y2, y3 = fit_cubicbezier([co[1] for co in l_co], l_t)
-    ez, z0, z1, z2, z3 = fit_cubicbezier([co[2] for co in l_co], l_t)
-    tot_error = ex+ey+ez
+    tot_error, ctrl = fit_cubicbezier_np(co, l_t)
     #print(f'error={tot_error}  max={error_scale}  force={force_split}  allow={allow_split}') #, l=4)
 
     if not force_split:
         do_not_split = tot_error < error_scale
         do_not_split |= depth == max_depth_split
-        do_not_split |= len(l_co) <= min_count_split
+        do_not_split |= count <= min_count_split
         do_not_split |= not allow_split
         if do_not_split:
-            p0, p1 = Point((x0, y0, z0)), Point((x1, y1, z1))
-            p2, p3 = Point((x2, y2, z2)), Point((x3, y3, z3))
-            return [(t0, t3, p0, p1, p2, p3)]
+            return [(t0, t3, *np_to_points(ctrl))]
 
     # too much error in fit.  split sequence in two, and fit each sub-sequence
 
-    # find a good split point
-    ind_split = -1
-    mindot = 1.0
-    for ind in range(5, len(l_co)-5):
-        if l_t[ind] < 0.4:
-            continue
-        if l_t[ind] > 0.6:
-            break
-        # if l_ad[ind] < 0.1: continue
-        # if l_ad[ind] > dist-0.1: break
-
-        v0 = l_co[ind-4]
-        v1 = l_co[ind+0]
-        v2 = l_co[ind+4]
-        d0 = (v1-v0).normalized()
-        d1 = (v2-v1).normalized()
-        dot01 = d0.dot(d1)
-        if ind_split == -1 or dot01 < mindot:
-            ind_split = ind
-            mindot = dot01
-
-    if ind_split == -1:
+    # find a good split point: sharpest turn near middle of sequence
+    # note: l_t is non-decreasing
+    inds = np.arange(5, max(5, count-5))
+    inds = inds[(l_t[inds] >= 0.4) & (l_t[inds] <= 0.6)]
+    if len(inds) == 0:
         # did not find a good splitting point!
-        p0, p1, p2, p3 = Point((x0, y0, z0)), Point(
-            (x1, y1, z1)), Point((x2, y2, z2)), Point((x3, y3, z3))
-        #p0,p3 = Point(l_co[0]),Point(l_co[-1])
-        return [(t0, t3, p0, p1, p2, p3)]
+        return [(t0, t3, *np_to_points(ctrl))]
+
+    def normalized(v):
+        l = np.linalg.norm(v, axis=1)[:,None]
+        return np.divide(v, l, out=np.zeros_like(v), where=(l > 0))
+    d0 = normalized(co[inds] - co[inds-4])
+    d1 = normalized(co[inds+4] - co[inds])
+    ind_split = int(inds[np.argmin((d0 * d1).sum(axis=1))])
 
     #print(spc + 'splitting at %d' % ind_split)
 
-    l_co0, l_co1 = l_co[:ind_split+1], l_co[ind_split:]   # share split point
+    co0, co1 = co[:ind_split+1], co[ind_split:]   # share split point
     tsplit = ind_split  # / (len(l_co)-1)
     bezier0 = fit_cubicbezier_spline(
-        l_co0, error_scale, depth=depth+1, t0=t0, t3=tsplit)
+        co0, error_scale, depth=depth+1, t0=t0, t3=tsplit)
     bezier1 = fit_cubicbezier_spline(
-        l_co1, error_scale, depth=depth+1, t0=tsplit, t3=t3)
+        co1, error_scale, depth=depth+1, t0=tsplit, t3=t3)
     return bezier0 + bezier1
 
 
@@ -235,27 +266,19 @@ class CubicBezier:
             d003, d303 = (p03-p0), (p03-p3)
             p1, p2 = p0+d003*0.5, p3+d303*0.5
             return CubicBezier(p0, p1, p2, p3)
-        l_d = [0] + [(p0-p1).length for p0,
-                     p1 in zip(pts_list[:-1], pts_list[1:])]
-        l_ad = [s for d, s in iter_running_sum(l_d)]
-        dist = sum(l_d)
-        if dist <= 0:
+        co = points_to_np(pts_list)
+        l_t = np_chord_ts(co)
+        if l_t is None:
             p0 = pts_list[0]
             return CubicBezier(p0, p0, p0, p0)
-        l_t = [ad/dist for ad in l_ad]
-
-        ex, x0, x1, x2, x3 = fit_cubicbezier([pt[0] for pt in pts_list], l_t)
-        ey, y0, y1, y2, y3 = fit_cubicbezier([pt[1] for pt in pts_list], l_t)
-        ez, z0, z1, z2, z3 = fit_cubicbezier([pt[2] for pt in pts_list], l_t)
-        p0 = Point((x0, y0, z0))
-        p1 = Point((x1, y1, z1))
-        p2 = Point((x2, y2, z2))
-        p3 = Point((x3, y3, z3))
-        return CubicBezier(p0, p1, p2, p3)
+        _, ctrl = fit_cubicbezier_np(co, l_t)
+        return CubicBezier(*np_to_points(ctrl))
 
     def __init__(self, p0, p1, p2, p3):
         self.p0, self.p1, self.p2, self.p3 = p0, p1, p2, p3
         self.tessellation = []
+        self._tessellation_np = None
+        self._arclength = None
 
     def __iter__(self): return iter([self.p0, self.p1, self.p2, self.p3])
 
@@ -278,6 +301,25 @@ class CubicBezier:
         b0, b1, b2 = compute_quadratic_weights(t)
         return q0*b0 + q1*b1 + q2*b2
 
+    def eval_np(self, ts):
+        ''' evaluates curve at array of ts, returning (n,3) array '''
+        return compute_cubic_weights_np(ts) @ points_to_np(self.points())
+
+    def get_arclength_table(self, split=None, fn_dist=None):
+        '''
+        returns arrays (ts, lengths), where curve is sampled uniformly in t at split+1 points
+        and lengths are accumulated along samples.  table is cached until control points or
+        split change (only when fn_dist is None, i.e., euclidean distance)
+        '''
+        split = split or self.split_default
+        key = (split, tuple(self.p0), tuple(self.p1), tuple(self.p2), tuple(self.p3))
+        if fn_dist is None and self._arclength and self._arclength[0] == key:
+            return self._arclength[1]
+        ts = np.arange(split + 1) / split
+        lengths = np.concatenate(([0.0], np.cumsum(np_segment_lengths(self.eval_np(ts), fn_dist))))
+        if fn_dist is None: self._arclength = (key, (ts, lengths))
+        return (ts, lengths)
+
     def subdivide(self, iters=1):
         if iters == 0:
             return [self]
@@ -331,49 +373,36 @@ class CubicBezier:
         l = self.subdivide_linesegments(fn_dist, max_linearity=max_linearity)
         return sum(fn_dist(cb.p0, cb.p3) for cb in l)
 
-    def approximate_length_uniform(self, fn_dist, split=None):
-        split = split or self.split_default
-        p = self.p0
-        d = 0
-        for i in range(split):
-            q = self.eval((i+1) / split)
-            d += fn_dist(p, q)
-            p = q
-        return d
-
-    def approximate_t_at_interval_uniform(self, interval, fn_dist, split=None):
-        split = split or self.split_default
-        p = self.p0
-        d = 0
-        for i in range(split):
-            percent = (i+1) / split
-            q = self.eval(percent)
-            d += fn_dist(p, q)
-            if interval <= d:
-                return percent
-            p = q
-        return 1
+    def approximate_length_uniform(self, fn_dist=None, split=None):
+        _, lengths = self.get_arclength_table(split, fn_dist)
+        return float(lengths[-1])
+
+    def approximate_t_at_interval_uniform(self, interval, fn_dist=None, split=None):
+        return self.approximate_ts_at_intervals_uniform([interval], fn_dist, split=split)[0]
 
     def approximate_ts_at_intervals_uniform(
-        self, intervals, fn_dist, split=None
+        self, intervals, fn_dist=None, split=None
     ):
-        a = self.approximate_t_at_interval_uniform
-
-        def approx(i): return a(i, fn_dist, split=None)
-        return [approx(interval) for interval in intervals]
+        # t of first sample (after start) where accumulated length reaches interval
+        ts, lengths = self.get_arclength_table(split, fn_dist)
+        inds = np.searchsorted(lengths[1:], np.asarray(intervals, dtype=np.float64), side='left') + 1
+        return [float(ts[i]) if i < len(ts) else 1 for i in inds.tolist()]
 
-    def get_tessellate_uniform(self, fn_dist, split=None):
+    def tessellate_uniform_np(self, fn_dist=None, split=None):
+        ''' returns arrays (ts, points, distances to previous point) of curve sampled uniformly in t '''
         split = split or self.split_default
-        ts = [i/(split-1) for i in range(split)]
-        ps = [self.eval(t) for t in ts]
-        ds = [0] + [fn_dist(p, q) for p, q in zip(ps[:-1], ps[1:])]
-        return [(t, p, d) for t, p, d in zip(ts, ps, ds)]
+        ts = np.arange(split) / (split - 1)
+        ps = self.eval_np(ts)
+        ds = np.concatenate(([0.0], np_segment_lengths(ps, fn_dist)))
+        return (ts, ps, ds)
+
+    def get_tessellate_uniform(self, fn_dist=None, split=None):
+        ts, ps, ds = self.tessellate_uniform_np(fn_dist, split=split)
+        return list(zip(ts.tolist(), np_to_points(ps), ds.tolist()))
 
     def tessellate_uniform_points(self, segments=None):
         segments = segments or self.segments_default
-        ts = [i/(segments-1) for i in range(segments)]
-        ps = [self.eval(t) for t in ts]
-        return ps
+        return np_to_points(self.eval_np(np.arange(segments) / (segments - 1)))
 
     #########################################
     #                                       #
@@ -383,16 +412,16 @@ class CubicBezier:
     #                                       #
     #########################################
 
-    def tessellate_uniform(self, fn_dist, split=None):
-        self.tessellation = self.get_tessellate_uniform(fn_dist, split=split)
+    def tessellate_uniform(self, fn_dist=None, split=None):
+        ts, ps, ds = self._tessellation_np = self.tessellate_uniform_np(fn_dist, split=split)
+        self.tessellation = list(zip(ts.tolist(), np_to_points(ps), ds.tolist()))
 
-    def approximate_t_at_point_tessellation(self, point, fn_dist):
-        bd, bt = None, None
-        for t, q, _ in self.tessellation:
-            d = fn_dist(point, q)
-            if bd is None or d < bd:
-                bd, bt = d, t
-        return bt
+    def approximate_t_at_point_tessellation(self, point, fn_dist=None):
+        if not self.tessellation: return None
+        ts, ps, _ = self._tessellation_np
+        if fn_dist is None: ds = np.linalg.norm(ps - points_to_np([point]), axis=1)
+        else: ds = [fn_dist(point, q) for (_, q, _) in self.tessellation]
+        return float(ts[np.argmin(ds)])
 
     def approximate_totlength_tessellation(self):
         return sum(self.approximate_lengths_tessellation())
@@ -427,6 +456,7 @@ class CubicBezierSpline:
         self.cbs = cbs
         self.inds = inds
         self.tessellation = []
+        self._tessellation_np = None
 
     def copy(self):
         return CubicBezierSpline(
@@ -491,17 +521,17 @@ class CubicBezierSpline:
             t = t - idx
         return self.cbs[idx].eval_derivative(t)
 
-    def approximate_totlength_uniform(self, fn_dist, split=None):
+    def approximate_totlength_uniform(self, fn_dist=None, split=None):
         return sum(self.approximate_lengths_uniform(fn_dist, split=split))
 
-    def approximate_lengths_uniform(self, fn_dist, split=None):
+    def approximate_lengths_uniform(self, fn_dist=None, split=None):
         return [
             cb.approximate_length_uniform(fn_dist, split=split)
             for cb in self.cbs
         ]
 
     def approximate_ts_at_intervals_uniform(
-        self, intervals, fn_dist, split=None
+        self, intervals, fn_dist=None, split=None
     ):
         lengths = self.approximate_lengths_uniform(fn_dist, split=split)
         totlength = sum(lengths)
@@ -540,11 +570,19 @@ class CubicBezierSpline:
     #                                       #
     #########################################
 
-    def tessellate_uniform(self, fn_dist, split=None):
+    def tessellate_uniform(self, fn_dist=None, split=None):
         self.tessellation.clear()
+        l_ts, l_ps, l_ds = [], [], []
         for i, cb in enumerate(self.cbs):
-            cb_tess = cb.get_tessellate_uniform(fn_dist, split=split)
-            self.tessellation.append(cb_tess)
+            ts, ps, ds = cb.tessellate_uniform_np(fn_dist, split=split)
+            self.tessellation.append(list(zip(ts.tolist(), np_to_points(ps), ds.tolist())))
+            l_ts.append(i + ts)
+            l_ps.append(ps)
+            l_ds.append(ds)
+        if self.cbs:
+            self._tessellation_np = (np.concatenate(l_ts), np.concatenate(l_ps), np.concatenate(l_ds))
+        else:
+            self._tessellation_np = (np.zeros(0), np.zeros((0, 3)), np.zeros(0))
 
     def approximate_totlength_tessellation(self):
         return sum(self.approximate_lengths_tessellation())
@@ -553,54 +591,32 @@ class CubicBezierSpline:
         return [sum(d for _, _, d in cb_tess) for cb_tess in self.tessellation]
 
     def approximate_ts_at_intervals_tessellation(self, intervals):
-        lengths = self.approximate_lengths_tessellation()
-        totlength = sum(lengths)
-        ts = []
-        for interval in intervals:
-            if interval < 0:
-                ts.append(0)
-                continue
-            if interval >= totlength:
-                ts.append(len(self.cbs))
-                continue
-            for i, length in enumerate(lengths):
-                if interval > length:
-                    interval -= length
-                    continue
-                cb_tess = self.tessellation[i]
-                for t, p, d in cb_tess:
-                    if interval > d:
-                        interval -= d
-                        continue
-                    ts.append(i+t)
-                    break
-                else:
-                    assert False
-                break
-            else:
-                assert False
-        return ts
+        totlength = self.approximate_totlength_tessellation()
+        ts, _, ds = self._tessellation_np
+        # first sample where accumulated length reaches interval
+        inds = np.searchsorted(np.cumsum(ds), np.asarray(intervals, dtype=np.float64), side='left')
+        inds = np.minimum(inds, len(ts) - 1).tolist()
+        return [
+            0 if interval < 0 else len(self.cbs) if interval >= totlength else float(ts[i])
+            for (interval, i) in zip(intervals, inds)
+        ]
 
-    def approximate_ts_at_points_tessellation(self, points, fn_dist):
-        ts = []
-        for p in points:
-            bd, bt = None, None
-            for i, cb_tess in enumerate(self.tessellation):
-                for t, q, _ in cb_tess:
-                    d = fn_dist(p, q)
-                    if bd is None or d < bd:
-                        bd, bt = d, i+t
-            ts.append(bt)
-        return ts
+    def approximate_ts_at_points_tessellation(self, points, fn_dist=None):
+        points = list(points)
+        if not points: return []
+        ts, ps, _ = self._tessellation_np
+        if not len(ts): return [None for _ in points]
+        if fn_dist is None:
+            # squared distances of every point to every tessellation point
+            diff = points_to_np(points)[:, None, :] - ps[None, :, :]
+            ds = (diff * diff).sum(axis=2)
+        else:
+            qs = [q for cb_tess in self.tessellation for (_, q, _) in cb_tess]
+            ds = np.array([[fn_dist(p, q) for q in qs] for p in points])
+        return ts[np.argmin(ds, axis=1)].tolist()
 
-    def approximate_t_at_point_tessellation(self, point, fn_dist):
-        bd, bt = None, None
-        for i, cb_tess in enumerate(self.tessellation):
-            for t, q, _ in cb_tess:
-                d = fn_dist(point, q)
-                if bd is None or d < bd:
-                    bd, bt = d, i+t
-        return bt
+    def approximate_t_at_point_tessellation(self, point, fn_dist=None):
+        return self.approximate_ts_at_points_tessellation([point], fn_dist)[0]
 
 
 class GenVector(list):
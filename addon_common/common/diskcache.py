@@ -0,0 +1,103 @@
+'''
+Copyright (C) 2022 CG Cookie
+http://cgcookie.com
+hello@cgcookie.com
+
+Created by Jonathan Denning, Jonathan Williamson
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import io
+import os
+import time
+import pickle
+from hashlib import md5
+
+from .blender import get_path_from_addon_root
+
+
+class DiskCache:
+    '''
+    pickled values stored in a folder under <addon root>/.cache, one file per value.
+    file names are hashes of everything the value was computed from (see get_filename),
+    including a version and the mtimes of the source files that compute the value, so
+    updating the add-on invalidates the cache.
+    loading and saving never raise; on any failure the caller simply recomputes the value.
+    files that have not been used in max_age seconds are removed whenever a value is saved.
+    set path to None to disable the cache.
+    '''
+
+    def __init__(self, name, *, version=1, sources=None, max_age=30*24*60*60, pickler=pickle.Pickler):
+        self.name = name
+        self.path = get_path_from_addon_root('.cache', name)
+        self.version = version
+        self.sources = list(sources or [])
+        self.max_age = max_age
+        self.pickler = pickler
+
+    def dumps(self, value):
+        f = io.BytesIO()
+        self.pickler(f).dump(value)
+        return f.getvalue()
+
+    def get_filename(self, prefix, *parts):
+        '''
+        returns path of file for value computed from parts (str, bytes, or picklable), or None if disabled
+        '''
+        if not self.path: return None
+        try:
+            h = md5()
+            h.update(f'{self.version}\n'.encode())
+            for fn in self.sources:
+                h.update(f'{os.path.basename(fn)} {os.path.getmtime(fn)}\n'.encode())
+            for part in parts:
+                if type(part) is str:     part = part.encode()
+                elif type(part) is not bytes: part = self.dumps(part)
+                h.update(f'{len(part)}\n'.encode())
+                h.update(part)
+        except Exception as e:
+            print(f'DiskCache {self.name}: could not hash "{prefix}": {e}')
+            return None
+        return os.path.join(self.path, f'{prefix}-{h.hexdigest()}.pickle')
+
+    def load(self, filename):
+        ''' returns value stored in filename, or None if not cached '''
+        if not filename or not os.path.exists(filename): return None
+        try:
+            value = pickle.load(open(filename, 'rb'))
+        except Exception as e:
+            print(f'DiskCache {self.name}: could not load "{filename}": {e}')
+            return None
+        try: os.utime(filename)     # mark as recently used
+        except Exception: pass
+        return value
+
+    def save(self, filename, value):
+        if not filename: return
+        try:
+            path = os.path.dirname(filename)
+            os.makedirs(path, exist_ok=True)
+            # remove files that have not been used in a while (old versions of sources)
+            now = time.time()
+            for fn in os.listdir(path):
+                fn = os.path.join(path, fn)
+                if fn.endswith('.pickle') and now - os.path.getmtime(fn) > self.max_age:
+                    os.remove(fn)
+            # write to temp file first, so partially written files are never loaded
+            filename_tmp = f'{filename}.{os.getpid()}.tmp'
+            open(filename_tmp, 'wb').write(self.dumps(value))
+            os.replace(filename_tmp, filename)
+        except Exception as e:
+            print(f'DiskCache {self.name}: could not save "{filename}": {e}')
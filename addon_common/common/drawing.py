@@ -48,6 +48,7 @@ from .decorators import blender_version_wrapper, add_cache
 from .fontmanager import FontManager as fm
 from .functools import find_fns
 from .globals import Globals
+from .textmetrics import TextMetricsCache
 from .hasher import Hasher
 from .maths import Point2D, Vec2D, Point, Ray, Direction, mid, Color, Normal, Frame
 from .profiler import profiler
@@ -189,7 +190,7 @@ class Drawing:
         self.fontsize = None
         self.fontsize_scaled = None
         self.line_cache = {}
-        self.size_cache = {}
+        self.text_metrics = TextMetricsCache()
         self.set_font_size(12)
         self._pixel_matrix = None
 
@@ -254,31 +255,39 @@ class Drawing:
         else: text, lines = text, text.splitlines()
 
         fontid = fm.load(fontid)
-        key = (text, self.fontsize_scaled, fontid)
-        # key = (text, self.fontsize_scaled, self.font_id)
-        if key not in self.size_cache:
+        def compute():
             d = {}
             if not text:
                 d['width'] = 0
+                d['width raw'] = 0
                 d['height'] = 0
                 d['line height'] = self.line_height
             else:
-                get_width = lambda t: math.ceil(fm.dimensions(t, fontid=fontid)[0])
+                get_width = lambda t: fm.dimensions(t, fontid=fontid)[0]
                 get_height = lambda t: math.ceil(fm.dimensions(t, fontid=fontid)[1])
-                d['width'] = max(get_width(l) for l in lines)
+                d['width raw'] = max(get_width(l) for l in lines) if lines else 0
+                d['width'] = math.ceil(d['width raw'])
                 d['height'] = get_height(text)
                 d['line height'] = self.line_height * len(lines)
-            self.size_cache[key] = d
             if False:
                 print('')
                 print('--------------------------------------')
                 print('> computed new size')
-                print('>   key: %s' % str(key))
+                print('>   key: %s' % str((text, self.fontsize_scaled, fontid)))
                 print('>   size: %s' % str(d))
                 print('--------------------------------------')
                 print('')
+            return d
+        d = self.text_metrics.get(text, self.fontsize_scaled, fontid, compute)
         if fontsize: self.set_font_size(size_prev, fontid=fontid)
-        return self.size_cache[key][item]
+        return d[item]
+
+    def get_word_width(self, word):
+        '''
+        returns width (not rounded up) of a single word or space in current font and size,
+        so that widths of lines can be summed from their words
+        '''
+        return self.get_text_size_info(word, 'width raw')
 
     def get_text_width(self, text, fontsize=None, fontid=None):
         return self.get_text_size_info(text, 'width', fontsize=fontsize, fontid=fontid)
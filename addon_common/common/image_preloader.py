@@ -20,19 +20,58 @@ Created by Jonathan Denning, Jonathan Williamson, and Patrick Moore
 '''
 
 import os
+import sys
 import glob
+import time
 import atexit
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
 
-from .blender import get_path_from_addon_root
-from .ui_core import preload_image, set_image_cache
+from .blender import get_path_from_addon_root, get_path_from_addon_common
+from .ui_core import preload_image, set_image_cache, get_image_path
+from .pngdecode import read_png_size
+
+
+# worker processes load pngdecode.py by path under the name below, because importing it through the
+# add-on package would import Blender modules.  this process loads it the same way, so functions
+# submitted to workers are pickled with a name the workers can find.
+# note: initializer is builtin exec, because any function in the add-on package has the same problem
+worker_module_name = 'addon_common_pngdecode_worker'
+worker_init = (
+    'import sys, importlib.util\n'
+    'spec = importlib.util.spec_from_file_location(name, path)\n'
+    'module = importlib.util.module_from_spec(spec)\n'
+    'sys.modules[name] = module\n'
+    'spec.loader.exec_module(module)\n'
+)
+worker_init_globals = {'name': worker_module_name, 'path': get_path_from_addon_common('common', 'pngdecode.py')}
+
+def get_worker_module():
+    if worker_module_name not in sys.modules: exec(worker_init, dict(worker_init_globals))
+    return sys.modules[worker_module_name]
 
 
 # preload images to view faster
 class ImagePreloader:
+    '''
+    pngs are decoded in a small pool of worker processes, so decoding does not contend with Blender for
+    the GIL.  each worker decodes into a shared memory block allocated (and freed) by this process, so
+    only the RGBA pixels are copied back.  images the workers cannot decode (formats not handled by
+    pngdecode) are loaded with load_image in the background thread instead.
+    new images are only submitted while not paused, and nothing more is submitted after quit.
+    '''
+
     _paused = False
     _quitted = False
+    _thread = None
+    _done = 0
+    _total = 0
+    _timings = {}       # image path -> seconds spent decoding
 
     @classmethod
     def pause(cls):  cls._paused = True
@@ -47,55 +86,110 @@ class ImagePreloader:
     def quitted(cls): return cls._quitted
 
     @classmethod
-    def start(cls, paths, *, version='thread'):
-        path_images = []
+    def progress(cls):
+        ''' returns (number of images preloaded, number of images to preload) '''
+        return (cls._done, cls._total)
+
+    @classmethod
+    def timings(cls):
+        return dict(cls._timings)
+
+    @classmethod
+    def wait(cls, timeout=None):
+        ''' waits for preloading to finish.  returns True if finished '''
+        if cls._thread: cls._thread.join(timeout)
+        return not (cls._thread and cls._thread.is_alive())
 
-        path_cur = os.getcwd()
+    @staticmethod
+    def find_images(paths):
+        path_images = []
         for path in paths:
-            os.chdir(get_path_from_addon_root(*path))
-            path_images.extend(glob.glob('*.png'))
-        os.chdir(path_cur)
-
-        if version == 'process':
-            # this version spins up new Processes, so Python's GIL isn't an issue
-            # :) loading is much FASTER!      (truly parallel loading)
-            # :( DIFFICULT to pause or abort  (no shared resources)
-            def setter(p):
-                if cls.quitted(): return
-                for path_image, img in p.result():
-                    if img is None: continue
-                    print(f'CookieCutter: {path_image} is preloaded')
-                    set_image_cache(path_image, img)
-            executor = ProcessPoolExecutor() # ThreadPoolExecutor()
-            for path_image in path_images:
-                p = executor.submit(preload_image, path_image)
-                p.add_done_callback(setter)
-            def abort():
-                nonlocal executor
-                cls.quit()
-                # the following line causes a crash :(
-                # executor.shutdown(wait=False)
-            atexit.register(abort)
-
-        elif version == 'thread':
-            # this version spins up new Threads, so Python's GIL is used
-            # :( loading is much SLOWER!  (serial loading)
-            # :) EASY to pause and abort  (shared resources)
-            def abort():
-                cls.quit()
-            atexit.register(abort)
-            def start():
-                for png in path_images:
-                    print(f'CookieCutter: preloading image "{png}"')
-                    preload_image(png)
-                    time.sleep(0.5)
-                    for loop in range(10):
-                        if not cls.paused(): break
-                        if cls.quitted(): break
-                        time.sleep(0.5)
-                    else:
-                        # if looped too many times, just quit
-                        return
-                    if cls.quitted(): return
-                print(f'CookieCutter: all images preloaded')
-            ThreadPoolExecutor().submit(start)
+            if type(path) is str: path = (path,)
+            for path_image in sorted(glob.glob(os.path.join(get_path_from_addon_root(*path), '*.png'))):
+                # images are cached by file name, so only preload image that load_image would find
+                path_found = get_image_path(os.path.basename(path_image))
+                if path_found and os.path.realpath(path_found) == os.path.realpath(path_image):
+                    path_images.append(path_image)
+        return path_images
+
+    @classmethod
+    def start(cls, paths, *, max_workers=None):
+        if cls._thread and cls._thread.is_alive(): return
+        path_images = cls.find_images(paths)
+        if max_workers is None: max_workers = max(1, min(4, (os.cpu_count() or 2) - 1))
+        cls._quitted = False
+        cls._done, cls._total, cls._timings = 0, len(path_images), {}
+        cls._thread = threading.Thread(target=cls._preload, args=(path_images, max_workers), daemon=True)
+        cls._thread.start()
+
+    @classmethod
+    def _preload(cls, path_images, max_workers):
+        start = time.perf_counter()
+        pending = list(reversed(path_images))
+        running = {}    # future -> (image path, shared memory, shape)
+        try:
+            executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn'),    # do not fork Blender
+                initializer=exec,
+                initargs=(worker_init, worker_init_globals),
+            )
+            decode = get_worker_module().decode_png_file_to_shared_memory
+        except Exception as e:
+            print(f'CookieCutter: could not start image preloading processes ({e}), preloading in thread')
+            executor = None
+        try:
+            while (pending or running) and not cls._quitted:
+                while pending and len(running) < max_workers and not (cls._paused or cls._quitted):
+                    path_image = pending.pop()
+                    size = read_png_size(open(path_image, 'rb').read(24)) if executor else None
+                    if not size:
+                        cls._load(path_image)
+                        continue
+                    w, h = size
+                    shm = shared_memory.SharedMemory(create=True, size=max(1, w * h * 4))
+                    running[executor.submit(decode, path_image, shm.name, (h, w, 4))] = (path_image, shm, (h, w, 4))
+                if running:
+                    done, _ = wait(running, timeout=0.1, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        path_image, shm, shape = running.pop(future)
+                        try:
+                            seconds = future.result()
+                            img = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf).copy() if seconds is not None else None
+                        except BrokenProcessPool as e:
+                            print(f'CookieCutter: image preloading processes stopped ({e}), preloading in thread')
+                            img, executor = None, None
+                        except Exception as e:
+                            print(f'CookieCutter: could not preload image "{path_image}" in process ({e})')
+                            img = None
+                        finally:
+                            shm.close()
+                            shm.unlink()
+                        if img is None:
+                            cls._load(path_image)
+                            continue
+                        set_image_cache(os.path.basename(path_image), img)
+                        cls._timings[path_image] = seconds
+                        cls._done += 1
+                elif cls._paused:
+                    time.sleep(0.1)
+        finally:
+            for future, (_, shm, _) in running.items():
+                future.cancel()
+                shm.close()
+                shm.unlink()
+            if executor: executor.shutdown(wait=False, cancel_futures=True)
+        if not cls._quitted:
+            print(f'CookieCutter: {cls._done} images preloaded in {time.perf_counter() - start:0.2f}s')
+
+    @classmethod
+    def _load(cls, path_image):
+        start = time.perf_counter()
+        try:
+            preload_image(os.path.basename(path_image))
+        except Exception as e:
+            print(f'CookieCutter: could not preload image "{path_image}" ({e})')
+        cls._timings[path_image] = time.perf_counter() - start
+        cls._done += 1
+
+atexit.register(ImagePreloader.quit)
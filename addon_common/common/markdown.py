@@ -119,3 +119,134 @@ class Markdown:
         i = line.index(' ') + 1
         return (line[:i],line[i:])
 
+
+    # parsed markdown is a list of nodes, where each node is a tuple (tagName, attribs, children).
+    # attribs are the kwargs for new UI elements, except for two special nodes:
+    #     ('html', {'html': ...}, [])     inline html, to be created with fromHTML
+    #     ('a', {'href': ...}, [])        link; mouse click handler is added when creating UI
+    # nodes contain only str, dict, list, and tuple, so they can be cached (pickled)
+    html_arrows = {     # https://www.toptal.com/designers/htmlarrows/arrows/
+        'uarr': '↑', 'darr': '↓', 'larr': '←', 'rarr': '→', 'harr': '↔', 'varr': '↕',
+        'uArr': '⇑', 'dArr': '⇓', 'lArr': '⇐', 'rArr': '⇒', 'hArr': '⇔', 'vArr': '⇕',
+    }
+
+    @staticmethod
+    def parse_para(para):
+        nodes = []
+        def node(tagName, children=None, **attribs):
+            nodes.append((tagName, attribs, children or []))
+
+        def process_words(text, word_fn):
+            build = ''
+            while text:
+                word,text = Markdown.split_word(text)
+                build += word
+            word_fn(build)
+
+        # break each ui_item onto it's own line
+        para = re.sub(r'\n', ' ', para)     # join sentences of paragraph
+        para = re.sub(r' +', ' ', para)     # 1+ spaces => 1 space
+
+        # TODO: revisit this, and create an actual parser
+        para = para.lstrip()
+        while para:
+            t,m = Markdown.match_inline(para)
+            if t is None:
+                build = ''
+                while t is None and para:
+                    word,para = Markdown.split_word(para)
+                    build += word
+                    t,m = Markdown.match_inline(para)
+                node('text', innerText=build, pseudoelement='text')
+            else:
+                if t == 'br':
+                    node('BR')
+                elif t == 'arrow':
+                    node('span', classes='html-arrow', innerText=Markdown.html_arrows[m.group('dir')])
+                elif t == 'img':
+                    style = m.group('style').strip() or None
+                    node('img', classes='inline', style=style, src=m.group('filename'), title=m.group('caption'))
+                elif t == 'code':
+                    node('code', innerText=m.group('text'))
+                elif t == 'link':
+                    link = m.group('link')
+                    title = 'Click to open URL in default web browser' if Markdown.is_url(link) else 'Click to open help'
+                    process_words(m.group('text'), lambda word: node('a', innerText=word, href=link, title=title))
+                elif t == 'bold':
+                    process_words(m.group('text'), lambda word: node('b', innerText=word))
+                elif t == 'italic':
+                    process_words(m.group('text'), lambda word: node('i', innerText=word))
+                elif t == 'html':
+                    node('html', html=m.group())
+                else:
+                    assert False, 'Unhandled inline markdown type "%s" ("%s") with "%s"' % (str(t), str(m), para)
+                para = para[m.end():]
+        return nodes
+
+    @staticmethod
+    def parse(mdown):
+        nodes = []
+        def node(tagName, children=None, **attribs):
+            nodes.append((tagName, attribs, children or []))
+
+        #paras = mdown.split('\n\n')         # split into paragraphs
+        paras = re.split(r'\n\n(?!    )', mdown)
+        for para in paras:
+            t,m = Markdown.match_line(para)
+
+            if t is None:
+                node('p', Markdown.parse_para(para))
+
+            elif t in ['h1','h2','h3']:
+                node(t, Markdown.parse_para(m.group('text')))
+
+            elif t == 'ul':
+                lis = []
+                # add newline at beginning so that we can skip the first item (before "- ")
+                for litext in re.split(r'\n- ', f'\n{para}')[1:]:
+                    if '\n' in litext:
+                        # remove leading spaces
+                        litext = '\n'.join(l.lstrip() for l in litext.split('\n'))
+                        lis.append(('li', {}, Markdown.parse(litext)))
+                    else:
+                        lis.append(('li', {}, Markdown.parse_para(litext)))
+                node('ul', lis)
+
+            elif t == 'ol':
+                lis = []
+                # add newline at beginning so that we can skip the first item (before "1. ")
+                for litext in re.split(r'\n\d+\. ', f'\n{para}')[1:]:
+                    if '\n' in litext:
+                        # remove leading spaces
+                        litext = '\n'.join(l.strip() for l in litext.split('\n'))
+                        lis.append(('li', {}, Markdown.parse(litext)))
+                    else:
+                        lis.append(('li', {}, Markdown.parse_para(litext)))
+                node('ol', lis)
+
+            elif t == 'img':
+                style = m.group('style').strip() or None
+                node('img', style=style, src=m.group('filename'), title=m.group('caption'))
+
+            elif t == 'table':
+                # table!
+                def split_row(row):
+                    row = re.sub(r'^\| ', r'', row)
+                    row = re.sub(r' \|$', r'', row)
+                    return [col.strip() for col in row.split(' | ')]
+                data = [l for l in para.split('\n')]
+                header = split_row(data[0])
+                add_header = any(header)
+                align = data[1]
+                data = [split_row(row) for row in data[2:]]
+                rows,cols = len(data),len(data[0])
+                trs = []
+                if add_header:
+                    trs.append(('tr', {}, [('th', {'innerText': header[c]}, []) for c in range(cols)]))
+                for r in range(rows):
+                    trs.append(('tr', {}, [('td', {}, Markdown.parse_para(data[r][c])) for c in range(cols)]))
+                node('table', trs)
+
+            else:
+                assert False, 'Unhandled markdown line type "%s" ("%s") with "%s"' % (str(t), str(m), para)
+        return nodes
@@ -1816,6 +1816,205 @@ class Accel2D:
         return None
 
 
+class Accel3DSegments:
+    '''
+    uniform grid over 3D segments for finding the closest point on any segment.
+    segments are binned by their bounding boxes; segments that span too many cells
+    are kept in a separate list that is always checked.
+    '''
+
+    max_cells_per_segment = 64
+
+    @profiler.function
+    def __init__(self, segments):
+        self.segments = [(Point(p0), Point(p1)) for (p0, p1) in segments]
+        self.bins = {}
+        self.oversized = []
+        if not self.segments:
+            self.cell, self.min, self.max = 1.0, (0, 0, 0), (0, 0, 0)
+            return
+        self.cell = max(
+            sum(max(abs(p1.x - p0.x), abs(p1.y - p0.y), abs(p1.z - p0.z)) for (p0, p1) in self.segments) / len(self.segments),
+            zero_threshold,
+        )
+        self.min = tuple(min(min(p0[i], p1[i]) for (p0, p1) in self.segments) for i in range(3))
+        self.max = tuple(max(max(p0[i], p1[i]) for (p0, p1) in self.segments) for i in range(3))
+        bins = self.bins
+        for i_seg, (p0, p1) in enumerate(self.segments):
+            (i0, j0, k0) = self._index((min(p0.x, p1.x), min(p0.y, p1.y), min(p0.z, p1.z)))
+            (i1, j1, k1) = self._index((max(p0.x, p1.x), max(p0.y, p1.y), max(p0.z, p1.z)))
+            if (i1 - i0 + 1) * (j1 - j0 + 1) * (k1 - k0 + 1) > self.max_cells_per_segment:
+                self.oversized.append(i_seg)
+                continue
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    for k in range(k0, k1 + 1):
+                        bins.setdefault((i, j, k), []).append(i_seg)
+
+    def __len__(self):
+        return len(self.segments)
+
+    def _index(self, co):
+        c = self.cell
+        return (floor(co[0] / c), floor(co[1] / c), floor(co[2] / c))
+
+    def _query(self, point, radius):
+        (i0, j0, k0) = self._index((point[0] - radius, point[1] - radius, point[2] - radius))
+        (i1, j1, k1) = self._index((point[0] + radius, point[1] + radius, point[2] + radius))
+        found = set(self.oversized)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) * (k1 - k0 + 1) > len(self.bins):
+            for (i, j, k), b in self.bins.items():
+                if i0 <= i <= i1 and j0 <= j <= j1 and k0 <= k <= k1: found.update(b)
+        else:
+            bins = self.bins
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    for k in range(k0, k1 + 1):
+                        b = bins.get((i, j, k))
+                        if b: found.update(b)
+        return found
+
+    def closest(self, point:Point, max_dist=float('inf')):
+        '''
+        returns (closest point on any segment, distance) or (None, None) if no segment within max_dist.
+        search radius grows until the closest found segment is guaranteed to be the closest.
+        '''
+        if not self.segments: return (None, None)
+        point = Point(point)
+        # distance from point to bounds of all segments
+        d_bounds = sqrt(sum(max(self.min[i] - point[i], 0, point[i] - self.max[i]) ** 2 for i in range(3)))
+        if d_bounds > max_dist: return (None, None)
+        d_far = d_bounds + sqrt(sum((self.max[i] - self.min[i]) ** 2 for i in range(3))) + self.cell
+        radius = d_bounds + self.cell
+        checked = set()
+        bp, bd = None, None
+        while True:
+            for i_seg in self._query(point, min(radius, max_dist)) - checked:
+                checked.add(i_seg)
+                p = closest_point_segment(point, *self.segments[i_seg])
+                d = (p - point).length
+                if bd is None or d < bd: bp, bd = p, d
+            if bd is not None and bd <= radius: break
+            if radius >= max_dist or radius >= d_far: break
+            radius *= 2
+        if bd is None or bd > max_dist: return (None, None)
+        return (bp, bd)
+
+    def closest_brute_force(self, point:Point):
+        # for testing
+        point = Point(point)
+        best = min((closest_point_segment(point, p0, p1) for (p0, p1) in self.segments), key=lambda p: (p - point).length, default=None)
+        return (best, (best - point).length) if best is not None else (None, None)
+
+
+class Accel2DSegments:
+    '''
+    uniform grid over 2D segments for finding all segments near another segment.
+    each segment is binned into the cells it passes through (DDA traversal), and
+    queries walk the cells along the query segment, so only nearby segments are tested.
+    '''
+
+    @profiler.function
+    def __init__(self, items, cell_min=0.0):
+        # items: iterable of (key, p0, p1)
+        self.items = [(key, Point2D(p0), Point2D(p1)) for (key, p0, p1) in items]
+        self.bins = {}
+        if not self.items:
+            self.cell = max(cell_min, 1.0)
+            return
+        self.cell = max(
+            sum(abs(p1.x - p0.x) + abs(p1.y - p0.y) for (_, p0, p1) in self.items) / (2 * len(self.items)),
+            cell_min,
+            zero_threshold,
+        )
+        bins = self.bins
+        for i_item, (_, p0, p1) in enumerate(self.items):
+            for ij in self._traverse(p0, p1):
+                bins.setdefault(ij, []).append(i_item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _traverse(self, p0, p1):
+        # yields (i,j) of each cell that segment p0-p1 passes through (Amanatides-Woo)
+        c = self.cell
+        x0, y0, x1, y1 = p0.x / c, p0.y / c, p1.x / c, p1.y / c
+        i, j = floor(x0), floor(y0)
+        i1, j1 = floor(x1), floor(y1)
+        dx, dy = x1 - x0, y1 - y0
+        di, dj = (1 if dx > 0 else -1), (1 if dy > 0 else -1)
+        if dx: tdx, tx = abs(1 / dx), ((i + 1 - x0) if dx > 0 else (i - x0)) / dx
+        else:  tdx, tx = float('inf'), float('inf')
+        if dy: tdy, ty = abs(1 / dy), ((j + 1 - y0) if dy > 0 else (j - y0)) / dy
+        else:  tdy, ty = float('inf'), float('inf')
+        yield (i, j)
+        for _ in range(abs(i1 - i) + abs(j1 - j)):
+            if tx < ty: i, tx = i + di, tx + tdx
+            else:       j, ty = j + dj, ty + tdy
+            yield (i, j)
+
+    def query_segment(self, p0:Point2D, p1:Point2D, margin=0.0):
+        '''
+        returns list of (key, p0, p1) for all segments that may come within margin of segment p0-p1.
+        the returned list is a superset; callers still need to do exact tests.
+        '''
+        if not self.bins: return []
+        bins = self.bins
+        r = int(margin // self.cell) + 1
+        cells = set()
+        for (i, j) in self._traverse(Point2D(p0), Point2D(p1)):
+            for oi in range(-r, r + 1):
+                for oj in range(-r, r + 1):
+                    cells.add((i + oi, j + oj))
+        found = set()
+        for ij in cells:
+            b = bins.get(ij)
+            if b: found.update(b)
+        items = self.items
+        return [items[i_item] for i_item in sorted(found)]
+
+
+class Accel2DPoints:
+    '''
+    spatial hash over 2D points for finding points within a fixed distance.
+    cell size matches the query distance, so a query only visits the 3x3 cells around it.
+    points that are None (ex: could not project) are skipped, but indices match the input list.
+    '''
+
+    @profiler.function
+    def __init__(self, points, dist):
+        # slightly larger cells guard against rounding when points are exactly dist apart
+        self.dist = dist
+        self.cell = max(dist, zero_threshold) * (1 + 1e-6)
+        self.points = points = list(points)
+        self.bins = bins = {}
+        c = self.cell
+        for i, p in enumerate(points):
+            if p is None: continue
+            bins.setdefault((floor(p[0] / c), floor(p[1] / c)), []).append(i)
+
+    def __len__(self):
+        return len(self.points)
+
+    def indices_within(self, point, dist=None):
+        '''
+        returns sorted indices of points within dist (default: dist given at construction) of point.
+        dist must not be larger than construction dist.
+        '''
+        if dist is None: dist = self.dist
+        assert dist <= self.dist, f'Accel2DPoints: query dist ({dist}) larger than cell dist ({self.dist})'
+        c, bins, points = self.cell, self.bins, self.points
+        i, j = floor(point[0] / c), floor(point[1] / c)
+        found = []
+        for oi in (-1, 0, 1):
+            for oj in (-1, 0, 1):
+                b = bins.get((i + oi, j + oj))
+                if not b: continue
+                found.extend(idx for idx in b if (point - points[idx]).length <= dist)
+        found.sort()
+        return found
+
+
 class NumberUnit:
     val_fn = {
         '%':  lambda num,base,_base: (num / 100.0) * float(base if base is not None else _base if _base is not None else 1),
@@ -0,0 +1,210 @@
+'''
+Copyright (C) 2022 CG Cookie
+http://cgcookie.com
+hello@cgcookie.com
+
+Created by Jonathan Denning, Jonathan Williamson
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+PNG decoding with zlib and NumPy, for the common formats used by UI images:
+8-bit, non-interlaced grayscale, RGB, palette, grayscale+alpha, and RGBA images.
+
+scanlines are un-filtered with vectorized NumPy operations.  None, Sub, and Up filters only
+depend on the pixel to the left or above, so each scanline is reconstructed as a whole.
+Average and Paeth filters depend on the reconstructed pixel to the left, so pixels are instead
+reconstructed one anti-diagonal (x + y == k) at a time, as each pixel only depends on pixels of
+the previous two anti-diagonals.
+
+decode_png returns None for anything else (interlaced, 16-bit or <8-bit channels, transparency
+chunks on non-palette images), and the caller falls back to the pure-Python reader (ext/png.py).
+
+NOTE: this module only imports from the standard library and NumPy, so that it can be loaded in
+      worker processes that cannot import Blender modules.
+'''
+
+import time
+import struct
+import zlib
+
+import numpy as np
+
+
+png_signature = b'\x89PNG\r\n\x1a\n'
+
+# bytes per pixel for each color type (8-bit channels)
+png_channels = {
+    0: 1,   # grayscale
+    2: 3,   # rgb
+    3: 1,   # palette index
+    4: 2,   # grayscale, alpha
+    6: 4,   # rgba
+}
+
+
+def read_chunks(data):
+    ''' returns dict of IHDR, PLTE, tRNS, and concatenated IDAT chunk data, or None if data is not a valid png '''
+    if data[:8] != png_signature: return None
+    chunks = {'IDAT': []}
+    pos, end = 8, len(data)
+    while pos + 12 <= end:
+        length, kind = struct.unpack('>I4s', data[pos:pos+8])
+        body = data[pos+8:pos+8+length]
+        crc, = struct.unpack('>I', data[pos+8+length:pos+12+length])
+        if zlib.crc32(kind + body) != crc: return None
+        pos += 12 + length
+        kind = kind.decode('latin-1')
+        if kind == 'IEND': break
+        if kind == 'IDAT': chunks['IDAT'].append(body)
+        else:              chunks.setdefault(kind, body)
+    else:
+        return None     # missing IEND
+    if 'IHDR' not in chunks or not chunks['IDAT']: return None
+    chunks['IDAT'] = b''.join(chunks['IDAT'])
+    return chunks
+
+
+def read_png_size(data):
+    ''' returns (width, height) from IHDR chunk at start of png data, or None if data does not start like a png '''
+    if len(data) < 24 or data[:8] != png_signature or data[12:16] != b'IHDR': return None
+    return struct.unpack('>II', data[16:24])
+
+
+def unfilter(filters, data):
+    '''
+    reconstructs scanlines.
+    filters: filter type of each scanline (height)
+    data: filtered bytes (height, width, bytes per pixel)
+    returns reconstructed bytes as uint8 array with same shape as data
+    '''
+    height, width, bpp = data.shape
+
+    if not (filters >= 3).any():
+        out = np.empty_like(data)
+        prev = np.zeros((width, bpp), dtype=np.uint8)
+        for y, f in enumerate(filters.tolist()):
+            row = data[y]
+            if   f == 0: prev = row
+            elif f == 1: prev = np.cumsum(row, axis=0, dtype=np.uint8)     # wraps around
+            else:        prev = row + prev
+            out[y] = prev
+        return out
+
+    # skewed layout: pixel (x, y) is stored at [x + y, y], so each anti-diagonal is a contiguous
+    # slice.  reconstructed pixels are offset by 2 rows and 1 column, so pixels left of and above
+    # image are zero
+    ndiags = width + height - 1
+    ys, xs = np.arange(height)[:, None], np.arange(width)[None, :]
+    skewed = np.zeros((ndiags, height, bpp), dtype=np.int16)
+    skewed[ys + xs, ys] = data
+    recon = np.zeros((ndiags + 2, height + 1, bpp), dtype=np.int16)
+    # counts[f][y] is number of scanlines before y with filter f, used to find filters in each anti-diagonal
+    counts = np.zeros((5, height + 1), dtype=np.int64)
+    counts[:, 1:] = np.cumsum(filters[None, :] == np.arange(5)[:, None], axis=1)
+    counts = counts.tolist()
+    filters = filters.astype(np.int16)[:, None]
+    for k in range(ndiags):
+        y0, y1 = max(0, k - width + 1), min(k, height - 1) + 1
+        a = recon[k+1, y0+1:y1+1]      # left
+        b = recon[k+1, y0:y1]          # above
+        c = recon[k,   y0:y1]          # above left
+        used = [f for f in range(5) if counts[f][y1] != counts[f][y0]]
+        preds = {}
+        if 4 in used:
+            ac, bc = a - c, b - c
+            pa, pb, pc = np.abs(bc), np.abs(ac), np.abs(ac + bc)
+            preds[4] = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+        if 3 in used: preds[3] = (a + b) >> 1
+        if 2 in used: preds[2] = b
+        if 1 in used: preds[1] = a
+        if 0 in used: preds[0] = 0
+        if len(used) == 1:
+            pred = preds[used[0]]
+        else:
+            f = filters[y0:y1]
+            pred = preds[used[0]]
+            for u in used[1:]: pred = np.where(f == u, preds[u], pred)
+        recon[k+2, y0+1:y1+1] = (skewed[k, y0:y1] + pred) & 0xff
+    return recon[ys + xs + 2, ys + 1].astype(np.uint8)
+
+
+def decode_png(data):
+    '''
+    decodes png file data into (height, width, 4) uint8 array of RGBA pixels, first row at top.
+    returns None if png is not in one of the supported formats (see above)
+    '''
+    chunks = read_chunks(data)
+    if not chunks: return None
+    width, height, depth, color_type, compression, filtering, interlace = struct.unpack('>IIBBBBB', chunks['IHDR'])
+    if depth != 8 or interlace != 0 or compression != 0 or filtering != 0: return None
+    if color_type not in png_channels: return None
+    if 'tRNS' in chunks and color_type != 3: return None
+    if width == 0 or height == 0: return None
+
+    bpp = png_channels[color_type]
+    stride = width * bpp + 1
+    try:
+        raw = zlib.decompress(chunks['IDAT'])
+    except zlib.error:
+        return None
+    if len(raw) < stride * height: return None
+    rows = np.frombuffer(raw, dtype=np.uint8, count=stride * height).reshape(height, stride)
+    filters = rows[:, 0]
+    if filters.max() > 4: return None
+    pixels = unfilter(filters, rows[:, 1:].reshape(height, width, bpp))
+
+    rgba = np.empty((height, width, 4), dtype=np.uint8)
+    if color_type == 6:
+        rgba[...] = pixels
+    elif color_type == 2:
+        rgba[..., :3] = pixels
+        rgba[..., 3] = 255
+    elif color_type == 0:
+        rgba[..., :3] = pixels
+        rgba[..., 3] = 255
+    elif color_type == 4:
+        rgba[..., :3] = pixels[..., :1]
+        rgba[..., 3] = pixels[..., 1]
+    elif color_type == 3:
+        if 'PLTE' not in chunks: return None
+        plte = np.frombuffer(chunks['PLTE'], dtype=np.uint8)
+        palette = np.zeros((256, 4), dtype=np.uint8)
+        palette[:, 3] = 255
+        palette[:len(plte) // 3, :3] = plte[:len(plte) // 3 * 3].reshape(-1, 3)
+        if 'tRNS' in chunks:
+            trns = np.frombuffer(chunks['tRNS'], dtype=np.uint8)[:256]
+            palette[:len(trns), 3] = trns
+        if pixels.max() >= len(plte) // 3: return None
+        rgba[...] = palette[pixels[..., 0]]
+    return rgba
+
+
+def decode_png_file_to_shared_memory(path, name, shape):
+    '''
+    decodes png file at path into existing shared memory block with given name, as (height, width, 4)
+    RGBA pixels.  used by worker processes of ImagePreloader, which owns the shared memory.
+    returns seconds spent decoding, or None if png could not be decoded
+    '''
+    from multiprocessing import shared_memory
+    start = time.perf_counter()
+    img = decode_png(open(path, 'rb').read())
+    if img is None or img.shape != tuple(shape): return None
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        shm.buf[:img.nbytes] = img.ravel()
+    finally:
+        shm.close()
+    return time.perf_counter() - start
@@ -0,0 +1,359 @@
+#version 330
+
+// batched version of ui_element.glsl: properties of UI element are vertex attributes rather than uniforms,
+// so many UI elements can be drawn with a single draw call (see UI_DrawList).
+// scissoring is done in fragment shader, because each element can have different scissor box.
+
+// the following two lines are an attempt to solve issues #1025, #879, #753
+precision highp float;
+precision lowp  int;   // only used to represent enum or bool
+
+uniform mat4 uMVPMatrix;
+
+uniform int       using_image;
+uniform sampler2D image;
+
+
+// labeled magic numbers (enum), only used to identify which region a fragment is in relative to UI element properties
+const int REGION_MARGIN_LEFT   = 0;
+const int REGION_MARGIN_BOTTOM = 1;
+const int REGION_MARGIN_RIGHT  = 2;
+const int REGION_MARGIN_TOP    = 3;
+const int REGION_BORDER_TOP    = 4;
+const int REGION_BORDER_RIGHT  = 5;
+const int REGION_BORDER_BOTTOM = 6;
+const int REGION_BORDER_LEFT   = 7;
+const int REGION_BACKGROUND    = 8;
+const int REGION_OUTSIDE       = 9;
+const int REGION_ERROR         = 10;
+
+const vec4 COLOR_ERROR         = vec4(1.0, 0.0, 0.0, 1.00);
+
+// labeled magic numbers (enum), needs to correspond with `UI_Draw.texture_fit_map`
+const int IMAGE_SCALE_FILL     = 0;
+const int IMAGE_SCALE_CONTAIN  = 1;
+const int IMAGE_SCALE_COVER    = 2;
+const int IMAGE_SCALE_DOWN     = 3;
+const int IMAGE_SCALE_NONE     = 4;
+
+
+
+////////////////////////////////////////
+// vertex shader
+
+layout(location = 0) in vec2 pos;           // corner of quad (0 or 1 in each dimension)
+in vec4 in_box;                             // left, top, width, height
+in vec4 in_margin;                          // left, right, top, bottom
+in vec4 in_padding;                         // left, right, top, bottom
+in vec4 in_border;                          // width, radius, depth, image fit
+in vec4 in_border_left_color;
+in vec4 in_border_right_color;
+in vec4 in_border_top_color;
+in vec4 in_border_bottom_color;
+in vec4 in_background_color;
+in vec4 in_clip;                            // left, bottom, right, top (right and top are exclusive)
+
+out vec2 screen_pos;
+
+// same names as uniforms in ui_element.glsl
+flat out float left;
+flat out float right;
+flat out float top;
+flat out float bottom;
+flat out float width;
+flat out float height;
+flat out float margin_left;
+flat out float margin_right;
+flat out float margin_top;
+flat out float margin_bottom;
+flat out float padding_left;
+flat out float padding_right;
+flat out float padding_top;
+flat out float padding_bottom;
+flat out float border_width;
+flat out float border_radius;
+flat out vec4  border_left_color;
+flat out vec4  border_right_color;
+flat out vec4  border_top_color;
+flat out vec4  border_bottom_color;
+flat out vec4  background_color;
+flat out int   image_fit;
+flat out vec4  clip;
+
+void main() {
+    left   = in_box.x;
+    top    = in_box.y;
+    width  = in_box.z;
+    height = in_box.w;
+    right  = left + (width - 1.0);
+    bottom = top - (height - 1.0);
+    margin_left    = in_margin.x;
+    margin_right   = in_margin.y;
+    margin_top     = in_margin.z;
+    margin_bottom  = in_margin.w;
+    padding_left   = in_padding.x;
+    padding_right  = in_padding.y;
+    padding_top    = in_padding.z;
+    padding_bottom = in_padding.w;
+    border_width   = in_border.x;
+    border_radius  = in_border.y;
+    border_left_color   = in_border_left_color;
+    border_right_color  = in_border_right_color;
+    border_top_color    = in_border_top_color;
+    border_bottom_color = in_border_bottom_color;
+    background_color    = in_background_color;
+    image_fit = int(in_border.w + 0.5);
+    clip = in_clip;
+
+    // set vertex to bottom-left, top-left, top-right, or bottom-right location, depending on pos
+    vec2 p = vec2(
+        (pos.x < 0.5) ? (left   - 1.0) : (right + 1.0),
+        (pos.y < 0.5) ? (bottom - 1.0) : (top   + 1.0)
+    );
+
+    // convert depth to z-order
+    float zorder = 1.0 - in_border.z / 1000.0;
+
+    screen_pos  = p;
+    gl_Position = uMVPMatrix * vec4(p, zorder, 1);
+}
+
+
+
+////////////////////////////////////////
+// fragment shader
+
+in vec2 screen_pos;
+
+flat in float left;
+flat in float right;
+flat in float top;
+flat in float bottom;
+flat in float width;
+flat in float height;
+flat in float margin_left;
+flat in float margin_right;
+flat in float margin_top;
+flat in float margin_bottom;
+flat in float padding_left;
+flat in float padding_right;
+flat in float padding_top;
+flat in float padding_bottom;
+flat in float border_width;
+flat in float border_radius;
+flat in vec4  border_left_color;
+flat in vec4  border_right_color;
+flat in vec4  border_top_color;
+flat in vec4  border_bottom_color;
+flat in vec4  background_color;
+flat in int   image_fit;
+flat in vec4  clip;
+
+layout(location = 0) out vec4 fragColor;
+
+float sqr(float s) { return s * s; }
+float sumsqr(float a, float b) { return sqr(a) + sqr(b); }
+float min4(float a, float b, float c, float d) { return min(min(min(a, b), c) ,d); }
+
+vec4 mix_over(vec4 above, vec4 below) {
+    vec3 a_ = above.rgb * above.a;
+    vec3 b_ = below.rgb * below.a;
+    float alpha = above.a + (1.0 - above.a) * below.a;
+    return vec4((a_ + b_ * (1.0 - above.a)) / alpha, alpha);
+}
+
+int get_margin_region(float dist_left, float dist_right, float dist_top, float dist_bottom) {
+    float dist_min = min4(dist_left, dist_right, dist_top, dist_bottom);
+    if(dist_min == dist_left)   return REGION_MARGIN_LEFT;
+    if(dist_min == dist_right)  return REGION_MARGIN_RIGHT;
+    if(dist_min == dist_top)    return REGION_MARGIN_TOP;
+    if(dist_min == dist_bottom) return REGION_MARGIN_BOTTOM;
+    return REGION_ERROR;    // this should never happen
+}
+
+int get_region() {
+    // see get_region in ui_element.glsl for details
+
+    float dist_left   = screen_pos.x - (left + margin_left);
+    float dist_right  = (right - margin_right + 1.0) - screen_pos.x;
+    float dist_bottom = screen_pos.y - (bottom + margin_bottom - 1.0);
+    float dist_top    = (top - margin_top) - screen_pos.y;
+    float radwid  = max(border_radius, border_width);
+    float rad     = max(0.0, border_radius - border_width);
+    float radwid2 = sqr(radwid);
+    float rad2    = sqr(rad);
+
+    if(dist_left < 0 || dist_right < 0 || dist_top < 0 || dist_bottom < 0) return REGION_OUTSIDE;
+
+    // margin
+    int margin_region = get_margin_region(dist_left, dist_right, dist_top, dist_bottom);
+
+    // within top and bottom, might be left or right side
+    if(dist_bottom > radwid && dist_top > radwid) {
+        if(dist_left > border_width && dist_right > border_width) return REGION_BACKGROUND;
+        if(dist_left < dist_right) return REGION_BORDER_LEFT;
+        return REGION_BORDER_RIGHT;
+    }
+
+    // within left and right, might be bottom or top
+    if(dist_left > radwid && dist_right > radwid) {
+        if(dist_bottom > border_width && dist_top > border_width) return REGION_BACKGROUND;
+        if(dist_bottom < dist_top) return REGION_BORDER_BOTTOM;
+        return REGION_BORDER_TOP;
+    }
+
+    // top-left
+    if(dist_top <= radwid && dist_left <= radwid) {
+        float r2 = sumsqr(dist_left - radwid, dist_top - radwid);
+        if(r2 > radwid2)             return margin_region;
+        if(r2 < rad2)                return REGION_BACKGROUND;
+        if(dist_left < dist_top)     return REGION_BORDER_LEFT;
+        return REGION_BORDER_TOP;
+    }
+    // top-right
+    if(dist_top <= radwid && dist_right <= radwid) {
+        float r2 = sumsqr(dist_right - radwid, dist_top - radwid);
+        if(r2 > radwid2)             return margin_region;
+        if(r2 < rad2)                return REGION_BACKGROUND;
+        if(dist_right < dist_top)    return REGION_BORDER_RIGHT;
+        return REGION_BORDER_TOP;
+    }
+    // bottom-left
+    if(dist_bottom <= radwid && dist_left <= radwid) {
+        float r2 = sumsqr(dist_left - radwid, dist_bottom - radwid);
+        if(r2 > radwid2)             return margin_region;
+        if(r2 < rad2)                return REGION_BACKGROUND;
+        if(dist_left < dist_bottom)  return REGION_BORDER_LEFT;
+        return REGION_BORDER_BOTTOM;
+    }
+    // bottom-right
+    if(dist_bottom <= radwid && dist_right <= radwid) {
+        float r2 = sumsqr(dist_right - radwid, dist_bottom - radwid);
+        if(r2 > radwid2)             return margin_region;
+        if(r2 < rad2)                return REGION_BACKGROUND;
+        if(dist_right < dist_bottom) return REGION_BORDER_RIGHT;
+        return REGION_BORDER_BOTTOM;
+    }
+
+    // something bad happened
+    return REGION_ERROR;
+}
+
+vec4 mix_image(vec4 bg) {
+    vec4 c = bg;
+    // drawing space
+    float dw = width  - (margin_left + border_width + padding_left + padding_right  + border_width + margin_right);
+    float dh = height - (margin_top  + border_width + padding_top  + padding_bottom + border_width + margin_bottom);
+    float dx = screen_pos.x - (left + (margin_left + border_width + padding_left));
+    float dy = -(screen_pos.y - (top  - (margin_top  + border_width + padding_top)));
+    float dsx = (dx + 0.5) / dw;
+    float dsy = (dy + 0.5) / dh;
+    // texture
+    vec2 tsz = textureSize(image, 0);
+    float tw = tsz.x, th = tsz.y;
+    float tx, ty;
+
+    switch(image_fit) {
+        case IMAGE_SCALE_FILL:
+            // object-fit: fill = stretch / squash to fill entire drawing space (non-uniform scale)
+            tx = tw * dx / dw;
+            ty = th * dy / dh;
+            break;
+        case IMAGE_SCALE_CONTAIN: {
+            // object-fit: contain = uniformly scale texture to fit entirely in drawing space (will be letterboxed)
+            float _tw, _th;
+            if(dw / dh < tw / th) {
+                _tw = tw;
+                _th = tw * dh / dw;
+            } else {
+                _tw = th * dw / dh;
+                _th = th;
+            }
+            tx = dsx * _tw - (_tw - tw) / 2.0;
+            ty = dsy * _th - (_th - th) / 2.0;
+            break; }
+        case IMAGE_SCALE_COVER: {
+            // object-fit: cover = uniformly scale texture to fill entire drawing space (will be cropped)
+            float _tw, _th;
+            if(dw / dh > tw / th) {
+                _tw = tw;
+                _th = tw * dh / dw;
+            } else {
+                _tw = th * dw / dh;
+                _th = th;
+            }
+            tx = dsx * _tw - (_tw - tw) / 2.0;
+            ty = dsy * _th - (_th - th) / 2.0;
+            break; }
+        case IMAGE_SCALE_DOWN:
+            // object-fit: scale-down = either none or contain, whichever is smaller
+            if(dw >= tw && dh >= th) {
+                tx = dx + (tw - dw) / 2.0;
+                ty = dy + (th - dh) / 2.0;
+            } else {
+                float _tw, _th;
+                if(dw / dh < tw / th) {
+                    _tw = tw;
+                    _th = tw * dh / dw;
+                } else {
+                    _tw = th * dw / dh;
+                    _th = th;
+                }
+                tx = dsx * _tw - (_tw - tw) / 2.0;
+                ty = dsy * _th - (_th - th) / 2.0;
+            }
+            break;
+        case IMAGE_SCALE_NONE:
+            // object-fit: none (no resizing)
+            tx = dx + (tw - dw) / 2.0;
+            ty = dy + (th - dh) / 2.0;
+            break;
+        default: // error!
+            tx = tw / 2.0;
+            ty = th / 2.0;
+            break;
+    }
+
+    vec2 texcoord = vec2(tx / tw, 1 - ty / th);
+    if(0.0 <= texcoord.x && texcoord.x <= 1.0 && 0.0 <= texcoord.y && texcoord.y <= 1.0) {
+        vec4 t = texture(image, texcoord);
+        c = mix_over(t, c);
+    }
+    return c;
+}
+
+void main() {
+    // scissor
+    if(screen_pos.x < clip.x || screen_pos.x >= clip.z || screen_pos.y < clip.y || screen_pos.y >= clip.w) discard;
+
+    vec4 c = vec4(0,0,0,0);
+
+    int region = get_region();
+
+    // workaround switched-discard (issue #1042)
+    if(region == REGION_MARGIN_TOP)    discard;
+    if(region == REGION_MARGIN_RIGHT)  discard;
+    if(region == REGION_MARGIN_BOTTOM) discard;
+    if(region == REGION_MARGIN_LEFT)   discard;
+    if(region == REGION_OUTSIDE)       discard;
+
+    switch(region) {
+        case REGION_BORDER_TOP:    c = border_top_color;    break;
+        case REGION_BORDER_RIGHT:  c = border_right_color;  break;
+        case REGION_BORDER_BOTTOM: c = border_bottom_color; break;
+        case REGION_BORDER_LEFT:   c = border_left_color;   break;
+        case REGION_BACKGROUND:    c = background_color;    break;
+        default:                   c = COLOR_ERROR;         break;  // should never hit here
+    }
+
+    // apply image if used
+    if(bool(using_image)) c = mix_image(c);
+
+    c = vec4(c.rgb * c.a, c.a);
+
+    // https://wiki.blender.org/wiki/Reference/Release_Notes/2.83/Python_API
+    c = blender_srgb_to_framebuffer_space(c);
+
+    fragColor = c;
+    gl_FragDepth = gl_FragCoord.z * 0.999999; // fix for issue #915?
+}
@@ -0,0 +1,102 @@
+'''
+Copyright (C) 2022 CG Cookie
+http://cgcookie.com
+hello@cgcookie.com
+
+Created by Jonathan Denning, Jonathan Williamson
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from collections import OrderedDict
+
+
+class TextMetricsCache:
+    '''
+    bounded cache of text measurements, keyed by (text, fontsize, fontid).
+    single glyphs, single words, and all other strings are kept in separate tables, each
+    evicting its least recently used entries.  this way the glyphs and words that are measured
+    over and over (wrapping, cursor positions) are not pushed out by one-off strings such as
+    counters, coordinates, and timers.
+    '''
+
+    default_sizes = {
+        'glyph':  2048,
+        'word':   16384,
+        'string': 4096,
+    }
+
+    def __init__(self, **max_sizes):
+        self.max_sizes = dict(self.default_sizes)
+        self.max_sizes.update(max_sizes)
+        self._tables = { kind: OrderedDict() for kind in self.max_sizes }
+        self.reset_stats()
+
+    @staticmethod
+    def kind_of(text):
+        if len(text) <= 1: return 'glyph'
+        if ' ' in text or '\n' in text: return 'string'
+        return 'word'
+
+    def get(self, text, fontsize, fontid, fn_compute):
+        '''
+        returns cached measurements of text, calling fn_compute() to measure on a miss
+        '''
+        kind = self.kind_of(text)
+        table = self._tables[kind]
+        key = (text, fontsize, fontid)
+        value = table.get(key, None)
+        if value is not None:
+            table.move_to_end(key)
+            self._hits[kind] += 1
+            return value
+        self._misses[kind] += 1
+        value = table[key] = fn_compute()
+        if len(table) > self.max_sizes[kind]:
+            table.popitem(last=False)
+            self._evictions[kind] += 1
+        return value
+
+    def clear(self):
+        for table in self._tables.values(): table.clear()
+
+    def reset_stats(self):
+        self._hits      = { kind: 0 for kind in self.max_sizes }
+        self._misses    = { kind: 0 for kind in self.max_sizes }
+        self._evictions = { kind: 0 for kind in self.max_sizes }
+
+    def __len__(self):
+        return sum(len(table) for table in self._tables.values())
+
+    def stats(self):
+        ''' returns counts of hits, misses, evictions, and size (total and for each table) '''
+        tables = {
+            kind: {
+                'hits':      self._hits[kind],
+                'misses':    self._misses[kind],
+                'evictions': self._evictions[kind],
+                'size':      len(self._tables[kind]),
+                'max size':  self.max_sizes[kind],
+            }
+            for kind in self.max_sizes
+        }
+        total = lambda k: sum(table[k] for table in tables.values())
+        return {
+            'hits':      total('hits'),
+            'misses':    total('misses'),
+            'evictions': total('evictions'),
+            'size':      total('size'),
+            'max size':  total('max size'),
+            'tables':    tables,
+        }
@@ -28,12 +28,15 @@ import random
 import asyncio
 import inspect
 import traceback
+import zlib
 import contextlib
 from math import floor, ceil
 from inspect import signature
 from itertools import dropwhile, zip_longest
 from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
+
 import bpy
 import bgl
 import blf
@@ -44,9 +47,11 @@ from .ui_layout import UI_Layout
 from .ui_markdown import UI_Markdown
 from .ui_properties import UI_Element_Properties
 from .ui_utilities import UI_Element_Utils
-from .ui_settings import DEBUG_COLOR_CLEAN, DEBUG_PROPERTY, DEBUG_COLOR, DEBUG_DIRTY, DEBUG_LIST, CACHE_METHOD, ASYNC_IMAGE_LOADING
+from .ui_settings import DEBUG_COLOR_CLEAN, DEBUG_PROPERTY, DEBUG_COLOR, DEBUG_DIRTY, DEBUG_LIST, CACHE_METHOD, DRAW_BATCHED, ASYNC_IMAGE_LOADING
 
 from .ui_draw import ui_draw
+from .ui_drawlist import UI_DrawList
+from .ui_hitindex import UI_HitIndex
 from .ui_event import UI_Event
 
 from gpu.types import GPUOffScreen
@@ -64,12 +69,14 @@ from .useractions import ActionHandler
 from .boundvar import BoundVar
 from .debug import debugger, dprint, tprint
 from .decorators import debug_test_call, blender_version_wrapper, add_cache
+from .diskcache import DiskCache
 from .drawing import Drawing
 from .fontmanager import FontManager
 from .globals import Globals
 from .hasher import Hasher
 from .maths import Vec2D, Color, mid, Box2D, Size1D, Size2D, Point2D, RelPoint2D, Index2D, clamp, NumberUnit
 from .maths import floor_if_finite, ceil_if_finite
+from .pngdecode import decode_png
 from .profiler import profiler, time_it
 from .shaders import Shader
 from .utils import iter_head, any_args, join
@@ -91,9 +98,10 @@ dirty_flow
 
 - ignored if _dirtying_flow is True already
 - sets _dirtying_flow to True
-- possibly calls parent's dirty_flow
+- possibly sets _dirtying_descendant_flow of all ancestors
 - possibly calls children's dirty_flow
-- _layout() returns early if _dirtying_flow is False
+- _layout() returns early if _dirtying_flow is False, after reflowing descendants with _dirtying_descendant_flow
+- ancestor reflows only if a reflowed child changes size (see UI_Layout._layout_descendants)
 
 
 '''
@@ -218,19 +226,38 @@ def temp_bglbuffer(*args):
     del buf
 
 
+# decoded images are cached on disk, keyed by hash of png file contents.  bump version whenever
+# decoded values change
+image_diskcache = DiskCache('images', version=1, sources=[get_path_from_addon_common('common', 'pngdecode.py')])
+
+def decode_image_png(data):
+    # returns (height, width, 4) uint8 array of RGBA pixels
+    img = decode_png(data)
+    if img is None:
+        # format not handled by decode_png (interlaced, 16-bit, etc.), so use slower pure-Python reader
+        w,h,rows,m = png.Reader(bytes=data).asRGBA8()
+        img = np.array([np.frombuffer(bytes(r), dtype=np.uint8) for r in rows], dtype=np.uint8).reshape(h, w, 4)
+    return img
+
+@profiler.function
 def load_image_png(path):
-    # note: assuming 4 channels (rgba) per pixel!
-    w,h,d,m = png.Reader(path).asRGBA()
-    img = [[r[i:i+4] for i in range(0,w*4,4)] for r in d]
+    data = open(path, 'rb').read()
+    filename = image_diskcache.get_filename(os.path.splitext(os.path.basename(path))[0], data)
+    cached = image_diskcache.load(filename)
+    if cached is not None:
+        h, w, pixels = cached
+        return np.frombuffer(zlib.decompress(pixels), dtype=np.uint8).reshape(h, w, 4)
+    img = decode_image_png(data)
+    h, w, _ = img.shape
+    image_diskcache.save(filename, (h, w, zlib.compress(img.tobytes(), 1)))
     return img
 
+@profiler.function
 def load_image_apng(path):
+    # only first frame is loaded
     im_apng = APNG.open(path)
-    print('load_image_apng', path, im_apng, im_apng.frames, im_apng.num_plays)
     im,control = im_apng.frames[0]
-    w,h = control.width,control.height
-    img = [[r[i:i+4] for i in range(0,w*4,4)] for r in d]
-    return img
+    return decode_image_png(im.to_bytes())
 
 @add_cache('_cache', {})
 def load_image(fn):
@@ -286,10 +313,10 @@ def load_texture(fn_image, mag_filter=bgl.GL_NEAREST, min_filter=bgl.GL_LINEAR,
     if fn_image not in load_texture._cache:
         if image is None: image = load_image(fn_image)
         # print(f'UI: Buffering texture "{fn_image}"')
-        height,width,depth = len(image),len(image[0]),len(image[0][0])
+        image = np.asarray(image, dtype=np.uint8)
+        height,width,depth = image.shape
         assert depth == 4, 'Expected texture %s to have 4 channels per pixel (RGBA), not %d' % (fn_image, depth)
-        image = reversed(image) # flip image
-        image_flat = [d for r in image for c in r for d in c]
+        image_flat = image[::-1].ravel().tolist()   # flip image
         with temp_bglbuffer(bgl.GL_INT, [1]) as buf:
             bgl.glGenTextures(1, buf)
             texid = buf[0]
@@ -383,6 +410,8 @@ class UI_Element_Dirtiness:
         if properties is None: properties = set(UI_Element_Utils._cleaning_graph_nodes)
         elif type(properties) is str:  properties = {properties}
         elif type(properties) is list: properties = set(properties)
+        # anything but re-rendering might change visibility, hoverability, or children
+        if properties != {'renderbuf'}: UI_HitIndex.invalidate()
         properties -= self._dirty_properties    # ignore dirtying properties that are already dirty
         if not properties: return               # no new dirtiness
         # if getattr(self, '_cleaning', False): print(f'{self} was dirtied ({properties}) while cleaning')
@@ -398,7 +427,8 @@ class UI_Element_Dirtiness:
         self._dirty_propagation['parent'].add('renderbuf')
 
         if propagate_up: self.propagate_dirtiness_up()
-        self.dirty_flow(children=False)
+        # re-rendering alone does not change layout
+        if properties - {'renderbuf'}: self.dirty_flow(children=False)
         # print(f'{self} had {properties} dirtied, because {cause}')
         tag_redraw_all("UI_Element dirty")
 
@@ -438,14 +468,22 @@ class UI_Element_Dirtiness:
 
     @profiler.function
     def dirty_flow(self, parent=True, children=True):
+        # ancestors only need to reflow if size of self changes, which is checked during layout
+        if parent and self._parent and not self._do_not_dirty_parent:
+            self._parent.dirty_descendant_flow()
         if self._dirtying_flow and self._dirtying_children_flow: return
-        if not self._dirtying_flow:
-            if parent and self._parent and not self._do_not_dirty_parent:
-                self._parent.dirty_flow(children=False)
-            self._dirtying_flow = True
+        self._dirtying_flow = True
         self._dirtying_children_flow |= self._computed_styles.get('display', 'block') == 'table'
         tag_redraw_all("UI_Element dirty_flow")
 
+    def dirty_descendant_flow(self):
+        # NOTE: always walks up to root, because flags of hidden or deferred elements are not cleared by layout
+        e = self
+        while e:
+            e._dirtying_descendant_flow = True
+            if e._do_not_dirty_parent: break
+            e = e._parent
+
     @property
     def is_dirty(self):
         return any_args(
@@ -764,6 +802,9 @@ class UI_Element(
         self._blocks               = None
         self._blocks_abs           = None
         self._children_text_min_size = None
+        self._layout_kwargs        = None       # constraints given by parent in last call to _layout
+        self._layout_children      = set()      # children that were laid out in last reflow of self
+        self._view_size_given      = None       # size given by parent in last call to set_view_size
 
         #######################################
         # properties for text input
@@ -848,6 +889,9 @@ class UI_Element(
         self._textshadow       = None
         self._whitespace       = 'normal'
         self._cacheRenderBuf   = None   # GPUOffScreen buffer
+        self._drawlist         = None   # UI_DrawList built in last draw (see DRAW_BATCHED)
+        self._hit_index        = None   # UI_HitIndex built in last draw (see get_under_mouse_indexed)
+        self._hit_index_wanted = False  # True: get_under_mouse_indexed was called without valid hit index
         self._dirty_renderbuf  = True
         self._style_trbl_cache = {}
 
@@ -865,6 +909,7 @@ class UI_Element(
         self._new_content = True
         self._dirtying_flow = True
         self._dirtying_children_flow = True
+        self._dirtying_descendant_flow = False  # a descendant needs to reflow, but self might not (see UI_Layout._layout_descendants)
         self._dirty_causes = []
         self._dirty_callbacks = { k:set() for k in UI_Element_Utils._cleaning_graph_nodes }
         self._dirty_propagation = {             # contains deferred dirty propagation for parent and children; parent will be dirtied later
@@ -1774,6 +1819,7 @@ class UI_Element(
             abs_pos = parent_pos + rel_pos + rel_offset + align_offset
             abs_size = self._absolute_size
 
+        ltwh = (self._l, self._t, self._w, self._h)
         self._absolute_pos = abs_pos + self._scroll_offset
         self._l = ceil_if_finite(abs_pos.x - 0.01)
         self._t = floor_if_finite(abs_pos.y + 0.01)
@@ -1781,6 +1827,7 @@ class UI_Element(
         self._h = ceil_if_finite(abs_size.height)
         self._r = ceil_if_finite(self._l + (self._w - 0.01))
         self._b = floor_if_finite(self._t - (self._h - 0.01))
+        if ltwh != (self._l, self._t, self._w, self._h): UI_HitIndex.invalidate()
 
         if recurse_children:
             for child in self._children_all:
@@ -1976,6 +2023,14 @@ class UI_Element(
         bgl.glBlendFunc(bgl.GL_ONE, bgl.GL_ONE_MINUS_SRC_ALPHA)
         # Globals.drawing.glCheckError('UI_Element.draw: setup ltwh')
         self._setup_ltwh()
+        if self._hit_index_wanted and not (self._hit_index and self._hit_index.is_valid):
+            # positions are up-to-date now, so rebuild hit index used by get_under_mouse_indexed
+            self._hit_index = UI_HitIndex(self)
+            self._hit_index_wanted = False
+        if DRAW_BATCHED and not DEBUG_COLOR_CLEAN and ui_draw.can_draw_batched:
+            self._drawlist = UI_DrawList.build(self, ScissorStack.get_current_view(), previous=self._drawlist)
+            self._drawlist.draw()
+            return
         # Globals.drawing.glCheckError('UI_Element.draw: cache')
         self._cache()
         # Globals.drawing.glCheckError('UI_Element.draw: draw')
@@ -2024,6 +2079,13 @@ class UI_Element(
             if under: return under
         return self
 
+    def get_under_mouse_indexed(self, p:Point2D):
+        # same as get_under_mouse, but uses UI_HitIndex built in last draw while it is still valid
+        if self._hit_index and self._hit_index.is_valid:
+            return self._hit_index.get_under_mouse(p)
+        self._hit_index_wanted = True
+        return self.get_under_mouse(p)
+
     def get_mouse_distance(self, p:Point2D):
         l,t,w,h = self._l, self._t, self._w, self._h
         r,b = l+(w-1),t-(h-1)
@@ -234,7 +234,7 @@ class UI_Document:
 
         self._mx,self._my = self.actions.mouse if self.actions.mouse else (-1,-1)
         if not self.ignore_hover_change:
-            self._under_mouse = self._body.get_under_mouse(self.actions.mouse)
+            self._under_mouse = self._body.get_under_mouse_indexed(self.actions.mouse)
             if self._sticky_element:
                 if self._sticky_element.get_mouse_distance(self.actions.mouse) < self._sticky_dist * self._ui_scale:
                     if self._under_mouse is None or not self._under_mouse.is_descendant_of(self._sticky_element):
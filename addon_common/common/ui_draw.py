@@ -45,6 +45,8 @@ from .utils import iter_head, any_args, join
 class UI_Draw:
     _initialized = False
     _stylesheet = None
+    _create_batch = None
+    _draw_batch = None
 
     @blender_version_wrapper('<=', '2.79')
     def init_draw(self):
@@ -184,6 +186,35 @@ class UI_Draw:
 
         UI_Draw._draw = draw
 
+        # batched shader draws many quads (see UI_DrawList) with a single draw call
+        print(f'Addon Common: compiling batched UI shader')
+        try:
+            vertex_shader, fragment_shader = Shader.parse_file('ui_element_batched.glsl', includeVersion=False)
+            shader_batched = gpu.types.GPUShader(vertex_shader, fragment_shader)
+            Drawing.glCheckError(f'Compiled batched UI Shader {shader_batched}')
+        except Exception as e:
+            print(f'Addon Common: could not compile batched UI shader, drawing UI elements individually')
+            print(f'  {e}')
+            return
+
+        def create_batch(vertex_arrays):
+            nonlocal shader_batched
+            return batch_for_shader(shader_batched, 'TRIS', vertex_arrays)
+
+        def draw_batch(batch, texture_id=None, atex=bgl.GL_TEXTURE0):
+            nonlocal shader_batched, get_MVP_matrix
+            shader_batched.bind()
+            shader_batched.uniform_float('uMVPMatrix', get_MVP_matrix())
+            shader_batched.uniform_int(  'using_image', 1 if texture_id is not None else 0)
+            shader_batched.uniform_int(  'image',       atex - bgl.GL_TEXTURE0)
+            if texture_id is not None:
+                bgl.glActiveTexture(atex)
+                bgl.glBindTexture(bgl.GL_TEXTURE_2D, texture_id)
+            batch.draw(shader_batched)
+
+        UI_Draw._create_batch = create_batch
+        UI_Draw._draw_batch = draw_batch
+
     def __init__(self):
         if bpy.app.background: return
         if not UI_Draw._initialized:
@@ -214,5 +245,13 @@ class UI_Draw:
         #if texture_id != -1: print('texture_fit', texture_fit)
         UI_Draw._draw(left, top, width, height, dpi_mult, style, texture_id, texture_fit, background_override, depth)
 
+    @property
+    def can_draw_batched(self):
+        return UI_Draw._draw_batch is not None
+    def create_batch(self, vertex_arrays):
+        return UI_Draw._create_batch(vertex_arrays)
+    def draw_batch(self, batch, texture_id=None):
+        UI_Draw._draw_batch(batch, texture_id)
+
 
 ui_draw = Globals.set(UI_Draw())
@@ -0,0 +1,303 @@
+'''
+Copyright (C) 2022 CG Cookie
+http://cgcookie.com
+hello@cgcookie.com
+
+Created by Jonathan Denning, Jonathan Williamson
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import bgl
+
+from .drawing import ScissorStack
+from .fontmanager import FontManager as fm
+from .globals import Globals
+from .maths import NumberUnit, mid
+from .profiler import profiler
+from .ui_draw import ui_draw
+
+
+'''
+UI_DrawList is a flat list of everything UI_Element.draw would draw, built with a single walk of
+the visible tree (same order, visibility tests, and scissoring as UI_Element._draw_real).
+
+- margins, borders, backgrounds, and images of elements become quads, drawn by the batched UI
+  shader (ui_element_batched.glsl) with one draw call per batch.  elements that would draw nothing
+  (transparent background and border, no image) are skipped
+- text becomes runs (text, position, font, color) that are drawn without re-setting font state
+  for every run
+- scissoring of quads is done in the shader (clip attribute) and of text runs with glScissor
+
+commands are put into batches of same kind (quads with same texture, or text).  a command joins
+the most recent batch of its kind only if nothing drawn after that batch overlaps the command,
+so the result looks the same as drawing each element in tree order.  overlap is tested
+conservatively on a coarse grid of screen cells.
+'''
+
+
+def _rgba(c):
+    if type(c) in {float, int}: return (c, c, c, 1.0)
+    c = tuple(c)
+    return c if len(c) == 4 else (*c, 1.0)
+
+
+class UI_DrawBatch:
+    # attributes of batched UI shader, in order of quad tuples (see UI_DrawList._add_quad)
+    quad_attributes = [
+        'in_box',                   # left, top, width, height
+        'in_margin',                # left, right, top, bottom
+        'in_padding',               # left, right, top, bottom
+        'in_border',                # width, radius, depth, image fit
+        'in_border_left_color',
+        'in_border_right_color',
+        'in_border_top_color',
+        'in_border_bottom_color',
+        'in_background_color',
+        'in_clip',                  # left, bottom, right, top (right and top are exclusive)
+    ]
+    quad_corners = [(0,0), (1,0), (1,1),  (1,1), (0,1), (0,0)]
+
+    def __init__(self, kind, texture_id=None):
+        self.kind = kind                # 'quads' or 'text'
+        self.texture_id = texture_id    # only used for quads
+        self.items = []                 # quads: tuples of vec4s (see quad_attributes); text: runs (see UI_DrawList._add_text)
+        self.orders = []                # position of each item in tree order (used for verifying)
+        self.bounds = []                # clipped (left, bottom, right, top) of each item (used for verifying)
+        self._gpu_batch = None
+
+    @property
+    def key(self):
+        return (self.kind, self.texture_id)
+
+    def add(self, item, order, bounds):
+        self.items.append(item)
+        self.orders.append(order)
+        self.bounds.append(bounds)
+
+    def vertex_arrays(self):
+        ''' returns CPU-side vertex attribute arrays for quads (6 vertices, 2 triangles, per quad) '''
+        attributes = { name: [] for name in self.quad_attributes }
+        attributes['pos'] = self.quad_corners * len(self.items)
+        for quad in self.items:
+            for name, value in zip(self.quad_attributes, quad):
+                attributes[name].extend((value,) * 6)
+        return attributes
+
+    @profiler.function
+    def draw(self):
+        if self.kind == 'quads':
+            if self._gpu_batch is None:
+                self._gpu_batch = ui_draw.create_batch(self.vertex_arrays())
+            ui_draw.draw_batch(self._gpu_batch, self.texture_id)
+            return
+
+        size_prev, fontid_prev = Globals.drawing.fontsize, Globals.drawing.fontid
+        font, color, clip = None, None, None
+        for (text, x, y, fontid, fontsize, fontcolor, textclip) in self.items:
+            if textclip != clip:
+                if clip: ScissorStack.pop()
+                clip = textclip
+                ScissorStack.push(*clip, clamp=False)
+            if (fontid, fontsize) != font:
+                font = (fontid, fontsize)
+                Globals.drawing.set_font_size(fontsize, fontid=fontid)
+            if (fontid, fontcolor) != color:
+                color = (fontid, fontcolor)
+                Globals.drawing.set_font_color(fontid, fontcolor)
+            fm.draw(text, xyz=(x, y, 0), fontid=fontid)
+        if clip: ScissorStack.pop()
+        if fontid_prev is not None: Globals.drawing.set_font_size(size_prev, fontid=fontid_prev)
+        # blf.draw overwrites blend settings
+        bgl.glEnable(bgl.GL_BLEND)
+        bgl.glBlendFunc(bgl.GL_ONE, bgl.GL_ONE_MINUS_SRC_ALPHA)
+
+
+class UI_DrawList:
+    cell_size = 64      # size (in pixels) of grid cells used to test overlap between batches
+
+    def __init__(self):
+        self.batches = []
+        self.count = 0                  # number of commands (quads and text runs)
+        self._last_batch = {}           # batch key -> index of most recent batch with that key
+        self._cells = {}                # grid cell -> index of most recent batch drawing into cell
+
+    @staticmethod
+    @profiler.function
+    def build(root, view, previous=None):
+        '''
+        builds draw list for root and its visible descendants.
+        view is (l,t,w,h) of scissor box that root is drawn in (see ScissorStack).
+        GPU batches of previous draw list are reused for batches that did not change.
+        '''
+        drawlist = UI_DrawList()
+        drawlist._dpi_mult = Globals.drawing.get_dpi_mult()
+        size_prev, fontid_prev = Globals.drawing.fontsize, Globals.drawing.fontid
+        drawlist._add_element(root, (0, 0), view, None)
+        if fontid_prev is not None: Globals.drawing.set_font_size(size_prev, fontid=fontid_prev)
+        if previous: drawlist._reuse_gpu_batches(previous)
+        return drawlist
+
+    @profiler.function
+    def draw(self):
+        bgl.glEnable(bgl.GL_BLEND)
+        bgl.glBlendFunc(bgl.GL_ONE, bgl.GL_ONE_MINUS_SRC_ALPHA)
+        for batch in self.batches:
+            batch.draw()
+
+    def _reuse_gpu_batches(self, previous):
+        prev_batches = {}
+        for batch in previous.batches:
+            if batch.kind == 'quads' and batch._gpu_batch is not None:
+                prev_batches.setdefault((batch.texture_id, len(batch.items)), []).append(batch)
+        if not prev_batches: return
+        for batch in self.batches:
+            if batch.kind != 'quads': continue
+            for prev in prev_batches.get((batch.texture_id, len(batch.items)), []):
+                if prev.items == batch.items:
+                    batch._gpu_batch = prev._gpu_batch
+                    break
+
+    @staticmethod
+    def _clip(clip, nl, nt, nw, nh):
+        # same as clamped ScissorStack.push
+        pl, pt, pw, ph = clip
+        pr, pb = pl + (pw - 1), pt - (ph - 1)
+        nr, nb = nl + (nw - 1), nt - (nh - 1) - 1
+        cl, cr, ct, cb = mid(nl,pl,pr), mid(nr,pl,pr), mid(nt,pt,pb), mid(nb,pt,pb)
+        cw, ch = max(0, cr - cl + 1), max(0, ct - cb + 1)
+        return (int(cl), int(ct), int(cw), int(ch))
+
+    @staticmethod
+    def _is_box_visible(clip, l, t, w, h):
+        # same as ScissorStack.is_box_visible
+        if w <= 0 or h <= 0: return False
+        vl, vt, vw, vh = clip
+        if vw <= 0 or vh <= 0: return False
+        vr, vb = vl + (vw - 1), vt - (vh - 1)
+        r, b = l + (w - 1), t - (h - 1)
+        return not (l > vr or r < vl or t < vb or b > vt)
+
+    def _add_command(self, key, item, bounds):
+        # find cells covered by command, and latest batch drawing into any of them
+        l, b, r, t = bounds
+        cs = self.cell_size
+        cells = [
+            (x, y)
+            for x in range(int(l // cs), int((r - 1) // cs) + 1)
+            for y in range(int(b // cs), int((t - 1) // cs) + 1)
+        ]
+        last_overlap = max((self._cells.get(cell, -1) for cell in cells), default=-1)
+        idx = self._last_batch.get(key, -1)
+        if idx < 0 or idx < last_overlap:
+            # something drawn after most recent batch of same kind overlaps command; start new batch
+            idx = len(self.batches)
+            self.batches.append(UI_DrawBatch(*key))
+            self._last_batch[key] = idx
+        self.batches[idx].add(item, self.count, bounds)
+        self.count += 1
+        for cell in cells:
+            if self._cells.get(cell, -1) < idx: self._cells[cell] = idx
+
+    def _add_quad(self, elem, ol, ot, clip):
+        sc = self._style_cache_values(elem)
+        if sc is None: return
+        texture_id = elem._image_data['texid'] if elem._src in {'image', 'image loading'} else None
+        margin, padding, border_width, border_radius, colors = sc
+        if texture_id is None and colors[4][3] <= 0 and (border_width <= 0 or all(c[3] <= 0 for c in colors[:4])):
+            # nothing would be drawn
+            return
+        texture_fit = ui_draw.texture_fit_map.get(elem._computed_styles.get('object-fit', 'fill'), 0)
+        cl, ct, cw, ch = clip
+        cr, cb = cl + cw, ct - (ch - 1)
+        # clipped bounds of quad (left, bottom, right, top), right and top are exclusive
+        bounds = (max(ol, cl), max(ot - elem._h + 1, cb), min(ol + elem._w, cr), min(ot + 1, ct + 1))
+        if bounds[0] >= bounds[2] or bounds[1] >= bounds[3]: return
+        quad = (
+            (ol, ot, elem._w, elem._h),
+            margin,
+            padding,
+            (border_width, border_radius, len(elem._selector), texture_fit),
+            *colors,
+            (cl, cb, cr, ct + 1),
+        )
+        self._add_command(('quads', texture_id), quad, bounds)
+
+    def _style_cache_values(self, elem):
+        sc = elem._style_cache
+        if not sc: return None
+        def get_v(k, default):
+            v = sc.get(k, default)
+            if type(v) is NumberUnit: v = v.val() * self._dpi_mult
+            return v
+        margin  = tuple(float(get_v(f'margin-{side}',  0)) for side in ('left', 'right', 'top', 'bottom'))
+        padding = tuple(float(get_v(f'padding-{side}', 0)) for side in ('left', 'right', 'top', 'bottom'))
+        colors  = tuple(
+            _rgba(get_v(k, (0,0,0,0)))
+            for k in ('border-left-color', 'border-right-color', 'border-top-color', 'border-bottom-color', 'background-color')
+        )
+        return (margin, padding, float(get_v('border-width', 0)), float(get_v('border-radius', 0)), colors)
+
+    def _add_text(self, elem, ol, ot, clip, text_state):
+        if not elem._innerTextAsIs or not text_state: return
+        fontid, fontsize, color, line_base = text_state
+        l, t = round(ol), round(ot)
+        cl, ct, cw, ch = clip
+        bounds = (max(l, cl), max(t - elem._h + 1, ct - (ch - 1)), min(l + elem._w, cl + cw), min(t + 1, ct + 1))
+        if bounds[0] >= bounds[2] or bounds[1] >= bounds[3]: return
+        self._add_command(('text', None), (elem._innerTextAsIs, l, t - line_base, fontid, fontsize, color, clip), bounds)
+
+    def _add_element(self, elem, offset, clip, text_state):
+        # mirrors UI_Element._draw, _draw_cache (without render buffers), and _draw_real
+        if not elem.is_visible: return
+        if elem._w <= 0 or elem._h <= 0: return
+        ox, oy = offset
+        if not self._is_box_visible(clip, elem._l + ox, elem._t + oy, elem._w, elem._h): return
+        clip = self._clip(clip, elem._l + ox, elem._t + oy, elem._w, elem._h)
+
+        ol, ot = int(elem._l + ox), int(elem._t + oy)
+        self._add_quad(elem, ol, ot, clip)
+
+        # compute inner scissor area
+        sc = elem._style_cache
+        ml, mr, mt, mb = sc['margin-left'],  sc['margin-right'],  sc['margin-top'],  sc['margin-bottom']
+        pl, pr, pt, pb = sc['padding-left'], sc['padding-right'], sc['padding-top'], sc['padding-bottom']
+        bw = sc['border-width']
+        styles = elem._computed_styles
+        if styles.get('overflow-x', 'visible') != 'visible' or styles.get('overflow-y', 'visible') != 'visible':
+            clip = self._clip(
+                clip,
+                round(elem._l + (ml + bw + pl) + ox),
+                round(elem._t - (mt + bw + pt) + oy),
+                round(elem._w - ((ml + bw + pl) + (pr + bw + mr))),
+                round(elem._h - ((mt + bw + pt) + (pb + bw + mb))),
+            )
+
+        if elem._innerText is not None:
+            Globals.drawing.set_font_size(elem._fontsize, fontid=elem._fontid)
+            line_base = Globals.drawing.line_base
+            if elem._textshadow is not None:
+                tsx, tsy, tsc = elem._textshadow
+                offset2 = (int(ox + tsx), int(oy - tsy))
+                shadow_state = (elem._fontid, elem._fontsize, _rgba(tsc), line_base)
+                for child in elem._children_all_sorted:
+                    self._add_element(child, offset2, clip, shadow_state)
+            text_state = (elem._fontid, elem._fontsize, _rgba(elem._fontcolor), line_base)
+            for child in elem._children_all_sorted:
+                self._add_element(child, offset, clip, text_state)
+        elif elem._innerTextAsIs is not None:
+            self._add_text(elem, ol, ot, clip, text_state)
+        else:
+            for child in elem._children_all_sorted:
+                self._add_element(child, offset, clip, text_state)
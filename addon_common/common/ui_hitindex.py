@@ -0,0 +1,91 @@
+'''
+Copyright (C) 2022 CG Cookie
+http://cgcookie.com
+hello@cgcookie.com
+
+Created by Jonathan Denning, Jonathan Williamson
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import math
+
+from .profiler import profiler
+
+
+class UI_HitIndex:
+    '''
+    flattened version of UI_Element.get_under_mouse, so finding the element under the mouse does
+    not need to walk the tree.
+
+    every element that get_under_mouse could return is stored as a rect, clipped to rects of its
+    ancestors (get_under_mouse only descends into an element if mouse is over it).  rects are
+    listed in the order get_under_mouse would visit them (pre-order, children in order), so the
+    element found by get_under_mouse is the last rect that contains the mouse.  rects are bucketed
+    into a grid of screen cells, last rect first, so a lookup only tests rects of one cell.
+
+    positions of elements only change when drawing (see UI_Element._setup_ltwh), but visibility,
+    hoverability, and children can change at any time.  any such change calls invalidate(), and
+    an index is only valid while no change happened since it was built.
+    '''
+
+    cell_size = 64
+    generation = 0      # incremented whenever hit index of any element might change
+
+    @staticmethod
+    def invalidate():
+        UI_HitIndex.generation += 1
+
+    @profiler.function
+    def __init__(self, root):
+        self.generation = UI_HitIndex.generation
+        self.rects = []     # (l, b, r, t, element), inclusive bounds
+        self.cells = {}     # (x, y) cell -> indices into rects, last first
+        if root._w < 1 or root._h < 1 or not all(math.isfinite(v) for v in (root._l, root._t, root._w, root._h)):
+            # root has not been positioned
+            self.generation = None
+            return
+        self._add(root, root._l, root._b, root._r, root._t)
+        cs = self.cell_size
+        for idx in range(len(self.rects) - 1, -1, -1):
+            l, b, r, t, _ = self.rects[idx]
+            for x in range(math.floor(l / cs), math.floor(r / cs) + 1):
+                for y in range(math.floor(b / cs), math.floor(t / cs) + 1):
+                    self.cells.setdefault((x, y), []).append(idx)
+
+    def _add(self, elem, cl, cb, cr, ct):
+        # same tests as UI_Element.get_under_mouse
+        if elem._pseudoelement: return
+        if elem._w < 1 or elem._h < 1: return
+        l, b, r, t = max(cl, elem._l), max(cb, elem._b), min(cr, elem._r), min(ct, elem._t)
+        if l > r or b > t: return
+        if not elem.is_visible: return
+        if not elem.can_hover: return
+        self.rects.append((l, b, r, t, elem))
+        if elem._atomic: return
+        for child in elem._children:
+            self._add(child, l, b, r, t)
+
+    @property
+    def is_valid(self):
+        return self.generation == UI_HitIndex.generation
+
+    def get_under_mouse(self, p):
+        if p is None: return None
+        cs = self.cell_size
+        rects = self.rects
+        for idx in self.cells.get((math.floor(p.x / cs), math.floor(p.y / cs)), ()):
+            l, b, r, t, elem = rects[idx]
+            if l <= p.x <= r and b <= p.y <= t: return elem
+        return None
@@ -146,6 +146,7 @@ class UI_Layout:
         styles    = self._computed_styles
         style_pos = styles.get('position', 'static')
 
+        self._layout_kwargs   = kwargs
         self._fitting_pos     = fitting_pos
         self._fitting_size    = fitting_size
         self._parent_size     = parent_size
@@ -158,7 +159,9 @@ class UI_Layout:
         self.update_position()
 
         if not self._dirtying_flow and not self._dirtying_children_flow and not tabled:
-            return
+            # self is clean, but descendants might need to reflow
+            if not self._dirtying_descendant_flow or self._layout_descendants(): return
+            if DEBUG_LIST: self._debug_list.append(f'{time.ctime()} layout descendant changed size')
 
         if DEBUG_LIST:
             self._debug_list.append(f'{time.ctime()} layout self={self._dirtying_flow} children={self._dirtying_children_flow} fitting_size={fitting_size}')
@@ -433,8 +436,38 @@ class UI_Layout:
             sz = Size2D(width=w, height=h)
             element.set_view_size(sz)
 
+        self._layout_children = {
+            element
+            for block in (self._blocks or []) for element in block
+            if element.is_visible
+        } | {
+            element
+            for element in (self._blocks_abs or [])
+            if element.is_visible
+        }
         self._dirtying_flow = False
         self._dirtying_children_flow = False
+        self._dirtying_descendant_flow = False
+
+    @profiler.function
+    def _layout_descendants(self):
+        '''
+        reflows only the children (and their descendants) that need it, reusing the constraints
+        given to them in last reflow of self.  returns True if all reflowed children kept their
+        size, so layout of self is unchanged.  returns False if self must reflow, because a child
+        changed size or visibility, was not laid out by self before, or is part of a table.
+        '''
+        self._dirtying_descendant_flow = False
+        for child in self._children_all or []:
+            if not (child._dirtying_flow or child._dirtying_children_flow or child._dirtying_descendant_flow): continue
+            kwargs = child._layout_kwargs
+            if not kwargs or kwargs.get('table_data'): return False
+            if child not in self._layout_children or not child.is_visible: return False
+            size = child._dynamic_full_size
+            child._layout(**kwargs)
+            if child._dynamic_full_size != size: return False
+            if child._view_size_given: child.set_view_size(child._view_size_given)
+        return True
 
 
     @profiler.function
@@ -508,6 +541,7 @@ class UI_Layout:
         # TODO: clamp scroll
         # TODO: handle vertical and horizontal element alignment
         # TODO: handle justified and right text alignment
+        self._view_size_given = size
         if self.width_override is not None or self.height_override is not None:
             size = size.clone()
             if self.width_override  is not None: size.set_all_widths( self.width_override)
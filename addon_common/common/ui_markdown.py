@@ -32,6 +32,7 @@ import traceback
 import functools
 import urllib.request
 from itertools import chain
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 
 import bpy
@@ -44,6 +45,7 @@ from .ui_styling import UI_Styling
 from .blender import get_path_from_addon_root, get_path_from_addon_common
 from .boundvar import BoundVar, BoundFloat, BoundInt, BoundString, BoundStringToBool, BoundBool
 from .decorators import blender_version_wrapper
+from .diskcache import DiskCache
 from .drawing import Drawing, ScissorStack
 from .fontmanager import FontManager
 from .globals import Globals
@@ -109,7 +111,50 @@ def load_text_file(path):
         assert False
 
 
+_mdown_files = {}
+def load_mdown_file(path):
+    # contents of markdown files, keyed by path and mtime
+    try: mtime = os.path.getmtime(path)
+    except: return load_text_file(path)
+    cached = _mdown_files.get(path, None)
+    if not cached or cached[0] != mtime:
+        cached = _mdown_files[path] = (mtime, load_text_file(path))
+    return cached[1]
+
+
 class UI_Markdown:
+    # parsed markdown (see Markdown.parse), keyed by preprocessed text.  parsed help documents are
+    # also cached on disk, so their parse is skipped on later starts
+    _parsed_cache = OrderedDict()
+    _parsed_cache_max = 64
+    _parsed_diskcache = DiskCache('markdown', sources=[get_path_from_addon_common('common', 'markdown.py')])
+    _subtrees_max = 8
+
+    @staticmethod
+    @profiler.function
+    def get_parsed_markdown(mdown, name=None):
+        cache = UI_Markdown._parsed_cache
+        nodes = cache.get(mdown, None)
+        if nodes is not None:
+            cache.move_to_end(mdown)
+            return nodes
+        diskcache = UI_Markdown._parsed_diskcache
+        filename = diskcache.get_filename(os.path.splitext(os.path.basename(name))[0], mdown) if name else None
+        nodes = diskcache.load(filename)
+        if nodes is None:
+            nodes = Markdown.parse(mdown)
+            diskcache.save(filename, nodes)
+        cache[mdown] = nodes
+        if len(cache) > UI_Markdown._parsed_cache_max: cache.popitem(last=False)
+        return nodes
+
+    @staticmethod
+    def iter_html(nodes):
+        # yields html of all inline html fragments in parsed markdown
+        for (tagName, attribs, children) in nodes:
+            if tagName == 'html': yield attribs['html']
+            if children: yield from UI_Markdown.iter_html(children)
+
     @profiler.function
     def set_markdown(self, mdown=None, *, mdown_path=None, preprocess_fns=None, f_globals=None, f_locals=None, frame_depth=1, frames_deep=1, remove_indentation=True, **kwargs):
         if f_globals and f_locals:
@@ -136,7 +181,7 @@ class UI_Markdown:
         self._src_mdown_path = mdown_path or ''
 
         if mdown_path:
-            mdown = load_text_file(get_mdown_path(mdown_path))
+            mdown = load_mdown_file(get_mdown_path(mdown_path))
         if remove_indentation and mdown:
             indent = min((
                 len(line) - len(line.lstrip())
@@ -154,182 +199,48 @@ class UI_Markdown:
         if getattr(self, '__mdown', None) == mdown: return  # ignore updating if it's exactly the same as previous
         self.__mdown = mdown                                # record the mdown to prevent reprocessing same
 
-        def process_words(text, word_fn):
-            build = ''
-            while text:
-                word,text = Markdown.split_word(text)
-                build += word
-                #word_fn(word)
-            word_fn(build)
-
-        def process_para(container, para, **kwargs):
-            with container.defer_dirty('creating new children'):
-                opts = kwargopts(kwargs, classes='')
-
-                # break each ui_item onto it's own line
-                para = re.sub(r'\n', ' ', para)     # join sentences of paragraph
-                para = re.sub(r' +', ' ', para)     # 1+ spaces => 1 space
-
-                # TODO: revisit this, and create an actual parser
-                para = para.lstrip()
-                while para:
-                    t,m = Markdown.match_inline(para)
-                    if t is None:
-                        build = ''
-                        while t is None and para:
-                            word,para = Markdown.split_word(para)
-                            build += word
-                            t,m = Markdown.match_inline(para)
-                        container.append_new_child(tagName='text', innerText=build, pseudoelement='text')
-                    else:
-                        if t == 'br':
-                            container.append_new_child(tagName='BR')
-                        elif t == 'arrow':
-                            d = {   # https://www.toptal.com/designers/htmlarrows/arrows/
-                                'uarr': '↑',
-                                'darr': '↓',
-                                'larr': '←',
-                                'rarr': '→',
-                                'harr': '↔',
-                                'varr': '↕',
-                                'uArr': '⇑',
-                                'dArr': '⇓',
-                                'lArr': '⇐',
-                                'rArr': '⇒',
-                                'hArr': '⇔',
-                                'vArr': '⇕',
-                            }[m.group('dir')]
-                            container.append_new_child(tagName='span', classes='html-arrow', innerText=f'{d}')
-                        elif t == 'img':
-                            style = m.group('style').strip() or None
-                            container.append_new_child(tagName='img', classes='inline', style=style, src=m.group('filename'), title=m.group('caption'))
-                        elif t == 'code':
-                            container.append_new_child(tagName='code', innerText=m.group('text'))
-                        elif t == 'link':
-                            link = m.group('link')
-                            title = 'Click to open URL in default web browser' if Markdown.is_url(link) else 'Click to open help'
-                            def mouseclick():
-                                if Markdown.is_url(link):
-                                    bpy.ops.wm.url_open(url=link)
-                                else:
-                                    self.set_markdown(mdown_path=link, preprocess_fns=preprocess_fns, f_globals=f_globals, f_locals=f_locals)
-                            process_words(m.group('text'), lambda word: container.append_new_child(tagName='a', innerText=word, href=link, title=title, on_mouseclick=mouseclick))
-                        elif t == 'bold':
-                            process_words(m.group('text'), lambda word: container.append_new_child(tagName='b', innerText=word))
-                        elif t == 'italic':
-                            process_words(m.group('text'), lambda word: container.append_new_child(tagName='i', innerText=word))
-                        elif t == 'html':
-                            ui = container.append_new_children_fromHTML(m.group(), f_globals=f_globals, f_locals=f_locals)
-                        # elif t == 'checkbox':
-                        #     params = m.group('params')
-                        #     innertext = m.group('innertext')
-                        #     value = None
-                        #     for param in re.finditer(r'(?P<key>[a-zA-Z]+)(="(?P<val>.*?)")?', params):
-                        #         key = param.group('key')
-                        #         val = param.group('val')
-                        #         if key == 'type':
-                        #             pass
-                        #         elif key == 'value':
-                        #             value = val
-                        #         else:
-                        #             assert False, 'Unhandled checkbox parameter key="%s", val="%s" (%s)' % (key,val,param)
-                        #     assert value is not None, 'Unhandled checkbox parameters: expected value (%s)' % (params)
-                        #     # print('CREATING input_checkbox(label="%s", checked=BoundVar("%s", ...)' % (innertext, value))
-                        #     ui_label = container.append_new_child(tagName='label')
-                        #     ui_label.append_new_child(tagName='input', type='checkbox', checked=BoundVar(value, f_globals=f_globals, f_locals=f_locals))
-                        #     ui_label.append_new_child(tagName='text', innerText=innertext, pseudoelement='text')
-                        # elif t == 'button':
-                        #     ui_element = self.fromHTML(m.group(0), f_globals=f_globals, f_locals=f_locals)[0]
-                        #     container.append_child(ui_element)
-                        # elif t == 'progress':
-                        #     ui_element = self.fromHTML(m.group(0), f_globals=f_globals, f_locals=f_locals)[0]
-                        #     container.append_child(ui_element)
-                        else:
-                            assert False, 'Unhandled inline markdown type "%s" ("%s") with "%s"' % (str(t), str(m), line)
-                        para = para[m.end():]
-
-        def process_mdown(ui_container, mdown):
-            #paras = mdown.split('\n\n')         # split into paragraphs
-            paras = re.split(r'\n\n(?!    )', mdown)
-            for para in paras:
-                t,m = Markdown.match_line(para)
-
-                if t is None:
-                    p_element = ui_container.append_new_child(tagName='p')
-                    process_para(p_element, para)
-
-                elif t in ['h1','h2','h3']:
-                    ui_hn = ui_container.append_new_child(tagName=t)
-                    process_para(ui_hn, m.group('text'))
-
-                elif t == 'ul':
-                    ui_ul = ui_container.append_new_child(tagName='ul')
-                    with ui_ul.defer_dirty('creating ul children'):
-                        # add newline at beginning so that we can skip the first item (before "- ")
-                        skip_first = True
-                        para = f'\n{para}'
-                        for litext in re.split(r'\n- ', para):
-                            if skip_first:
-                                skip_first = False
-                                continue
-                            ui_li = ui_ul.append_new_child(tagName='li')
-                            if '\n' in litext:
-                                # remove leading spaces
-                                litext = '\n'.join(l.lstrip() for l in litext.split('\n'))
-                                process_mdown(ui_li, litext)
-                            else:
-                                process_para(ui_li, litext)
-
-                elif t == 'ol':
-                    ui_ol = ui_container.append_new_child(tagName='ol')
-                    with ui_ol.defer_dirty('creating ol children'):
-                        # add newline at beginning so that we can skip the first item (before "- ")
-                        skip_first = True
-                        para = f'\n{para}'
-                        for ili,litext in enumerate(re.split(r'\n\d+\. ', para)):
-                            if skip_first:
-                                skip_first = False
-                                continue
-                            ui_li = ui_ol.append_new_child(tagName='li')
-                            #ui_li.append_new_child(tagName='span', classes='number', innerText=f'{ili}.')
-                            #span_element = ui_li.append_new_child(tagName='span', classes='text')
-                            if '\n' in litext:
-                                # remove leading spaces
-                                litext = '\n'.join(l.strip() for l in litext.split('\n'))
-                                process_mdown(ui_li, litext)
-                            else:
-                                process_para(ui_li, litext)
-
-                elif t == 'img':
-                    style = m.group('style').strip() or None
-                    ui_container.append_new_child(tagName='img', style=style, src=m.group('filename'), title=m.group('caption'))
-
-                elif t == 'table':
-                    # table!
-                    def split_row(row):
-                        row = re.sub(r'^\| ', r'', row)
-                        row = re.sub(r' \|$', r'', row)
-                        return [col.strip() for col in row.split(' | ')]
-                    data = [l for l in para.split('\n')]
-                    header = split_row(data[0])
-                    add_header = any(header)
-                    align = data[1]
-                    data = [split_row(row) for row in data[2:]]
-                    rows,cols = len(data),len(data[0])
-                    table_element = ui_container.append_new_child(tagName='table')
-                    with table_element.defer_dirty('creating table children'):
-                        if add_header:
-                            tr_element = table_element.append_new_child(tagName='tr')
-                            for c in range(cols):
-                                tr_element.append_new_child(tagName='th', innerText=header[c])
-                        for r in range(rows):
-                            tr_element = table_element.append_new_child(tagName='tr')
-                            for c in range(cols):
-                                td_element = tr_element.append_new_child(tagName='td')
-                                process_para(td_element, data[r][c])
-
+        # link handlers look up bindings of the most recent call, so handlers of reused elements are not stale
+        self._mdown_bindings = (preprocess_fns, f_globals, f_locals)
+        def get_mouseclick(link):
+            def mouseclick():
+                if Markdown.is_url(link):
+                    bpy.ops.wm.url_open(url=link)
                 else:
-                    assert False, 'Unhandled markdown line type "%s" ("%s") with "%s"' % (str(t), str(m), para)
+                    preprocess_fns, f_globals, f_locals = self._mdown_bindings
+                    self.set_markdown(mdown_path=link, preprocess_fns=preprocess_fns, f_globals=f_globals, f_locals=f_locals)
+            return mouseclick
+
+        def build(ui_container, nodes):
+            for (tagName, attribs, children) in nodes:
+                if tagName == 'html':
+                    ui_container.append_new_children_fromHTML(attribs['html'], f_globals=f_globals, f_locals=f_locals)
+                    continue
+                if tagName == 'a':
+                    attribs = dict(attribs, on_mouseclick=get_mouseclick(attribs['href']))
+                ui = ui_container.append_new_child(tagName=tagName, **attribs)
+                if children:
+                    with ui.defer_dirty('creating new children'):
+                        build(ui, children)
+
+        # UI elements of recently shown help documents are kept, so revisiting a page only restyles it.
+        # elements built from html fragments are bound to the values of names they use, so elements are
+        # only reused when those names resolve to same values (f_globals and f_locals are new dicts
+        # whenever they are captured from calling frames).  entries keep keyed values alive, so ids in
+        # keys are not reused by other objects
+        if not hasattr(self, '_mdown_subtrees'): self._mdown_subtrees = OrderedDict()
+        subtrees = self._mdown_subtrees
+        nodes = UI_Markdown.get_parsed_markdown(mdown, name=mdown_path)
+        subtree_key, subtree_values = None, None
+        if mdown_path:
+            names = sorted({name for html in UI_Markdown.iter_html(nodes) for name in re.findall(r'[A-Za-z_]\w*', html)})
+            missing = object()
+            subtree_values = [f_locals.get(name, f_globals.get(name, missing)) for name in names]
+            value_key = lambda v: v if type(v) in {str, int, float, bool, type(None)} else id(v)
+            subtree_key = (
+                mdown,
+                tuple(preprocess_fns or []),
+                tuple((name, value_key(v) if v is not missing else None) for (name, v) in zip(names, subtree_values)),
+            )
 
         if self._document: self._document.defer_cleaning = True
 
@@ -337,7 +248,15 @@ class UI_Markdown:
         with self.defer_dirty('creating new children'):
             self.clear_children()
             self.scrollToTop(force=True)
-            process_mdown(self, mdown)
+            children, _ = subtrees.pop(subtree_key, (None, None)) if subtree_key else (None, None)
+            if children and all(child._parent is None and not child.document for child in children):
+                self.append_children(children)
+            else:
+                build(self, nodes)
+                children = self.children
+            if subtree_key:
+                subtrees[subtree_key] = (children, subtree_values)
+                while len(subtrees) > UI_Markdown._subtrees_max: subtrees.popitem(last=False)
             if self.parent: self.parent.scrollToTop(force=True)
         self.defer_clean = False
 
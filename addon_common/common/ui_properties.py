@@ -39,6 +39,7 @@ import bgl
 import blf
 import gpu
 
+from .ui_hitindex import UI_HitIndex
 from .ui_utilities import UI_Element_Utils
 from .ui_settings import DEBUG_COLOR_CLEAN, DEBUG_PROPERTY, DEBUG_COLOR, DEBUG_DIRTY, DEBUG_LIST, CACHE_METHOD, ASYNC_IMAGE_LOADING
 
@@ -1104,7 +1105,10 @@ class UI_Element_Properties:
     @property
     def can_hover(self): return self._can_hover
     @can_hover.setter
-    def can_hover(self, v): self._can_hover = v
+    def can_hover(self, v):
+        if self._can_hover == v: return
+        self._can_hover = v
+        UI_HitIndex.invalidate()
 
     @profiler.function
     def get_text_pos(self, index):
@@ -30,6 +30,8 @@ DEBUG_LIST      = False
 
 CACHE_METHOD = 2                # 0:none, 1:only root, 2:hierarchical, 3:text leaves
 
+DRAW_BATCHED = True             # draw using UI_DrawList (few batched draw calls) rather than drawing each element (CACHE_METHOD)
+
 ASYNC_IMAGE_LOADING = True
 
 
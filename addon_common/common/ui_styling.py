@@ -24,11 +24,13 @@ import re
 import copy
 import math
 import time
+import pickle
 import struct
 import random
 import traceback
 import functools
 import urllib.request
+from types import MappingProxyType
 from itertools import chain, zip_longest
 from concurrent.futures import ThreadPoolExecutor
 
@@ -47,6 +49,7 @@ from .ui_utilities import (
 
 from .blender import get_path_from_addon_common
 from .decorators import blender_version_wrapper, debug_test_call, add_cache
+from .diskcache import DiskCache
 from .maths import Point2D, Vec2D, clamp, mid, Color, NumberUnit
 from .profiler import profiler
 from .drawing import Drawing, ScissorStack
@@ -588,12 +591,39 @@ class UI_Style_RuleSet:
         return cache[k]
 
 
+def _unpickle_color(rgba):
+    c = Color(rgba)
+    c.freeze()
+    return c
+
+class _CompiledStylingPickler(pickle.Pickler):
+    # colors (mathutils) are stored as tuples and are frozen again when loaded
+    def reducer_override(self, obj):
+        if isinstance(obj, Color): return (_unpickle_color, (tuple(obj),))
+        return NotImplemented
+
+
 class UI_Styling:
     '''
     Parses input to a CSSOM-like object
     '''
     uid_generator = UniqueCounter()
 
+    # parsed rules and optimized tries of stylesheet files are cached on disk (see load_from_file),
+    # keyed by hash of source text.  bump version whenever parsed values or trie layout change
+    compiled_cache = DiskCache(
+        'styling',
+        version=1,
+        sources=[get_path_from_addon_common('common', fn) for fn in ['ui_styling.py', 'ui_utilities.py', 'parse.py', 'maths.py']],
+        pickler=_CompiledStylingPickler,
+    )
+
+    # computed styles shared by all elements with same selector and stylings (see compute_style).
+    # cleared whenever a stylesheet changes, or when too many distinct styles have been computed
+    _computed_cache = {}
+    _computed_cache_max = 10000
+    _computed_cache_stats = {'hits': 0, 'misses': 0, 'clears': 0}
+
     @staticmethod
     @profiler.function
     def from_var(var, tagname='*', pseudoclass=None, inline=False, defaults=False):
@@ -610,24 +640,85 @@ class UI_Styling:
     @staticmethod
     @profiler.function
     def from_file(filename, inline=False, defaults=False):
-        lines = open(filename, 'rt').read()
-        return UI_Styling(lines=lines, inline=inline, defaults=defaults)
+        styling = UI_Styling(inline=inline, defaults=defaults)
+        styling.load_from_file(filename)
+        return styling
 
     def load_from_file(self, filename):
         text = open(filename, 'rt').read()
-        self.load_from_text(text)
+        self.load_from_text(text, compiled_name=os.path.splitext(os.path.basename(filename))[0])
 
     @profiler.function
-    def load_from_text(self, text):
+    def load_from_text(self, text, compiled_name=None):
         self.clear_cache()
         self.dirty_optimization()
+        # stylings loaded from same text have same rules, so they can share computed styles
+        self._key = ('text', text, self._inline, self._defaults)
+        if not self._inline: UI_Styling.clear_computed_cache()
         self._rules = []
         if not text: return
+        compiled_path = self._get_compiled_path(text, compiled_name) if compiled_name else None
+        if compiled_path and self._load_compiled(compiled_path): return
         charstream = Parse_CharStream(text)             # convert input into character stream
         lexer = Parse_Lexer(charstream, token_rules)    # tokenize the character stream
         while lexer.peek_t() != 'eof':
             self._rules.append(UI_Style_RuleSet.from_lexer(lexer, self._inline, self._defaults))
         # print('UI_Styling.load_from_text: Loaded %d rules' % len(self._rules))
+        if compiled_path: self._save_compiled(compiled_path)
+
+    def _get_compiled_path(self, text, name):
+        # parsed values depend on variables defined by previously loaded stylesheets
+        return UI_Styling.compiled_cache.get_filename(
+            name,
+            f'{self._inline} {self._defaults}',
+            sorted(css_variables.items()),
+            text,
+        )
+
+    @profiler.function
+    def _load_compiled(self, path):
+        data = UI_Styling.compiled_cache.load(path)
+        if data is None: return False
+
+        # rulesets get new uids (in order), so specificities are rebuilt
+        rules = []
+        for (selectors, decls) in data['rules']:
+            rule = UI_Style_RuleSet(inline=self._inline, defaults=self._defaults)
+            rule.selectors = selectors
+            rule.decllist = [UI_Style_Declaration(p, v) for (p, v) in decls]
+            rules.append(rule)
+        def decode(enc, node_parent):
+            node = {'__parent': node_parent}
+            for (k, v) in enc.items():
+                if   k == '__rulesets':  node[k] = [((*specificity, rules[i]._uid), rules[i]) for (specificity, i) in v]
+                elif k == '__selectors': node[k] = v
+                elif k == '__uid':       node[k] = v
+                else:                    node[k] = decode(v, node)
+            return node
+        css_variables.update(data['variables'])
+        self._rules = rules
+        self._trie_full, self._trie_stripped = (decode(trie, None) for trie in data['tries'])
+        return True
+
+    @profiler.function
+    def _save_compiled(self, path):
+        self.optimize()
+        index = { rule._uid: i for (i, rule) in enumerate(self._rules) }
+        def encode(node):
+            enc = {}
+            for (k, v) in node.items():
+                if   k == '__parent':    continue
+                elif k == '__rulesets':  enc[k] = [(specificity[:4], index[rule._uid]) for (specificity, rule) in v]
+                elif k == '__selectors': enc[k] = v
+                elif k == '__uid':       enc[k] = v
+                else:                    enc[k] = encode(v)
+            return enc
+        data = {
+            'rules':     [(rule.selectors, [(d.property, d.value) for d in rule.decllist]) for rule in self._rules],
+            'variables': dict(css_variables),
+            'tries':     (encode(self._trie_full), encode(self._trie_stripped)),
+        }
+        UI_Styling.compiled_cache.save(path, data)
 
     def clear_cache(self):
         # print('UI_Styling%d.clear_cache' % self._uid)
@@ -905,6 +996,7 @@ class UI_Styling:
         self._rules = []
         self._decllist_cache = {}
         self._matches_cache = {}
+        self._key = (self._uid, 0)
         if lines:
             self.load_from_text(lines)
         self.dirty_optimization()
@@ -922,6 +1014,7 @@ class UI_Styling:
     @rules.setter
     def rules(self, v):
         self._rules = v
+        self._key = (self._uid, UI_Styling.uid_generator.next())
         self.dirty_optimization()
 
     def dirty_optimization(self):
@@ -955,6 +1048,8 @@ class UI_Styling:
     def append(self, other_styling):
         self.clear_cache()
         self._rules += other_styling.rules
+        self._key = (self._uid, UI_Styling.uid_generator.next())
+        if not self._inline: UI_Styling.clear_computed_cache()
         self.dirty_optimization()
         return self
 
@@ -1042,11 +1137,37 @@ class UI_Styling:
     @staticmethod
     @profiler.function
     def compute_style(selector, *stylings):
+        '''
+        returns computed style (read-only dict) of selector.  computed styles are shared by all
+        calls with same selector and stylings (by rules, see _key), so do not modify returned dict!
+        '''
         if selector is None: return {}
+        cache = UI_Styling._computed_cache
+        stats = UI_Styling._computed_cache_stats
+        key = (tuple(selector), tuple(styling._key for styling in stylings if styling))
+        decllist = cache.get(key, None)
+        if decllist is not None:
+            stats['hits'] += 1
+            return decllist
+        stats['misses'] += 1
         full_decllist = [dl for styling in stylings if styling for dl in styling.get_decllist(selector)]
-        decllist = UI_Styling._expand_declarations(full_decllist)
+        decllist = MappingProxyType(UI_Styling._expand_declarations(full_decllist))
+        if len(cache) >= UI_Styling._computed_cache_max: UI_Styling.clear_computed_cache()
+        cache[key] = decllist
         return decllist
 
+    @staticmethod
+    def clear_computed_cache():
+        if not UI_Styling._computed_cache: return
+        UI_Styling._computed_cache.clear()
+        UI_Styling._computed_cache_stats['clears'] += 1
+
+    @staticmethod
+    def get_computed_cache_stats():
+        stats = dict(UI_Styling._computed_cache_stats)
+        stats['size'] = len(UI_Styling._computed_cache)
+        return stats
+
     @staticmethod
     @add_cache('_cache', {})
     def strip_selector_parts(selector, strip):
@@ -325,14 +325,15 @@ def get_converter_to_string(group):
 def helper_wraptext(text='', width=float('inf'), fontid=0, fontsize=12, preserve_newlines=False, collapse_spaces=True, wrap_text=True, **kwargs):
     if type(text) is not str:
         assert False, 'unknown type: %s (%s)' % (str(type(text)), str(text))
-    # TODO: get textwidth of space and each word rather than rebuilding the string
     size_prev = Globals.drawing.set_font_size(fontsize, fontid=fontid, force=True)
     tw = Globals.drawing.get_text_width
+    ww = Globals.drawing.get_word_width
     wrap_text &= math.isfinite(width)
 
     if not preserve_newlines: text = re.sub(r'\n', ' ', text)
     if collapse_spaces: text = re.sub(r' +', ' ', text)
-    if wrap_text:
+    if wrap_text and '\n' in text:
+        # multi-line strings are as wide as their widest line, so measure whole string
         cline,*ltext = text.split(' ')
         nlines = []
         for cword in ltext:
@@ -342,6 +343,29 @@ def helper_wraptext(text='', width=float('inf'), fontid=0, fontsize=12, preserve
             else: nlines,cline = nlines+[cline],cword
         nlines += [cline]
         text = '\n'.join(nlines)
+    elif wrap_text:
+        # sum cached widths of words and spaces rather than measuring each candidate line.
+        # summed widths can be off slightly from measured widths (kerning, rounding up), so
+        # candidate lines within a space width of the limit are measured to get same breaks
+        cword,*ltext = text.split(' ')
+        wspace = ww(' ')
+        limit = math.floor(width)   # get_text_width rounds up
+        nlines = []
+        cline,cwidth = [cword],ww(cword)
+        for cword in ltext:
+            if not collapse_spaces and cword == '': cword = ' '
+            nwidth = cwidth + wspace + ww(cword)
+            if   nwidth <= limit - wspace: fits = True
+            elif nwidth >  limit + wspace: fits = False
+            else: fits = tw(' '.join(cline + [cword])) <= width
+            if fits:
+                cline.append(cword)
+                cwidth = nwidth
+            else:
+                nlines.append(' '.join(cline))
+                cline,cwidth = [cword],ww(cword)
+        nlines.append(' '.join(cline))
+        text = '\n'.join(nlines)
 
     Globals.drawing.set_font_size(size_prev, fontid=fontid, force=True)
     if False: print('wrapped ' + str(random.random()))
@@ -101,6 +101,8 @@ class CookieCutter(
     def end_cancel(self): pass
     def end(self): pass
     def should_pass_through(self, context, event): return False
+    def modal_event(self, context, event): return event     # can substitute event before main loop handles it
+    def modal_event_done(self, context, event, ret): pass   # called after main loop handled event
 
     ############################################################################
 
@@ -33,11 +33,16 @@ from ..common.useractions import Actions, ActionHandler
 
 class CookieCutter_Modal:
     def modal(self, context, event):
+        if self._cc_stage == 'quit': return {'FINISHED'}
+
+        in_main_loop = (self._cc_stage == 'main loop')
+        if in_main_loop:
+            with self.try_exception('call modal_event()'):
+                event = self.modal_event(context, event)
+
         self.context = context
         self.event = event
 
-        if self._cc_stage == 'quit': return {'FINISHED'}
-
         # if we're not yet in the main loop, create a NOP event so that we can
         # work our way through the initialization stuff as quickly as possible!
         if self._cc_stage != 'main loop': self._cc_fsm_force_event()
@@ -57,6 +62,9 @@ class CookieCutter_Modal:
         ret = fn_modal()
         if ret == {'PASS_THROUGH'}:
             print('passing through')
+        if in_main_loop:
+            with self.try_exception('call modal_event_done()'):
+                self.modal_event_done(context, event, ret)
         return ret
 
     def modal_prestart(self):
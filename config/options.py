@@ -76,6 +76,7 @@ retopoflow_files = {
     'options filename':     'RetopoFlow_options.json',
     'screenshot filename':  'RetopoFlow_screenshot.png',
     'instrument filename':  'RetopoFlow_instrument.txt',
+    'record filename':      'RetopoFlow_record.json',
     'log filename':         'RetopoFlow_log.txt',
     'backup filename':      'RetopoFlow_backup.blend',    # if working on unsaved blend file
     'profiler filename':    'RetopoFlow_profiler.txt',
@@ -216,6 +217,7 @@ class Options:
         # DEBUG, PROFILE, INSTRUMENT SETTINGS
         'profiler':             False,  # enable profiler?
         'instrument':           False,  # enable instrumentation?
+        'record actions':       False,  # record actions for replaying (see scripts/replay.py)
         'debug level':          0,      # debug level, 0--5 (for printing to console). 0=no print; 5=print all
         'debug actions':        False,  # print actions (except MOUSEMOVE) to console
 
@@ -33,6 +33,7 @@ from .rf.rf_grease          import RetopoFlow_Grease
 from .rf.rf_helpsystem      import RetopoFlow_HelpSystem
 from .rf.rf_instrument      import RetopoFlow_Instrumentation
 from .rf.rf_normalize       import RetopoFlow_Normalize
+from .rf.rf_record          import RetopoFlow_Record
 from .rf.rf_sources         import RetopoFlow_Sources
 from .rf.rf_spaces          import RetopoFlow_Spaces
 from .rf.rf_target          import RetopoFlow_Target
@@ -74,6 +75,7 @@ class RetopoFlow(
     RetopoFlow_HelpSystem,
     RetopoFlow_Instrumentation,
     RetopoFlow_Normalize,
+    RetopoFlow_Record,
     RetopoFlow_Sources,
     RetopoFlow_Spaces,
     RetopoFlow_Target,
@@ -123,6 +125,7 @@ class RetopoFlow(
 
         ui_core.ASYNC_IMAGE_LOADING = options['async image loading']
         self.loading_done = False
+        self.record_init()
         self.init_undo()   # hack to work around issue #949
 
         # self.store_window_state(self.actions.r3d, self.actions.space)
@@ -137,6 +140,7 @@ class RetopoFlow(
 
 
     def end(self):
+        self.record_done()
         options.clear_callbacks()
         self.end_normalize(self.context)
         self.blender_ui_reset()
@@ -210,6 +214,8 @@ class RetopoFlow(
             self.fsm.force_set_state('main')
             self.document.body.delete_child(d['ui_window'])
             d['timer'].done()
+            self.record_start()
+            self.replay_start()
         d['working'] = False
 
 RetopoFlow.cc_debug_print_to = 'RetopoFlow_Debug'
@@ -32,9 +32,11 @@ from ...addon_common.common.blender import tag_redraw_all
 from ...addon_common.common.decorators import timed_call
 from ...addon_common.common.drawing import Cursors
 from ...addon_common.common.fsm import FSM
+from ...addon_common.common.globals import Globals
 from ...addon_common.common.maths import Vec2D, Point2D, RelPoint2D, Direction2D
 from ...addon_common.common.profiler import profiler
 from ...addon_common.common.ui_core import UI_Element
+from ...addon_common.common.ui_styling import UI_Styling
 from ...addon_common.common.utils import normalize_triplequote
 from ...config.options import options, retopoflow_files
 
@@ -100,6 +102,15 @@ class RetopoFlow_FSM(CookieCutter): # CookieCutter must be here in order to over
         self.actions.hit_pos,self.actions.hit_norm,_,_ = self.raycast_sources_mouse()
         fpsdiv = self.document.body.getElementById('fpsdiv')
         if fpsdiv: fpsdiv.innerText = 'UI FPS: %.2f' % self.document._draw_fps
+        textmetricsdiv = self.document.body.getElementById('textmetricsdiv')
+        if textmetricsdiv:
+            stats = Globals.drawing.text_metrics.stats()
+            textmetricsdiv.innerText = 'Text Cache: %d / %d, %d hits, %d misses' % (stats['size'], stats['max size'], stats['hits'], stats['misses'])
+        stylecachediv = self.document.body.getElementById('stylecachediv')
+        if stylecachediv:
+            stats = UI_Styling.get_computed_cache_stats()
+            total = max(1, stats['hits'] + stats['misses'])
+            stylecachediv.innerText = 'Style Cache: %d, %0.1f%% hits' % (stats['size'], 100 * stats['hits'] / total)
 
 
     def which_pie_menu_section(self):
@@ -190,6 +201,13 @@ class RetopoFlow_FSM(CookieCutter): # CookieCutter must be here in order to over
     def should_pass_through(self, context, event):
         return self.actions.using('blender passthrough')
 
+    def modal_event(self, context, event):
+        # see RetopoFlow_Record
+        return self.record_modal_event(context, event)
+
+    def modal_event_done(self, context, event, ret):
+        self.record_modal_event_done(context, event, ret)
+
     @FSM.on_state('main')
     def modal_main(self):
         # if self.actions.just_pressed: print('modal_main', self.actions.just_pressed)
@@ -0,0 +1,308 @@
+'''
+Copyright (C) 2022 CG Cookie
+http://cgcookie.com
+hello@cgcookie.com
+
+Created by Jonathan Denning, Jonathan Williamson
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import sys
+import json
+import math
+import time as time_module
+from time import perf_counter
+
+import bpy
+from mathutils import Vector, Quaternion
+
+from ...config.options import options, retopoflow_product
+from ...addon_common.common.hasher import Hasher
+from ...addon_common.common.timerhandler import TimerHandler
+
+
+class ReplayEvent:
+    '''
+    stands in for bpy.types.Event when replaying recorded actions.
+    only the attributes that Actions and the UI system read are provided.
+    '''
+
+    __slots__ = [
+        'type', 'value',
+        'ctrl', 'shift', 'alt', 'oskey',
+        'mouse_x', 'mouse_y',
+        'mouse_prev_x', 'mouse_prev_y',
+        'mouse_region_x', 'mouse_region_y',
+        'is_repeat',
+    ]
+
+    def __init__(self, data):
+        self.type  = data['type']
+        self.value = data['value']
+        self.ctrl, self.shift, self.alt, self.oskey = data['mods']
+        self.mouse_x,        self.mouse_y        = data['mouse']
+        self.mouse_prev_x,   self.mouse_prev_y   = data['mouse prev']
+        self.mouse_region_x, self.mouse_region_y = data['mouse region']
+        self.is_repeat = data.get('repeat', False)
+
+    @staticmethod
+    def record(event, t):
+        return {
+            't':            t,
+            'type':         event.type,
+            'value':        event.value,
+            'mods':         [event.ctrl, event.shift, event.alt, event.oskey],
+            'mouse':        [event.mouse_x, event.mouse_y],
+            'mouse prev':   [event.mouse_prev_x, event.mouse_prev_y],
+            'mouse region': [event.mouse_region_x, event.mouse_region_y],
+            'repeat':       getattr(event, 'is_repeat', False),
+        }
+
+
+class ReplayClock:
+    '''
+    fixed clock that replaces the `time` module in RetopoFlow modules during replay,
+    so that double-click detection, timer deltas, throttling, etc. see recorded times.
+    all other attributes are passed through to the real `time` module.
+    '''
+
+    def __init__(self):
+        self.base = time_module.time()
+        self.offset = 0.0
+        self._patched = []
+
+    def set(self, t):
+        self.offset = t
+
+    def time(self):
+        return self.base + self.offset
+
+    def __getattr__(self, key):
+        return getattr(time_module, key)
+
+    def install(self):
+        root = __name__.split('.')[0]
+        for name, module in list(sys.modules.items()):
+            if not name.startswith(f'{root}.'): continue
+            if getattr(module, 'time', None) is not time_module: continue
+            module.time = self
+            self._patched.append(module)
+
+    def uninstall(self):
+        for module in self._patched:
+            module.time = time_module
+        self._patched = []
+
+
+class RetopoFlow_Record:
+    '''
+    records the sequence of user actions (events) along with the starting view and
+    target mesh, and replays a recording with a fixed clock, reporting per-step timings
+    and a checksum of the final target mesh.  used to turn slow interactions into
+    reproducible performance tests.
+    '''
+
+    # set to recording filename before starting RetopoFlow to replay (see scripts/replay.py)
+    replay_filename = None
+    replay_report_filename = None
+    replay_quit = False
+
+    def record_init(self):
+        self._recording = None
+        self._replay = None
+
+    @staticmethod
+    def target_checksum(rftarget, precision=5):
+        data = rftarget.to_json()
+        verts = [[round(v, precision) for v in co] for co in data['verts']]
+        return Hasher(verts, data['edges'], data['faces']).get_hash()
+
+    def _get_view_state(self):
+        r3d = self.actions.r3d
+        return {
+            'location':    list(r3d.view_location),
+            'rotation':    list(r3d.view_rotation),
+            'distance':    r3d.view_distance,
+            'perspective': r3d.view_perspective,
+            'region':      [int(v) for v in self.actions.size],
+        }
+
+    def _set_view_state(self, view):
+        r3d = self.actions.r3d
+        r3d.view_location    = Vector(view['location'])
+        r3d.view_rotation    = Quaternion(view['rotation'])
+        r3d.view_distance    = view['distance']
+        r3d.view_perspective = view['perspective']
+        size = [int(v) for v in self.actions.size]
+        if size != view['region']:
+            print(f'RetopoFlow replay: region size differs from recording ({size} != {view["region"]})')
+            print(f'  mouse positions will not line up with recorded geometry!')
+
+    def _set_target_state(self, data):
+        bme = self.rftarget.bme
+        bme.clear()
+        verts = [bme.verts.new(co) for co in data['verts']]
+        for e in data['edges']: bme.edges.new([verts[i] for i in e])
+        for f in data['faces']: bme.faces.new([verts[i] for i in f])
+        bme.normal_update()
+        self.rftarget.rewrap()
+        self.rftarget.dirty()
+
+
+    #########################################
+    # recording
+
+    def record_start(self):
+        self._recording = None
+        if self.replay_filename or not options['record actions']: return
+        print(f'RetopoFlow: recording actions')
+        self._recording = {
+            'retopoflow': retopoflow_product['version'],
+            'blender':    bpy.app.version_string,
+            'tool':       self.rftool.name,
+            'options':    dict(options.db),
+            'view':       self._get_view_state(),
+            'target':     self.rftarget.to_json(),
+            'checksum':   None,     # filled in when done
+            'events':     [],
+        }
+        self._recording_start = time_module.time()
+
+    def record_event(self, event):
+        if not self._recording: return
+        t = time_module.time() - self._recording_start
+        self._recording['events'].append(ReplayEvent.record(event, t))
+
+    def record_done(self):
+        if self._replay:
+            # RetopoFlow quit before replay finished
+            self._replay['clock'].uninstall()
+            self._replay['timer'].done()
+            self._replay = None
+        if not self._recording: return
+        self._recording['checksum'] = self.target_checksum(self.rftarget)
+        filename = options.get_path_incremented('record filename')
+        json.dump(self._recording, open(filename, 'wt'), separators=[',',':'])
+        print(f'RetopoFlow: wrote {len(self._recording["events"])} recorded actions to {filename}')
+        self._recording = None
+
+
+    #########################################
+    # replaying
+
+    def replay_start(self):
+        self._replay = None
+        if not self.replay_filename: return
+        recording = json.load(open(self.replay_filename, 'rt'))
+        print(f'RetopoFlow: replaying {len(recording["events"])} actions from {self.replay_filename}')
+
+        rftool = next((rftool for rftool in self.rftools if rftool.name == recording['tool']), None)
+        if rftool: self._select_rftool(rftool)
+        self._set_view_state(recording['view'])
+        self._set_target_state(recording['target'])
+        mismatched = {
+            k for (k, v) in recording['options'].items()
+            if k in options.db and options.db[k] != v
+        }
+        if mismatched: print(f'RetopoFlow replay: options differ from recording: {sorted(mismatched)}')
+
+        clock = ReplayClock()
+        clock.install()
+        self._replay = {
+            'recording': recording,
+            'events':    [ReplayEvent(e) for e in recording['events']],
+            'index':     0,
+            'clock':     clock,
+            'timer':     TimerHandler(120, context=self.context),
+            'steps':     [],
+            'start':     None,
+        }
+
+    def replay_next_event(self, context, event):
+        replay = self._replay
+        if replay['index'] >= len(replay['events']):
+            self.replay_done()
+            return event
+        data = replay['recording']['events'][replay['index']]
+        replay['clock'].set(data['t'])
+        replay['start'] = perf_counter()
+        return replay['events'][replay['index']]
+
+    def replay_step_done(self):
+        replay = self._replay
+        if replay['start'] is None: return
+        e = replay['events'][replay['index']]
+        replay['steps'].append({
+            'index': replay['index'],
+            'type':  e.type,
+            'value': e.value,
+            'time':  perf_counter() - replay['start'],
+        })
+        replay['start'] = None
+        replay['index'] += 1
+
+    def replay_done(self):
+        replay = self._replay
+        self._replay = None
+        replay['clock'].uninstall()
+        replay['timer'].done()
+
+        steps = replay['steps']
+        times = sorted(s['time'] for s in steps) or [0.0]
+        by_type = {}
+        for s in steps: by_type.setdefault(s['type'], []).append(s['time'])
+        percentile = lambda p: times[min(len(times) - 1, int(math.ceil(p * len(times))) - 1)]
+        checksum = self.target_checksum(self.rftarget)
+        expected = replay['recording'].get('checksum', None)
+        report = {
+            'recording':  self.replay_filename,
+            'retopoflow': retopoflow_product['version'],
+            'blender':    bpy.app.version_string,
+            'checksum':   checksum,
+            'expected':   expected,
+            'match':      (checksum == expected) if expected else None,
+            'summary': {
+                'steps': len(steps),
+                'total': sum(times),
+                'mean':  sum(times) / len(times),
+                'p95':   percentile(0.95),
+                'max':   times[-1],
+                'by type': {
+                    t: {'count': len(ts), 'total': sum(ts), 'max': max(ts)}
+                    for (t, ts) in by_type.items()
+                },
+            },
+            'steps': steps,
+        }
+        print(f'RetopoFlow: replay done.  {len(steps)} steps in {report["summary"]["total"]:0.3f}s, checksum {checksum} ({"matches" if report["match"] else "DOES NOT MATCH" if expected else "no expected"})')
+        if self.replay_report_filename:
+            json.dump(report, open(self.replay_report_filename, 'wt'), indent=2)
+            print(f'RetopoFlow: wrote replay report to {self.replay_report_filename}')
+        RetopoFlow_Record.replay_filename = None
+        if self.replay_quit:
+            self.done()
+            bpy.app.timers.register(lambda: bpy.ops.wm.quit_blender(), first_interval=1.0)
+
+
+    #########################################
+    # modal hooks (called from RetopoFlow_FSM)
+
+    def record_modal_event(self, context, event):
+        if self._replay: return self.replay_next_event(context, event)
+        self.record_event(event)
+        return event
+
+    def record_modal_event_done(self, context, event, ret):
+        if self._replay: self.replay_step_done()
@@ -54,6 +54,7 @@ class RetopoFlow_Sources:
         print('  done!')
         self._detected_bad_normals = False
         self._warned_bad_normals = False
+        self.reset_snap_stats()
 
     def done_sources(self):
         for rfs in self.rfsources:
@@ -101,7 +102,8 @@ class RetopoFlow_Sources:
     ###################################################
     # ray casting functions
 
-    def raycast_sources_Ray(self, ray:Ray):
+    def _raycast_sources_Ray(self, ray:Ray):
+        # same as raycast_sources_Ray, but also returns which source was hit
         bp,bn,bi,bd,bo = None,None,None,None,None
         for rfsource in self.rfsources:
             if not self.get_rfsource_snap(rfsource): continue
@@ -111,7 +113,20 @@ class RetopoFlow_Sources:
             if isnan(hd):      continue     # is distance NaN?  (issue #1062)
             if bp and bd < hd: continue     # have we seen a closer hit already?
             bp,bn,bi,bd,bo = hp,hn,hi,hd,rfsource
-        return (bp,bn,bi,bd)
+        return (bp,bn,bi,bd,bo)
+
+    def raycast_sources_Ray(self, ray:Ray):
+        return self._raycast_sources_Ray(ray)[:4]
+
+    def _raycast_sources_closer(self, ray:Ray, dist):
+        # returns True if any snapping source is hit along ray closer than dist.  ray is shortened to
+        # just before dist, so these raycasts are cheaper than full raycasts and do not hit the face at dist
+        ray_short = Ray(ray.o, ray.d, max_dist=min(ray.max, dist * (1 - 0.00001)))
+        return any(
+            rfsource.raycast(ray_short)[0] is not None
+            for rfsource in self.rfsources
+            if self.get_rfsource_snap(rfsource)
+        )
 
     def raycast_sources_Ray_all(self, ray:Ray):
         return [
@@ -129,6 +144,40 @@ class RetopoFlow_Sources:
         if xy is None: return None,None,None,None
         return self.raycast_sources_Ray_all(self.Point2D_to_Ray(xy))
 
+    @profiler.function
+    def raycast_sources_Point2D_batch(self, xys, hints):
+        '''
+        raycasts sources for each xy in xys, returning list of (p,n,i,d).
+        hints is a list (same length as xys) of (rfsource, face index) hit by previous raycast
+        of corresponding xy, or None.  hinted face and its neighbors are checked first before
+        falling back to full raycast.  a hinted hit is only used if no snapping source has a closer
+        hit along the ray, so results are same as raycast_sources_Point2D.  hints are updated in place.
+        '''
+        stats = self.snap_stats
+        Point2D_to_Ray = self.Point2D_to_Ray
+        hits = []
+        for idx, xy in enumerate(xys):
+            if xy is None:
+                hits.append((None, None, None, None))
+                continue
+            ray = Point2D_to_Ray(xy)
+            hint = hints[idx]
+            if hint and self.get_rfsource_snap(hint[0]):
+                hp,hn,hi,hd = hint[0].raycast_hint(ray, hint[1])
+                if hp is not None and not self._raycast_sources_closer(ray, hd):
+                    stats['coherent'] += 1
+                    hints[idx] = (hint[0], hi)
+                    hits.append((hp,hn,hi,hd))
+                    continue
+            hp,hn,hi,hd,ho = self._raycast_sources_Ray(ray)
+            stats['full' if hp is not None else 'missed'] += 1
+            hints[idx] = (ho, hi) if hp is not None else None
+            hits.append((hp,hn,hi,hd))
+        return hits
+
+    def reset_snap_stats(self):
+        self.snap_stats = { 'coherent': 0, 'full': 0, 'missed': 0 }
+
     def raycast_sources_mouse(self):
         return self.raycast_sources_Point2D(self.actions.mouse)
 
@@ -150,6 +199,22 @@ class RetopoFlow_Sources:
                 bp,bn,bi,bd = hp,hn,hi,hd
         return (bp,bn,bi,bd)
 
+    @profiler.function
+    def nearest_sources_Point_batch(self, points, max_dist=float('inf')):
+        '''
+        same as nearest_sources_Point for each point in points, returning list of (p,n,i,d).
+        each source is queried once for all points (see RFMesh.nearest_batch)
+        '''
+        best = [(None,None,None,None)] * len(points)
+        for rfsource in self.rfsources:
+            if not self.get_rfsource_snap(rfsource): continue
+            hits = rfsource.nearest_batch(points, max_dist=max_dist)
+            best = [
+                hit if b[0] is None or (hit[0] is not None and hit[3] < b[3]) else b
+                for (b, hit) in zip(best, hits)
+            ]
+        return best
+
 
     ###################################################
     # plane intersection
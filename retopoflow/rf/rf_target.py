@@ -34,7 +34,7 @@ from ...addon_common.common.decorators import timed_call
 from ...addon_common.common.profiler import profiler
 from ...addon_common.common.utils import iter_pairs
 from ...addon_common.common.maths import Point, Vec, Direction, Normal, Ray, XForm, BBox
-from ...addon_common.common.maths import Point2D, Vec2D, Direction2D, Accel2D
+from ...addon_common.common.maths import Point2D, Vec2D, Direction2D, Accel2D, Accel2DPoints
 
 from ..rfmesh.rfmesh import RFMesh, RFVert, RFEdge, RFFace
 from ..rfmesh.rfmesh import RFSource, RFTarget
@@ -350,6 +350,13 @@ class RetopoFlow_Target:
     def nearest_edge_Point(self, point:Point, edges=None):
         return self.rftarget.nearest_bmedge_Point(point, edges=edges)
 
+    def nearest_faces_Point(self, point, max_dist:float):
+        max_dist = self.drawing.scale(max_dist)
+        return self.rftarget.nearest_bmfaces_Point(point, max_dist)
+
+    def nearest_face_Point(self, point:Point, faces=None):
+        return self.rftarget.nearest_bmface_Point(point, faces=faces)
+
 
     #######################################
     # get visible geometry
@@ -382,6 +389,9 @@ class RetopoFlow_Target:
 
     def iter_verts(self):
         yield from self.rftarget.iter_verts()
+    def get_boundary_accel(self):
+        return self.rftarget.get_boundary_accel()
+
     def iter_edges(self):
         yield from self.rftarget.iter_edges()
     def iter_faces(self):
@@ -559,6 +569,14 @@ class RetopoFlow_Target:
         vert.co = xyz
         vert.normal = norm
 
+    def snap_verts(self, verts):
+        # same as snap_vert for each vert, but sources are queried for all verts at once
+        verts = list(verts)
+        hits = self.nearest_sources_Point_batch([vert.co for vert in verts])
+        for vert, (xyz,norm,_,_) in zip(verts, hits):
+            vert.co = xyz
+            vert.normal = norm
+
     def snap2D_vert(self, vert:RFVert):
         xy = self.Point_to_Point2D(vert.co)
         xyz,norm,_,_ = self.raycast_sources_Point2D(xy)
@@ -638,6 +656,30 @@ class RetopoFlow_Target:
     def update_verts_faces(self, verts):
         self.rftarget.update_verts_faces(verts)
 
+    @profiler.function
+    def merge2D_snapped_verts(self, bmverts, vis_bmverts, delta, merge_dist):
+        '''
+        merges each moved vert into the first visible vert that is within merge_dist in screen space.
+        bmverts and vis_bmverts are lists of (vert, xy), where xy is position before moving by delta.
+        returns list of verts that were merged into.
+        '''
+        accel = Accel2DPoints([xy if xy else None for (_, xy) in vis_bmverts], merge_dist)
+        update_verts = []
+        for bmv,xy in bmverts:
+            if not xy: continue
+            xy_updated = xy + delta
+            for i in accel.indices_within(xy_updated):
+                bmv1 = vis_bmverts[i][0]
+                if bmv1 == bmv: continue
+                if not bmv1.is_valid: continue
+                bmv1.merge_robust(bmv)
+                self.select(bmv1)
+                update_verts += [bmv1]
+                break
+        if update_verts:
+            self.update_verts_faces(update_verts)
+        return update_verts
+
     def update_face_normal(self, face):
         return self.rftarget.update_face_normal(face)
 
@@ -661,6 +703,9 @@ class RetopoFlow_Target:
     def get_target_version(self, selection=True):
         return self.rftarget.get_version(selection=selection)
 
+    def get_target_topology_version(self):
+        return self.rftarget.get_topology_version()
+
     def get_target_geometry_counts(self):
         return self.rftarget.get_geometry_counts()
 
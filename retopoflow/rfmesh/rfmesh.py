@@ -25,6 +25,8 @@ import heapq
 import random
 from dataclasses import dataclass, field
 
+import numpy as np
+
 import bpy
 import bmesh
 from bmesh.types import BMVert, BMEdge, BMFace
@@ -36,12 +38,12 @@ from bmesh.ops import (
 from mathutils import Vector, Matrix
 from mathutils.bvhtree import BVHTree
 from mathutils.kdtree import KDTree
-from mathutils.geometry import normal as compute_normal, intersect_point_tri, intersect_point_tri_2d
+from mathutils.geometry import normal as compute_normal, intersect_point_tri, intersect_point_tri_2d, closest_point_on_tri, intersect_ray_tri
 
 from ...addon_common.common.blender import ModifierWrapper_Mirror
 from ...addon_common.common.maths import Point, Normal, Direction
 from ...addon_common.common.maths import Point2D
-from ...addon_common.common.maths import Ray, XForm, BBox, Plane
+from ...addon_common.common.maths import Ray, XForm, BBox, Plane, Accel3DSegments
 from ...addon_common.common.hasher import hash_object, Hasher
 from ...addon_common.common.utils import min_index, UniqueCounter, iter_pairs, accumulate_last, deduplicate_list, has_duplicates
 from ...addon_common.common.decorators import stats_wrapper, blender_version_wrapper
@@ -50,11 +52,81 @@ from ...addon_common.common.profiler import profiler, time_it
 
 from ...config.options import options
 
+from .rfmesh_slice import PlaneSlicer
 from .rfmesh_wrapper import (
     BMElemWrapper, RFVert, RFEdge, RFFace, RFEdgeSequence
 )
 
 
+class ElemGrid3D:
+    '''
+    uniform grid over bmesh edges or faces (in local space) for 3D proximity queries.
+    elements are binned by their bounding boxes; elements that span too many cells
+    are kept in a separate list that is always checked.
+    '''
+
+    max_cells_per_elem = 64
+
+    def __init__(self, elems, topology):
+        self.elems = list(elems)
+        self.topology = topology    # see RFMesh.get_topology_version
+        self.moved = set()      # verts moved since grid was built (see RFMesh.vert_moved)
+        self.bins = {}
+        self.oversized = []
+        bboxes = []
+        total = 0
+        for elem in self.elems:
+            cos = [bmv.co for bmv in elem.verts]
+            xs, ys, zs = zip(*cos)
+            mn, mx = (min(xs), min(ys), min(zs)), (max(xs), max(ys), max(zs))
+            bboxes.append((mn, mx))
+            total += max(mx[0] - mn[0], mx[1] - mn[1], mx[2] - mn[2])
+        self.cell = max(total / max(1, len(self.elems)), 0.000001)
+        self.min = tuple(min(bb[0][i] for bb in bboxes) for i in range(3)) if bboxes else (0, 0, 0)
+        self.max = tuple(max(bb[1][i] for bb in bboxes) for i in range(3)) if bboxes else (0, 0, 0)
+        bins = self.bins
+        for i_elem, (mn, mx) in enumerate(bboxes):
+            (i0, j0, k0), (i1, j1, k1) = self.cell_index(mn), self.cell_index(mx)
+            if (i1 - i0 + 1) * (j1 - j0 + 1) * (k1 - k0 + 1) > self.max_cells_per_elem:
+                self.oversized.append(i_elem)
+                continue
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    for k in range(k0, k1 + 1):
+                        bins.setdefault((i, j, k), []).append(i_elem)
+
+    def cell_index(self, co):
+        c = self.cell
+        return (math.floor(co[0] / c), math.floor(co[1] / c), math.floor(co[2] / c))
+
+    def extent(self):
+        return max(self.max[i] - self.min[i] for i in range(3))
+
+    def is_valid(self, topology):
+        # elements of grid are only the same while topology is unchanged.  ex: after automerge
+        # spliced a vert, its edges and faces are relinked to another vert
+        return self.topology == topology
+
+    def query(self, center, radius):
+        # returns elements with bbox possibly within radius of center (local space)
+        mn = [center[i] - radius for i in range(3)]
+        mx = [center[i] + radius for i in range(3)]
+        (i0, j0, k0), (i1, j1, k1) = self.cell_index(mn), self.cell_index(mx)
+        found = set(self.oversized)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) * (k1 - k0 + 1) > len(self.bins):
+            for (i, j, k), b in self.bins.items():
+                if i0 <= i <= i1 and j0 <= j <= j1 and k0 <= k <= k1: found.update(b)
+        else:
+            bins = self.bins
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    for k in range(k0, k1 + 1):
+                        b = bins.get((i, j, k))
+                        if b: found.update(b)
+        elems = self.elems
+        return [elems[i] for i in found]
+
+
 class RFMesh():
     '''
     RFMesh wraps a mesh object, providing extra machinery such as
@@ -185,6 +257,29 @@ class RFMesh():
     def get_version(self, selection=True):
         return Hasher(self._version, (self._version_selection if selection else 0))
 
+    def get_topology_version(self):
+        '''
+        returns version that changes only when the set of verts, edges, or faces changes (ex: create,
+        delete, merge, split), but not when verts are only moved.  bmesh never relinks elements in
+        place (ex: vert_splice removes the spliced vert), so same counts and all old elements still
+        valid means same topology.  checked lazily, once per version
+        '''
+        ver = self.get_version(selection=False)
+        topo = getattr(self, 'topology', None)
+        if topo and topo[0] == ver: return topo[1]
+        bme = self.bme
+        if topo:
+            elems = topo[2]
+            same = (
+                all(len(old) == len(cur) for (old, cur) in zip(elems, (bme.verts, bme.edges, bme.faces))) and
+                all(elem.is_valid for old in elems for elem in old)
+            )
+            if same:
+                self.topology = (ver, topo[1], elems)
+                return topo[1]
+        self.topology = (ver, UniqueCounter.next(), (list(bme.verts), list(bme.edges), list(bme.faces)))
+        return self.topology[1]
+
     @profiler.function
     def get_bvh(self):
         ver = self.get_version(selection=False)
@@ -212,17 +307,196 @@ class RFMesh():
             self.local_w2l_point = w2l_point
         return self.local_bbox
 
+    ##########################################################
+    # kd-tree of verts (local space) for 3D proximity queries
+    # tree is rebuilt lazily when version changes, except when only a few verts
+    # have been moved (see vert_moved); moved verts are then checked separately
+
+    kdtree_moved_max  = 64    # max number of moved verts before tree is rebuilt
+    kdtree_subset_min = 32    # vert subsets smaller than this are searched linearly
+
+    def vert_moved(self, bmv):
+        # called when a vert's position changes without changing topology (see RFVert.co)
+        kdt_moved = getattr(self, 'kdt_moved', None)
+        if kdt_moved is not None: kdt_moved.add(bmv)
+        for grid in getattr(self, 'elem_grids', {}).values():
+            grid.moved.add(bmv)
+
+    def _kdtree_reusable(self):
+        if getattr(self, 'kdt', None) is None: return False
+        if len(self.kdt_moved) > self.kdtree_moved_max: return False
+        return self.kdt_topology == self.get_topology_version()
+
     @profiler.function
     def get_kdtree(self):
         ver = self.get_version(selection=False)
-        if not hasattr(self, 'kdt') or self.kdt_version != ver:
-            self.kdt = KDTree(len(self.bme.verts))
-            for i, bmv in enumerate(self.bme.verts):
-                self.kdt.insert(bmv.co, i)
-            self.kdt.balance()
+        if getattr(self, 'kdt', None) is not None and self.kdt_version == ver: return self.kdt
+        if self._kdtree_reusable():
             self.kdt_version = ver
+            return self.kdt
+        verts = list(self.bme.verts)
+        kdt = KDTree(len(verts))
+        insert = kdt.insert
+        for i, bmv in enumerate(verts): insert(bmv.co, i)
+        kdt.balance()
+        self.kdt, self.kdt_verts, self.kdt_moved, self.kdt_version = kdt, verts, set(), ver
+        self.kdt_topology = self.get_topology_version()
         return self.kdt
 
+    def _kdtree_w2l_scale(self):
+        # returns (s, uniform), where s bounds how much xform.w2l can stretch a distance
+        # and uniform is True when w2l scales all distances equally (local nearest == world nearest)
+        rows = [Vector(r) for r in self.xform.imx_d]
+        lens = [r.length for r in rows]
+        lmax = max(lens)
+        if all(abs(rows[i].dot(rows[j])) <= 0.00001 * lmax * lmax for (i, j) in [(0,1), (0,2), (1,2)]):
+            return (lmax, (lmax - min(lens)) <= 0.00001 * lmax)
+        return (math.sqrt(sum(l * l for l in lens)), False)
+
+    def _kdtree_range(self, point_local, radius_local):
+        # yields verts within local radius; moved verts are always yielded (caller must check distance)
+        kdt = self.get_kdtree()
+        verts, moved = self.kdt_verts, self.kdt_moved
+        for (_, i, _) in kdt.find_range(point_local, radius_local):
+            bmv = verts[i]
+            if bmv not in moved: yield bmv
+        yield from moved
+
+    def _kdtree_nearest_k(self, point_local, k, accept):
+        # returns up to k verts (and local distances) nearest to point_local that are accepted
+        kdt = self.get_kdtree()
+        verts, moved = self.kdt_verts, self.kdt_moved
+        found = [(bmv, (bmv.co - point_local).length) for bmv in moved if bmv.is_valid and accept(bmv)]
+        n = k
+        while True:
+            near = kdt.find_n(point_local, n)
+            found_tree = [(verts[i], d) for (_, i, d) in near if verts[i] not in moved and accept(verts[i])]
+            if len(found_tree) >= k or len(near) < n: break
+            n *= 4
+        return sorted(found + found_tree, key=lambda bd: bd[1])[:k]
+
+    def _fn_vert_accept(self, bmverts=None, is_visible=None):
+        subset = None if bmverts is None else { self._unwrap(bmv) for bmv in bmverts }
+        is_vis = None if is_visible is None else self._fn_is_vert_visible(is_visible)
+        return lambda bmv: (
+            not bmv.hide and
+            (subset is None or bmv in subset) and
+            (is_vis is None or is_vis(bmv))
+        )
+
+    ##########################################################
+    # uniform grids of edges and faces (local space) for 3D proximity queries
+    # like the kd-tree above, grids are kept when only a few verts have moved
+
+    @profiler.function
+    def get_elem_grid(self, kind):
+        # kind is 'edges' or 'faces'
+        ver = self.get_version(selection=False)
+        if not hasattr(self, 'elem_grids'):
+            self.elem_grids, self.elem_grids_version = {}, {}
+        grid = self.elem_grids.get(kind, None)
+        if grid and self.elem_grids_version[kind] == ver: return grid
+        topology = self.get_topology_version()
+        if not grid or len(grid.moved) > self.kdtree_moved_max or not grid.is_valid(topology):
+            grid = ElemGrid3D(self.bme.edges if kind == 'edges' else self.bme.faces, topology)
+            self.elem_grids[kind] = grid
+        self.elem_grids_version[kind] = ver
+        return grid
+
+    def _elem_grid_query(self, kind, point_local, radius_local):
+        # yields elems possibly within local radius; elems attached to moved verts are always yielded
+        grid = self.get_elem_grid(kind)
+        moved = {
+            elem
+            for bmv in grid.moved if bmv.is_valid
+            for elem in (bmv.link_edges if kind == 'edges' else bmv.link_faces)
+        }
+        for elem in grid.query(point_local, radius_local):
+            if elem not in moved: yield elem
+        yield from moved
+
+    def _fn_elem_accept(self, elems=None):
+        subset = None if elems is None else { self._unwrap(elem) for elem in elems }
+        return lambda elem: elem.is_valid and not elem.hide and (subset is None or elem in subset)
+
+    def _dist_bmedge_Point(self, bme, point:Point):
+        # returns (world distance, world closest point)
+        l2w_point = self.xform.l2w_point
+        bmv0,bmv1 = l2w_point(bme.verts[0].co), l2w_point(bme.verts[1].co)
+        diff = bmv1 - bmv0
+        l = diff.length
+        if l == 0: return ((point - bmv0).length, bmv0)
+        d = diff / l
+        pp = bmv0 + d * max(0, min(l, (point - bmv0).dot(d)))
+        return ((point - pp).length, pp)
+
+    def _dist_bmface_Point(self, bmf, point:Point):
+        # returns (world distance, world closest point), using fan triangulation of face
+        l2w_point = self.xform.l2w_point
+        cos = [l2w_point(bmv.co) for bmv in bmf.verts]
+        bd,bp = None,None
+        for co1,co2 in zip(cos[1:-1], cos[2:]):
+            p = closest_point_on_tri(point, cos[0], co1, co2)
+            d = (point - p).length
+            if bd is None or d < bd: bd,bp = d,p
+        return (bd, bp)
+
+    def _nearest_elems_Point(self, kind, point:Point, dist3d:float, elems=None):
+        # returns list of (elem, world distance) within dist3d of point
+        fn_dist = self._dist_bmedge_Point if kind == 'edges' else self._dist_bmface_Point
+        accept = self._fn_elem_accept(elems)
+        if elems is not None and len(elems) < self.kdtree_subset_min:
+            candidates = map(self._unwrap, elems)
+        else:
+            scale, _ = self._kdtree_w2l_scale()
+            candidates = self._elem_grid_query(kind, self.xform.w2l_point(point), dist3d * scale)
+        nearest = []
+        for elem in candidates:
+            if not accept(elem): continue
+            d,_ = fn_dist(elem, point)
+            if d > dist3d: continue
+            nearest.append((elem, d))
+        return nearest
+
+    def _nearest_elem_Point(self, kind, point:Point, elems=None):
+        # returns (elem, world distance) nearest to point, or (None, None)
+        fn_dist = self._dist_bmedge_Point if kind == 'edges' else self._dist_bmface_Point
+        accept = self._fn_elem_accept(elems)
+        if elems is not None and len(elems) < self.kdtree_subset_min:
+            nearest = [(elem, fn_dist(elem, point)[0]) for elem in map(self._unwrap, elems) if accept(elem)]
+            return min(nearest, key=lambda ed: ed[1], default=(None, None))
+        grid = self.get_elem_grid(kind)
+        if not grid.elems: return (None, None)
+        scale, _ = self._kdtree_w2l_scale()
+        point_local = self.xform.w2l_point(point)
+        radius = grid.cell
+        # distance from point to grid bounds, so that first search is not wasted
+        radius += math.sqrt(sum(max(grid.min[i] - point_local[i], 0, point_local[i] - grid.max[i]) ** 2 for i in range(3)))
+        while True:
+            best = (None, None)
+            for elem in self._elem_grid_query(kind, point_local, radius):
+                if not accept(elem): continue
+                d,_ = fn_dist(elem, point)
+                if best[0] is None or d < best[1]: best = (elem, d)
+            # done if nearest found is guaranteed to be nearest (all elems within its distance were searched)
+            if best[0] is not None and best[1] * scale <= radius: return best
+            if radius > 2 * (grid.extent() + grid.cell) + (point_local - Vector(grid.min)).length: return best
+            radius *= 2
+
+    @profiler.function
+    def get_boundary_accel(self):
+        # world-space segments of non-manifold edges, for sliding verts along boundary
+        ver = self.get_version(selection=False)
+        if not hasattr(self, 'boundary_accel') or self.boundary_accel_version != ver:
+            l2w_point = self.xform.l2w_point
+            self.boundary_accel = Accel3DSegments(
+                (l2w_point(bme.verts[0].co), l2w_point(bme.verts[1].co))
+                for bme in self.bme.edges
+                if bme.is_valid and not bme.is_manifold
+            )
+            self.boundary_accel_version = ver
+        return self.boundary_accel
+
     def get_geometry_counts(self):
         ver = self.get_version(selection=False)
         if not hasattr(self, 'geocounts') or self.geocounts_version != ver:
@@ -357,6 +631,10 @@ class RFMesh():
         n = self.xform.l2w_normal(Normal((1, 0, 0)))
         return Plane(o, n)
 
+    def get_plane_slicer(self):
+        # only triangulated meshes (sources) can be sliced with array math (see RFSource)
+        return None
+
     @profiler.function
     def _crawl(self, bmf_start, plane):
         '''
@@ -515,6 +793,15 @@ class RFMesh():
         _,_,i,_ = self.get_bvh().ray_cast(ray.o, ray.d, ray.max)
         bmf = self.bme.faces[i]
 
+        # signed distances of all verts are computed at once when mesh has a plane slicer
+        slicer = self.get_plane_slicer()
+        plane_slice = slicer.slice(plane) if slicer else None
+        if plane_slice is not None:
+            d = plane_slice.d
+            signed_distance_to = lambda bmv: d[bmv.index]
+        else:
+            signed_distance_to = lambda bmv: plane.signed_distance_to(bmv.co)
+
         if walk_to_plane:
             # follow link_faces of verts that walk us toward the plane until we find a bmface that crosses/touches
             # we have two different greedy implementations.  one follows bmfaces and uses a heap; the other greedily
@@ -537,7 +824,7 @@ class RFMesh():
                 assumes that there will be exactly two bmedges of the bmface that cross the plane
                 '''
                 bmvs = [bmv for bmv in bmf.verts]
-                bmvs_dot = [plane.signed_distance_to(bmv.co) for bmv in bmvs]   # which side of plane are bmverts?
+                bmvs_dot = [signed_distance_to(bmv) for bmv in bmvs]   # which side of plane are bmverts?
                 if max(bmvs_dot) >= 0 and min(bmvs_dot) <= 0: return bmf        # bmf crosses/touches plane already!
                 sign = -1 if bmvs_dot[0] < 0 else 1                             # indicates direction that we need to walk
                 bmv_heap = []
@@ -556,13 +843,13 @@ class RFMesh():
                         for bmv in bmf.verts:
                             if bmv in touched: continue
                             touched.add(bmv)
-                            bmv_dot = plane.signed_distance_to(bmv.co)
+                            bmv_dot = signed_distance_to(bmv)
                             bmv_dot = abs(bmv_dot) if ignore_touching else bmv_dot*sign
                             heapq.heappush(bmv_heap, PrioritizedBMV(bmv, bmv_dot))
                 # find a bmface adjacent to bmv that crosses the plane
                 for bmf in bmv.link_faces:
                     bmvs = [bmv for bmv in bmf.verts]
-                    bmvs_dot = [plane.signed_distance_to(bmv.co) for bmv in bmvs]   # which side of plane are bmverts?
+                    bmvs_dot = [signed_distance_to(bmv) for bmv in bmvs]   # which side of plane are bmverts?
                     if max(bmvs_dot) >= 0 and min(bmvs_dot) <= 0: return bmf        # bmf crosses/touches plane!
                 assert False
 
@@ -573,7 +860,7 @@ class RFMesh():
                       edge lengths or distance to from initial to final bmf!
                 '''
                 bmvs = [bmv for bmv in bmf.verts]
-                bmvs_dot = [plane.signed_distance_to(bmv.co) for bmv in bmvs]
+                bmvs_dot = [signed_distance_to(bmv) for bmv in bmvs]
                 if max(bmvs_dot) >= 0 and min(bmvs_dot) <= 0:
                     # bmf crosses plane already
                     return bmf
@@ -588,7 +875,7 @@ class RFMesh():
                     obmvs = [bme.other_vert(bmv) for bme in bmv.link_edges]
                     obmvs = [obmv for obmv in obmvs if obmv not in touched]
                     if not obmvs: return None
-                    obmvs_dot = [plane.signed_distance_to(obmv.co)*sign for obmv in obmvs]
+                    obmvs_dot = [signed_distance_to(obmv)*sign for obmv in obmvs]
                     idx = min_index(obmvs_dot)
                     obmv,obmv_dot = obmvs[idx],obmvs_dot[idx]
                     if obmv_dot <= 0:
@@ -602,7 +889,7 @@ class RFMesh():
             if not bmf: return None
 
         # crawl about self along plane
-        ret = self._crawl(bmf, plane)
+        ret = plane_slice.crawl(bmf.index) if plane_slice is not None else self._crawl(bmf, plane)
         w,l2w_point = self._wrap,self.xform.l2w_point
         ret = [(w(f0),l2w_point(c),w(f1)) for (f0,c,f1) in ret]
         return ret
@@ -612,6 +899,11 @@ class RFMesh():
         plane = self.xform.w2l_plane(plane)
         w,l2w_point = self._wrap,self.xform.l2w_point
 
+        slicer = self.get_plane_slicer()
+        if slicer:
+            rets = slicer.slice(plane).crawl_all()
+            return [[(w(f0),l2w_point(c),w(f1)) for (f0,c,f1) in ret] for ret in rets]
+
         # find all faces that cross the plane
         # finding all edges crossing plane
         dot = plane.n.dot
@@ -627,9 +919,9 @@ class RFMesh():
         for bmf in faces:
             if bmf in touched: continue
             ret = self._crawl(bmf, plane)
-            touched |= set(f0 for f0,_,_,_ in ret if f0)
-            touched |= set(f1 for _,_,f1,_ in ret if f1)
-            ret = [(w(f0),w(e),w(f1),l2w_point(c)) for f0,e,f1,c in ret]
+            touched |= set(f0 for f0,_,_ in ret if f0)
+            touched |= set(f1 for _,_,f1 in ret if f1)
+            ret = [(w(f0),l2w_point(c),w(f1)) for f0,c,f1 in ret]
             rets.append(ret)
 
         return rets
@@ -664,6 +956,25 @@ class RFMesh():
         if math.isinf(d_w) or math.isnan(d_w): return (None, None, None, None)
         return (p_w,n_w,i,d_w)
 
+    def raycast_bmfaces(self, ray:Ray, bmfs):
+        '''
+        raycasts only the given bmfaces (no BVH).  returns same as raycast
+        '''
+        ray_local = self.xform.w2l_ray(ray)
+        o,d,maxdist = ray_local.o,ray_local.d,ray_local.max
+        bp,bf,bd = None,None,None
+        for bmf in bmfs:
+            cos = [bmv.co for bmv in bmf.verts]
+            for co1,co2 in zip(cos[1:-1], cos[2:]):
+                p = intersect_ray_tri(cos[0], co1, co2, d, o, True)
+                if p is None: continue
+                dist = (p - o).length
+                if dist > maxdist: continue
+                if bd is None or dist < bd: bp,bf,bd = p,bmf,dist
+        if bp is None: return (None, None, None, None)
+        p_w,n_w = self.xform.l2w_point(bp), self.xform.l2w_normal(bf.normal)
+        return (p_w, n_w, bf.index, (ray.o - p_w).length)
+
     def raycast_all(self, ray:Ray):
         l2w_point,l2w_normal = self.xform.l2w_point,self.xform.l2w_normal
         ray_local = self.xform.w2l_ray(ray)
@@ -695,65 +1006,94 @@ class RFMesh():
         d = (point - wp).length
         return (wp,wn,i,d)
 
-    def nearest_bmvert_Point(self, point:Point, verts=None):
-        if verts is None:
-            verts = [bmv for bmv in self.bme.verts if bmv.is_valid and not bmv.hide]
+    @profiler.function
+    def nearest_batch(self, points, max_dist=float('inf')):
+        '''
+        same as nearest for each point in points, returning list of (p,n,i,d).
+        points are transformed to and from local space all at once
+        '''
+        if not points: return []
+        xform = self.xform
+        mx_p, imx_p, mx_n = np.array(xform.mx_p), np.array(xform.imx_p), np.array(xform.mx_n.to_3x3())
+        ones = lambda n: np.ones((n, 1))
+        pts = np.array([tuple(p) for p in points], dtype=np.float64)
+        local = np.hstack((pts, ones(len(pts)))) @ imx_p.T
+        local = local[:,:3] / local[:,3:]
+        find_nearest = self.get_bvh().find_nearest
+        hits = [find_nearest(p, max_dist) for p in local.tolist()]
+        ret = [(None,None,None,None)] * len(points)
+        found = [k for (k, hit) in enumerate(hits) if hit[0] is not None]
+        if not found: return ret
+        wp = np.hstack((np.array([tuple(hits[k][0]) for k in found]), ones(len(found)))) @ mx_p.T
+        wp = wp[:,:3] / wp[:,3:]
+        wn = np.array([tuple(hits[k][1]) for k in found]) @ mx_n.T
+        wn /= np.maximum(np.linalg.norm(wn, axis=1), 1e-12)[:,None]
+        d = np.linalg.norm(pts[found] - wp, axis=1)
+        for (k, p, n, dist) in zip(found, wp.tolist(), wn.tolist(), d.tolist()):
+            ret[k] = (Point(p), Normal(n), hits[k][2], dist)
+        return ret
+
+    @profiler.function
+    def nearest_bmvert_Point(self, point:Point, verts=None, *, is_visible=None):
+        nearest = self.nearest_k_bmverts_Point(point, 1, bmverts=verts, is_visible=is_visible)
+        return nearest[0] if nearest else (None, None)
+
+    @profiler.function
+    def nearest_k_bmverts_Point(self, point:Point, k:int, bmverts=None, *, is_visible=None):
+        # returns list of k nearest (vert, world distance), sorted by distance
+        l2w_point = self.xform.l2w_point
+        accept = self._fn_vert_accept(bmverts=bmverts, is_visible=is_visible)
+        if bmverts is not None and len(bmverts) < self.kdtree_subset_min:
+            nearest = [(bmv, (l2w_point(bmv.co) - point).length) for bmv in map(self._unwrap, bmverts) if bmv.is_valid and accept(bmv)]
         else:
-            verts = [self._unwrap(bmv) for bmv in verts if bmv.is_valid and not bmv.hide]
-        point_local = self.xform.w2l_point(point)
-        bv,bd = None,None
-        for bmv in verts:
-            d3d = (bmv.co - point_local).length
-            if bv is None or d3d < bd: bv,bd = bmv,d3d
-        bmv_world = self.xform.l2w_point(bv.co)
-        return (self._wrap_bmvert(bv),(point-bmv_world).length)
+            point_local = self.xform.w2l_point(point)
+            nearest = self._kdtree_nearest_k(point_local, k, accept)
+            nearest = [(bmv, (l2w_point(bmv.co) - point).length) for (bmv, _) in nearest]
+            scale, uniform = self._kdtree_w2l_scale()
+            if nearest and not uniform:
+                # nearest in local space might not be nearest in world space
+                radius = max(d for (_, d) in nearest) * scale
+                nearest = [(bmv, (l2w_point(bmv.co) - point).length) for bmv in set(self._kdtree_range(point_local, radius)) if bmv.is_valid and accept(bmv)]
+        nearest = heapq.nsmallest(k, nearest, key=lambda bd: bd[1])
+        return [(self._wrap_bmvert(bmv), d) for (bmv, d) in nearest]
 
-    def nearest_bmverts_Point(self, point:Point, dist3d:float, bmverts=None):
+    @profiler.function
+    def nearest_bmverts_Point(self, point:Point, dist3d:float, bmverts=None, *, is_visible=None):
+        l2w_point = self.xform.l2w_point
+        accept = self._fn_vert_accept(bmverts=bmverts, is_visible=is_visible)
+        if bmverts is not None and len(bmverts) < self.kdtree_subset_min:
+            bmvs = map(self._unwrap, bmverts)
+        else:
+            scale, _ = self._kdtree_w2l_scale()
+            bmvs = self._kdtree_range(self.xform.w2l_point(point), dist3d * scale)
         nearest = []
-        unwrap = bmverts is not None
-        for bmv in (bmverts or self.bme.verts):
-            if bmv.hide: continue
+        for bmv in bmvs:
             if not bmv.is_valid: continue
-            if unwrap: bmv = self._unwrap(bmv)
-            bmv_world = self.xform.l2w_point(bmv.co)
-            d3d = (bmv_world - point).length
+            if not accept(bmv): continue
+            d3d = (l2w_point(bmv.co) - point).length
             if d3d > dist3d: continue
             nearest.append((self._wrap_bmvert(bmv), d3d))
         return nearest
 
+    @profiler.function
     def nearest_bmedge_Point(self, point:Point, edges=None):
-        if edges is None:
-            edges = [bme for bme in self.bme.edges if bme.is_valid and not bme.hide]
-        else:
-            edges = [self._unwrap(bme) for bme in edges if bme.is_valid and not bme.hide]
-        l2w_point = self.xform.l2w_point
-        be,bd,bpp = None,None,None
-        for bme in self.bme.edges:
-            bmv0,bmv1 = l2w_point(bme.verts[0].co), l2w_point(bme.verts[1].co)
-            diff = bmv1 - bmv0
-            l = diff.length
-            d = diff / l
-            pp = bmv0 + d * max(0, min(l, (point - bmv0).dot(d)))
-            dist = (point - pp).length
-            if be is None or dist < bd: be,bd,bpp = bme,dist,pp
+        be,bd = self._nearest_elem_Point('edges', point, elems=edges)
         if be is None: return (None,None)
-        return (self._wrap_bmedge(be), (point-self.xform.l2w_point(bpp)).length)
+        return (self._wrap_bmedge(be), bd)
 
-    def nearest_bmedges_Point(self, point:Point, dist3d:float):
-        l2w_point = self.xform.l2w_point
-        nearest = []
-        for bme in self.bme.edges:
-            if not bme.is_valid: continue
-            if bme.hide: continue
-            bmv0,bmv1 = l2w_point(bme.verts[0].co), l2w_point(bme.verts[1].co)
-            diff = bmv1 - bmv0
-            l = diff.length
-            d = diff / l
-            pp = bmv0 + d * max(0, min(l, (point - bmv0).dot(d)))
-            dist = (point - pp).length
-            if dist > dist3d: continue
-            nearest.append((self._wrap_bmedge(bme), dist))
-        return nearest
+    @profiler.function
+    def nearest_bmedges_Point(self, point:Point, dist3d:float, edges=None):
+        return [(self._wrap_bmedge(bme), d) for (bme, d) in self._nearest_elems_Point('edges', point, dist3d, elems=edges)]
+
+    @profiler.function
+    def nearest_bmface_Point(self, point:Point, faces=None):
+        bf,bd = self._nearest_elem_Point('faces', point, elems=faces)
+        if bf is None: return (None,None)
+        return (self._wrap_bmface(bf), bd)
+
+    @profiler.function
+    def nearest_bmfaces_Point(self, point:Point, dist3d:float, faces=None):
+        return [(self._wrap_bmface(bmf), d) for (bmf, d) in self._nearest_elems_Point('faces', point, dist3d, elems=faces)]
 
     def nearest2D_bmverts_Point2D(self, xy:Point2D, dist2D:float, Point_to_Point2D, verts=None):
         # TODO: compute distance from camera to point
@@ -892,14 +1232,17 @@ class RFMesh():
 
     ##########################################################
 
-    def _visible_verts(self, is_visible, bmvs=None):
+    def _fn_is_vert_visible(self, is_visible):
         l2w_point, l2w_normal = self.xform.l2w_point, self.xform.l2w_normal
         #is_vis = lambda bmv: is_visible(l2w_point(bmv.co), l2w_normal(bmv.normal))
-        if bmvs is None: bmvs = self.bme.verts
-        is_vis = lambda bmv: (
+        return lambda bmv: (
             is_visible(l2w_point(bmv.co), l2w_normal(bmv.normal)) or
             is_visible(l2w_point(bmv.co + 0.002 * options['normal offset multiplier'] * l2w_normal(bmv.normal)), l2w_normal(bmv.normal))
         )
+
+    def _visible_verts(self, is_visible, bmvs=None):
+        if bmvs is None: bmvs = self.bme.verts
+        is_vis = self._fn_is_vert_visible(is_visible)
         return { bmv for bmv in bmvs if bmv.is_valid and not bmv.hide and is_vis(bmv) }
 
     def _visible_edges(self, is_visible, bmvs=None, bmes=None):
@@ -1206,10 +1549,80 @@ class RFMesh():
             if self._are_edges_flipped(bme, bme_next): flipped = not flipped
             bme,bmf = bme_next,bmf_next
 
+    ##########################################################
+    # face loop (quad strip) index
+    # face loops depend only on topology, so a cached loop is kept across versions (ex: verts
+    # moved) and is revalidated lazily.  a loop is dropped only when one of its edges or the
+    # faces around them were edited.  loops are shared by all member edges when the strip is
+    # simple (manifold edges, each face crossed once), so hovering along a loop is a dict hit.
+    # whenever the topology version changes, records keyed by or crawling deleted edges are pruned
+
+    class FaceLoop:
+        __slots__ = ['edges', 'looped', 'links', 'faces', 'version']
+
+        def __init__(self, bme_start, edges, looped, version):
+            self.edges = edges
+            self.looped = looped
+            # crawling depends only on link faces of the member edges and edges of those faces
+            bmes = edges if bme_start in edges else edges + (bme_start,)
+            self.links = tuple((bme, tuple(bme.link_faces)) for bme in bmes)
+            bmfs = {bmf for (_, bmfs) in self.links for bmf in bmfs}
+            self.faces = tuple((bmf, tuple(bmf.edges)) for bmf in bmfs)
+            self.version = version
+
+        def is_valid(self):
+            for (bme, bmfs) in self.links:
+                if not bme.is_valid or tuple(bme.link_faces) != bmfs: return False
+            for (bmf, bmes) in self.faces:
+                if not bmf.is_valid or tuple(bmf.edges) != bmes: return False
+            return True
+
+        def is_shareable(self):
+            # strip is same from any member edge if all edges are manifold and no face is crossed twice
+            if len(self.links) != len(self.edges): return False
+            counts = {}
+            for (_, bmfs) in self.links:
+                if len(bmfs) > 2: return False
+                for bmf in bmfs: counts[bmf] = counts.get(bmf, 0) + 1
+            return all(c <= 2 for c in counts.values())
+
+    def _get_face_loop_record(self, bme):
+        ver = self.get_version(selection=False)
+        if not hasattr(self, 'face_loops'): self.face_loops = {}
+        face_loops = self.face_loops
+        topo = self.get_topology_version()
+        if getattr(self, 'face_loops_topology', None) != topo:
+            # elems were created or deleted: drop records keyed by or crawled through deleted edges,
+            # so the cache does not keep growing with dead BMEdges as the mesh is edited
+            dead = [e for (e, l) in face_loops.items() if not e.is_valid or not all(le.is_valid for le in l.edges)]
+            for e in dead: del face_loops[e]
+            self.face_loops_topology = topo
+        loop = face_loops.get(bme, None)
+        if loop:
+            if loop.version == ver: return loop
+            if loop.is_valid():
+                loop.version = ver
+                return loop
+            for e in loop.edges:
+                if face_loops.get(e, None) is loop: del face_loops[e]
+            face_loops.pop(bme, None)
+        is_looped = self.is_quadstrip_looped(bme)
+        edges = tuple(self._unwrap(e) for e,_ in self.iter_quadstrip(bme))
+        loop = RFMesh.FaceLoop(bme, edges, is_looped, ver)
+        face_loops[bme] = loop
+        if loop.is_shareable():
+            for e in edges: face_loops[e] = loop
+        return loop
+
+    @profiler.function
     def get_face_loop(self, edge):
-        is_looped = self.is_quadstrip_looped(edge)
-        edges = list(bme for bme,_ in self.iter_quadstrip(edge))
-        return (edges, is_looped)
+        '''
+        returns (edges, is_looped) for the quad strip through edge.
+        note: edges are ordered along the strip, but which end (or for loops, which edge) comes
+        first depends on which member edge was queried first
+        '''
+        loop = self._get_face_loop_record(self._unwrap(edge))
+        return ([self._wrap_bmedge(bme) for bme in loop.edges], loop.looped)
 
     def get_edge_loop(self, edge):
         touched = set()
@@ -1362,6 +1775,29 @@ class RFSource(RFMesh):
     def __str__(self):
         return '<RFSource %s>' % self.obj.name
 
+    def get_plane_slicer(self):
+        # sources are triangulated, so planes can be sliced against arrays of all triangles
+        ver = self.get_version(selection=False)
+        if getattr(self, 'plane_slicer', None) is None or self.plane_slicer_version != ver:
+            self.plane_slicer = PlaneSlicer(self.bme)
+            self.plane_slicer_version = ver
+        return self.plane_slicer
+
+    def raycast_hint(self, ray:Ray, i_face:int):
+        '''
+        raycasts the face with index i_face (typically hit by a nearby ray) and the faces around it,
+        which is much cheaper than a full raycast when consecutive rays hit nearby.
+        returns same as raycast, which is (None,None,None,None) if these faces were missed.
+        note: does not check whether another part of mesh (or another source) occludes the hit; see
+              RetopoFlow_Sources._raycast_sources_closer
+        '''
+        faces = self.bme.faces
+        if i_face is None or i_face >= len(faces): return (None, None, None, None)
+        bmf = faces[i_face]
+        if not bmf.is_valid: return (None, None, None, None)
+        bmfs = { bmf_ for bmv in bmf.verts for bmf_ in bmv.link_faces }
+        return self.raycast_bmfaces(ray, bmfs)
+
     @property
     def layer_pin(self):
         return None
@@ -1518,6 +1954,7 @@ class RFTarget(RFMesh):
         # deepcopy all remaining settings
         for k,v in self.__dict__.items():
             if k not in {'prev_state'} and k in rftarget.__dict__: continue
+            if k in {'kdt', 'kdt_verts', 'kdt_moved', 'kdt_version', 'kdt_topology', 'topology', 'elem_grids', 'elem_grids_version', 'boundary_accel', 'boundary_accel_version', 'face_loops', 'face_loops_topology'}: continue     # not copyable; rebuilt lazily
             setattr(rftarget, k, copy.deepcopy(v, memo))
         return rftarget
 
@@ -0,0 +1,150 @@
+'''
+Copyright (C) 2022 CG Cookie
+http://cgcookie.com
+hello@cgcookie.com
+
+Created by Jonathan Denning, Jonathan Williamson
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from itertools import chain
+
+import numpy as np
+
+from ...addon_common.common.maths import Point
+from ...addon_common.common.profiler import profiler
+
+
+class PlaneSlicer:
+    '''
+    slices a triangulated BMesh with planes using array math.  vert coords and triangle
+    indices are gathered once; each slice then classifies all verts and triangles at once.
+    all coordinates are in local space of the mesh.
+    '''
+
+    @profiler.function
+    def __init__(self, bme):
+        bme.verts.index_update()
+        bme.faces.index_update()
+        bme.faces.ensure_lookup_table()
+        self.bme = bme
+        nverts, nfaces = len(bme.verts), len(bme.faces)
+        self.co = np.fromiter(chain.from_iterable(bmv.co for bmv in bme.verts), dtype=np.float64, count=3*nverts).reshape((-1, 3))
+        self.tris = np.fromiter((bmv.index for bmf in bme.faces for bmv in bmf.verts), dtype=np.int64, count=3*nfaces).reshape((-1, 3))
+
+    @profiler.function
+    def slice(self, plane):
+        return PlaneSlice(self, plane)
+
+
+class PlaneSlice:
+    '''
+    crossings of a plane with all triangles of a PlaneSlicer, matching RFMesh._crawl:
+    - verts exactly on the plane count as being on the positive side.  _crawl classifies verts
+      with Plane.side(threshold=0), which never returns 0 (abs(d) < 0), so its branches for
+      on-plane verts are never taken and an on-plane vert is never a crossing point
+    - a triangle is crossed iff it has verts on both sides, and then it has exactly two crossing
+      edges.  a triangle that only touches the plane (on-plane vert, other verts positive) is not
+      crossed, so crawling from it returns [], same as _crawl
+    - edge crossings are shared by at most two crossing triangles, and crawls follow shared edges
+    '''
+
+    def __init__(self, slicer, plane):
+        self.slicer = slicer
+        co, tris = slicer.co, slicer.tris
+        nverts = len(co)
+
+        # signed distance of every vert to plane (same as Plane.signed_distance_to)
+        self.d = d = (co - np.array(plane.o[:])) @ np.array(plane.n[:])
+        neg = d < 0
+
+        # triangles with verts on both sides of plane
+        tneg = neg[tris]
+        count = tneg.sum(axis=1)
+        self.faces = np.nonzero((count == 1) | (count == 2))[0]
+        t, tn = tris[self.faces], tneg[self.faces]
+
+        # each crossing triangle has exactly two crossing edges, kept in BMFace.edges order
+        a, b = t, np.roll(t, -1, axis=1)
+        crossing = tn != np.roll(tn, -1, axis=1)
+        keys = (np.minimum(a, b) * nverts + np.maximum(a, b))[crossing]
+        edges, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        self.face_edges = inverse.reshape((-1, 2))
+
+        # faces of each crossing edge.  edges with more than two crossing faces stop crawling
+        order = np.argsort(inverse, kind='stable') // 2
+        first = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        self.edge_face0 = np.full(len(edges), -1, dtype=np.int64)
+        self.edge_face1 = np.full(len(edges), -1, dtype=np.int64)
+        ok, two = counts <= 2, counts == 2
+        self.edge_face0[ok] = order[first[ok]]
+        self.edge_face1[two] = order[first[two] + 1]
+
+        # crossing points
+        v0, v1 = edges // nverts, edges % nverts
+        d0, d1 = d[v0], d[v1]
+        f = (d0 / (d0 - d1))[:,None]
+        self.points = co[v0] + (co[v1] - co[v0]) * f
+
+    def __len__(self):
+        return len(self.faces)
+
+    def _chains(self, rows):
+        # yields lists of (row0, edge, row1) for each crawl starting at rows (row1 is -1 at end of string)
+        face_edges = self.face_edges.tolist()
+        edge_face0, edge_face1 = self.edge_face0.tolist(), self.edge_face1.tolist()
+        touched = set()
+        def chain(k_start, i_start):
+            ret = []
+            k, e = k_start, face_edges[k_start][i_start]
+            while True:
+                k_next = edge_face1[e] if edge_face0[e] == k else edge_face0[e]
+                ret.append((k, e, k_next))
+                touched.add(k)
+                if k_next < 0: return (ret, False)
+                if k_next == k_start: return (ret, True)
+                e0, e1 = face_edges[k_next]
+                e = e0 if e == e1 else e1
+                k = k_next
+        for k in rows:
+            if k in touched: continue
+            ret, wrapped = chain(k, 0)
+            if not wrapped:
+                # did not wrap, so switch directions
+                ret = [(k1, e, k0) for (k0, e, k1) in reversed(ret)]
+                ret += chain(k, 1)[0]
+            yield ret
+
+    def _to_bmesh(self, ret):
+        faces, points = self.slicer.bme.faces, self.points
+        row_to_face = lambda k: faces[int(self.faces[k])] if k >= 0 else None
+        return [(row_to_face(k0), Point(points[e].tolist()), row_to_face(k1)) for (k0, e, k1) in ret]
+
+    @profiler.function
+    def crawl(self, face_index):
+        '''
+        returns list of (face0, point, face1) crawling along plane from face, same as RFMesh._crawl.
+        returns [] if face does not cross plane (including faces that only touch it)
+        '''
+        k = int(np.searchsorted(self.faces, face_index))
+        if k >= len(self.faces) or self.faces[k] != face_index: return []
+        return self._to_bmesh(next(self._chains([k])))
+
+    @profiler.function
+    def crawl_all(self):
+        '''
+        returns list of crawls (see crawl) covering all crossing faces
+        '''
+        return [self._to_bmesh(ret) for ret in self._chains(range(len(self.faces)))]
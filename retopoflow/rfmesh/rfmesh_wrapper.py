@@ -176,6 +176,7 @@ class RFVert(BMElemWrapper):
         #     if nx or ny or nz:
         #         co = rft.snap_to_symmetry(co, mm._symmetry, to_world=False, from_world=False)
         self.bmelem.co = co
+        self.rftarget.vert_moved(self.bmelem)
 
     @property
     def pinned(self):
@@ -48,6 +48,7 @@ from .contours_utils import (
     find_strings,
     loop_plane, loop_radius,
     Contours_Loop,
+    Contours_LoopCache,
     Contours_Utils,
 )
 
@@ -101,19 +102,33 @@ class Contours(RFTool, Contours_Ops, Contours_Props, Contours_Utils):
         if self.ui_initial_count:
             self.ui_initial_count.disabled = bool(self.sel_edges)
 
-        # find verts along selected loops and strings
-        sel_loops = find_loops(self.sel_edges)
-        sel_strings = find_strings(self.sel_edges)
-
-        # filter out any loops or strings that are in the middle of a selected patch
-        def in_middle(bmvs, is_loop):
-            return any(len(bmv0.shared_edge(bmv1).link_faces) > 1 for bmv0,bmv1 in iter_pairs(bmvs, is_loop))
-        sel_loops = [loop for loop in sel_loops if not in_middle(loop, True)]
-        sel_strings = [string for string in sel_strings if not in_middle(string, False)]
-
-        # filter out long loops that wrap around patches, sharing edges with other strings
-        bmes = {bmv0.shared_edge(bmv1) for string in sel_strings for bmv0,bmv1 in iter_pairs(string,False)}
-        sel_loops = [loop for loop in sel_loops if not any(bmv0.shared_edge(bmv1) in bmes for bmv0,bmv1 in iter_pairs(loop,True))]
+        if not hasattr(self, '_loop_cache'): self._loop_cache = Contours_LoopCache()
+        cache = self._loop_cache
+
+        def get_topology():
+            # find verts along selected loops and strings
+            sel_loops = find_loops(self.sel_edges)
+            sel_strings = find_strings(self.sel_edges)
+            loop_edges = lambda bmvs, is_loop: [bmv0.shared_edge(bmv1) for bmv0,bmv1 in iter_pairs(bmvs, is_loop)]
+            sel_loops = [(loop, loop_edges(loop, True)) for loop in sel_loops]
+            sel_strings = [(string, loop_edges(string, False)) for string in sel_strings]
+
+            # filter out any loops or strings that are in the middle of a selected patch
+            def in_middle(bmes):
+                return any(len(bme.link_faces) > 1 for bme in bmes)
+            sel_loops = [(loop, bmes) for (loop, bmes) in sel_loops if not in_middle(bmes)]
+            sel_strings = [(string, bmes) for (string, bmes) in sel_strings if not in_middle(bmes)]
+
+            # filter out long loops that wrap around patches, sharing edges with other strings
+            string_bmes = {bme for (_, bmes) in sel_strings for bme in bmes}
+            sel_loops = [loop for (loop, bmes) in sel_loops if not any(bme in string_bmes for bme in bmes)]
+            sel_strings = [string for (string, _) in sel_strings]
+            return (sel_loops, sel_strings)
+
+        sel_loops, sel_strings = cache.get_topology(
+            (frozenset(self.sel_edges), self.rfcontext.get_target_topology_version()),
+            get_topology,
+        )
 
         mirror_mod = self.rfcontext.rftarget.mirror_mod
         symmetry_threshold = mirror_mod.symmetry_threshold
@@ -138,20 +153,22 @@ class Contours(RFTool, Contours_Ops, Contours_Props, Contours_Utils):
             if not touches_mirror: c -= 1
             return c
 
-        self.loops_data = [{
+        mirror_key = (mirror_mod.x, mirror_mod.y, mirror_mod.z, symmetry_threshold)
+        self.loops_data = [cache.get_data(loop, True, None, lambda: {
             'loop': loop,
             'plane': loop_plane(loop),
             'count': len(loop),
             'radius': loop_radius(loop),
             'cl': Contours_Loop(loop, True),
-            } for loop in sel_loops]
-        self.strings_data = [{
+            }) for loop in sel_loops]
+        self.strings_data = [cache.get_data(string, False, mirror_key, lambda: {
             'string': string,
             'plane': loop_plane(string),
             'count': get_string_length(string),
             'cl': Contours_Loop(string, False),
-            } for string in sel_strings]
-        self.sel_loops = [Contours_Loop(loop, True) for loop in sel_loops]
+            }) for string in sel_strings]
+        self.sel_loops = [loop_data['cl'] for loop_data in self.loops_data]
+        cache.done()
 
         self._var_cut_count.disabled = True
         if len(self.loops_data) == 1 and len(self.strings_data) == 0:
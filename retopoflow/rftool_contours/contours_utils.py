@@ -252,6 +252,40 @@ def find_cycles(edges, max_loops=10):
     if len(cycles) == max_loops: print('max loop count reached')
     return cycles
 
+class Contours_LoopCache:
+    '''
+    caches the analysis of selected loops and strings between target changes.
+    topology (which loops and strings are selected) is reused while the selected edges and
+    target topology are unchanged (see RFMesh.get_topology_version), so moving verts does not
+    crawl the selection again.  per-loop data (plane, radius, Contours_Loop, ...) is
+    reused for any loop whose verts are the same and have not moved, so after an edit only
+    the affected loops are recomputed.
+    '''
+
+    def __init__(self):
+        self.topology_key = None
+        self.topology = None
+        self.data = {}
+        self.data_used = {}
+
+    def get_topology(self, key, fn):
+        if key != self.topology_key:
+            self.topology_key, self.topology = key, fn()
+        return self.topology
+
+    def get_data(self, verts, connected, extra, fn):
+        key = (tuple(verts), connected, extra)
+        cos = tuple(tuple(bmv.co) for bmv in verts)
+        cached = self.data.get(key, None)
+        data = cached[1] if cached and cached[0] == cos else fn()
+        self.data_used[key] = (cos, data)
+        return data
+
+    def done(self):
+        # forget data of loops that are no longer selected
+        self.data, self.data_used = self.data_used, {}
+
+
 def edges_of_loop(vert_loop):
     edges = []
     for v0,v1 in iter_pairs(vert_loop, True):
@@ -38,6 +38,7 @@ from ...addon_common.common.drawing import (
 )
 from ...addon_common.common.profiler import profiler
 from ...addon_common.common.maths import Point, Point2D, Vec2D, Vec, Direction2D, intersection2d_line_line, closest2d_point_segment
+from ...addon_common.common.maths import Accel2DSegments
 from ...addon_common.common.globals import Globals
 from ...addon_common.common.fsm import FSM
 from ...addon_common.common.utils import iter_pairs
@@ -440,25 +441,9 @@ class Knife(RFTool):
         # TODO: remove colocated faces
         if self.mousedown is None: return
         delta = Vec2D(self.actions.mouse - self.mousedown)
-        set2D_vert = self.rfcontext.set2D_vert
-        update_verts = []
         merge_dist = self.rfcontext.drawing.scale(options['knife merge dist'])
-        for bmv,xy in self.bmverts:
-            if not xy: continue
-            xy_updated = xy + delta
-            for bmv1,xy1 in self.vis_bmverts:
-                if not xy1: continue
-                if bmv1 == bmv: continue
-                if not bmv1.is_valid: continue
-                d = (xy_updated - xy1).length
-                if (xy_updated - xy1).length > merge_dist:
-                    continue
-                bmv1.merge_robust(bmv)
-                self.rfcontext.select(bmv1)
-                update_verts += [bmv1]
-                break
+        update_verts = self.rfcontext.merge2D_snapped_verts(self.bmverts, self.vis_bmverts, delta, merge_dist)
         if update_verts:
-            self.rfcontext.update_verts_faces(update_verts)
             self.set_next_state()
 
 
@@ -548,8 +533,27 @@ class Knife(RFTool):
         self.rfcontext.set_accel_defer(False)
         self.rfcontext.clear_split_target_visualization()
 
+    def _get_crosses_accel(self, dist):
+        # 2D segment grid of projected visible edges, rebuilt only when target, view, or visible edges change
+        key = (
+            id(self.vis_edges), len(self.vis_edges), dist,
+            self.rfcontext.get_target_version(selection=False),
+            self.rfcontext.get_view_version(),
+        )
+        if getattr(self, '_crosses_accel_key', None) != key:
+            with profiler.code('building knife crosses accel'):
+                Point_to_Point2D = self.rfcontext.Point_to_Point2D
+                def items():
+                    for e in self.vis_edges:
+                        v0, v1 = e.verts
+                        c0, c1 = Point_to_Point2D(v0.co), Point_to_Point2D(v1.co)
+                        if c0 is None or c1 is None: continue
+                        yield (e, c0, c1)
+                self._crosses_accel = Accel2DSegments(items(), cell_min=dist)
+                self._crosses_accel_key = key
+        return self._crosses_accel
+
     def _get_crosses(self, p0, p1):
-        Point_to_Point2D = self.rfcontext.Point_to_Point2D
         dist = self.rfcontext.drawing.scale(options['knife snap dist'])
         crosses = set()
         touched = set()
@@ -566,9 +570,9 @@ class Knife(RFTool):
         p0v = self.rfcontext.accel_nearest2D_vert(point=p0, max_dist=options['knife snap dist'])[0]
         if p0v and not p0v.link_edges:
             add(p0, p0v)
-        for e in self.vis_edges:
+        for (e, c0, c1) in self._get_crosses_accel(dist).query_segment(p0, p1, dist):
+            if not e.is_valid: continue
             v0, v1 = e.verts
-            c0, c1 = Point_to_Point2D(v0.co), Point_to_Point2D(v1.co)
             i = intersect2d_segment_segment(p0, p1, c0, c1)
             clc0 = closest2d_point_segment(c0, p0, p1)
             clc1 = closest2d_point_segment(c1, p0, p1)
@@ -312,6 +312,28 @@ class Loops(RFTool):
         self.set_next_state()
         tag_redraw_all('Loops mouse stop')
 
+    def _get_hover_loop(self, edge):
+        # face loop through edge and its oriented edge coords, cached until edge or target changes
+        key = (edge, self.rfcontext.get_target_version(selection=False))
+        if getattr(self, '_hover_loop_key', None) == key: return self._hover_loop
+        edges,edge_loop = self.rfcontext.get_face_loop(edge)
+        edges_,c0,c1 = None,None,None
+        if edges:
+            vp0,vp1 = edges[0].verts
+            cp0,cp1 = vp0.co,vp1.co
+            def get(ep,ec):
+                nonlocal cp0, cp1
+                vc0,vc1 = ec.verts
+                cc0,cc1 = vc0.co,vc1.co
+                if (cp1-cp0).dot(cc1-cc0) < 0: cc0,cc1 = cc1,cc0
+                cp0,cp1 = cc0,cc1
+                return (ec,cc0,cc1)
+            edges_ = [get(e0,e1) for e0,e1 in zip([edges[0]] + edges,edges)]
+            c0,c1 = next(((c0,c1) for e,c0,c1 in edges_ if e == edge), (None,None))
+        self._hover_loop_key = key
+        self._hover_loop = (edges, edge_loop, edges_, c0, c1)
+        return self._hover_loop
+
     @profiler.function
     def set_next_state(self):
         if self.actions.mouse is None: return
@@ -324,22 +346,11 @@ class Loops(RFTool):
 
         if not self.nearest_edge: return
 
-        self.edges,self.edge_loop = self.rfcontext.get_face_loop(self.nearest_edge)
-        if not self.edges:
+        edges,self.edge_loop,edges_,c0,c1 = self._get_hover_loop(self.nearest_edge)
+        if not edges:
             # nearest, but no loop
             return
-        vp0,vp1 = self.edges[0].verts
-        cp0,cp1 = vp0.co,vp1.co
-        def get(ep,ec):
-            nonlocal cp0, cp1
-            vc0,vc1 = ec.verts
-            cc0,cc1 = vc0.co,vc1.co
-            if (cp1-cp0).dot(cc1-cc0) < 0: cc0,cc1 = cc1,cc0
-            cp0,cp1 = cc0,cc1
-            return (ec,cc0,cc1)
-        edge0 = self.edges[0]
-        self.edges_ = [get(e0,e1) for e0,e1 in zip([self.edges[0]] + self.edges,self.edges)]
-        c0,c1 = next(((c0,c1) for e,c0,c1 in self.edges_ if e == self.nearest_edge), (None,None))
+        self.edges,self.edges_ = edges,edges_
         if c0 is None or c1 is None:
             # nearest_edge isn't in list?
             self.edges = None
@@ -22,6 +22,7 @@ Created by Jonathan Denning, Jonathan Williamson, and Patrick Moore
 import os
 import math
 from itertools import chain
+from time import perf_counter
 
 import bgl
 
@@ -36,6 +37,7 @@ from ...addon_common.common.drawing import (
     CC_2D_TRIANGLES, CC_2D_TRIANGLE_FAN,
 )
 from ...addon_common.common.profiler import profiler
+from ...addon_common.common.debug import dprint
 from ...addon_common.common.maths import (
     Point, Vec, Direction,
     Point2D, Vec2D,
@@ -75,6 +77,12 @@ class Patches(RFTool):
         self.crosses = None
         self._var_angle = BoundInt('''options['patches angle']''', min_value=0, max_value=180)
         self._var_crosses = BoundInt('''self.var_crosses''', min_value=1, max_value=500)
+        self._components_target = None
+        self._components_version = None
+        self._components = []
+        self._component_cache = {}
+        self._bridge_cache = {}
+        self.recompute_stats = None
 
     @RFTool.on_reset
     def reset(self):
@@ -408,23 +416,193 @@ class Patches(RFTool):
             'L':    [],
             'I':    [],
             'else': [],
-            'corners': [],
+            'corners': set(),
         }
         self.previz = []
 
+    def _get_components(self):
+        '''
+        splits selected boundary edges into connected components.
+        cached by target version, so only components touched since last recompute get new keys.
+        '''
+        rftarget = self.rfcontext.rftarget
+        version = self.rfcontext.get_target_version(selection=True)
+        if self._components_target is rftarget and self._components_version == version:
+            return self._components
+
+        edges = set(e for e in self.rfcontext.get_selected_edges() if len(e.link_faces) < 2)
+        components = []
+        remaining = set(edges)
+        while remaining:
+            comp_edges, comp_verts = set(), set()
+            working = { remaining.pop() }
+            while working:
+                edge = working.pop()
+                comp_edges.add(edge)
+                for v in edge.verts:
+                    if v in comp_verts: continue
+                    comp_verts.add(v)
+                    for e in v.link_edges:
+                        if e not in remaining: continue
+                        remaining.remove(e)
+                        working.add(e)
+            # key includes vert positions, because shapes and previz depend on them
+            key = (frozenset(comp_edges), frozenset((v, tuple(v.co)) for v in comp_verts))
+            components.append((comp_edges, comp_verts, key))
+
+        self._components_target = rftarget
+        self._components_version = version
+        self._components = components
+        return components
+
     def _recompute(self):
+        time_start = perf_counter()
         min_angle = options['patches angle']
-        def nearest_sources_Point(p):
-            p,n,i,d = self.rfcontext.nearest_sources_Point(p)
-            return self.rfcontext.clamp_point_to_symmetry(p)
+        mirror_mod = self.rfcontext.rftarget.mirror_mod
+        mirror_key = (mirror_mod.x, mirror_mod.y, mirror_mod.z, mirror_mod.symmetry_threshold)
 
         self._clear_shapes()
         # remove old corners that are no longer valid or selected
         self.corners = {v:corner for (v, corner) in self.corners.items() if v.is_valid and v.select}
 
         ##############################################
-        # find edges that could be part of a strip
-        edges = set(e for e in self.rfcontext.get_selected_edges() if len(e.link_faces) < 2)
+        # find shapes of each connected component of boundary edges,
+        # reusing results of components that have not changed
+        components = self._get_components()
+        component_cache = {}
+        recomputed = 0
+        previz = { 'rect': [], 'L': [], 'C': [] }
+        for (comp_edges, comp_verts, key) in components:
+            corners = frozenset((v, self.corners[v]) for v in comp_verts if v in self.corners)
+            key = (key, corners, min_angle, mirror_key)
+            data = self._component_cache.get(key, None)
+            if not data:
+                data = self._compute_component(comp_edges, min_angle)
+                recomputed += 1
+            component_cache[key] = data
+            for k,v in data['shapes'].items():
+                if k == 'corners': self.shapes[k] |= v
+                else: self.shapes[k].extend(v)
+            for k,v in data['previz'].items(): previz[k].extend(v)
+        self._component_cache = component_cache
+        self.previz = previz['rect'] + previz['L'] + previz['C']
+
+        ###################
+        # bridge I strips (can span components)
+
+        def nearest_sources_Point(p):
+            p,n,i,d = self.rfcontext.nearest_sources_Point(p)
+            return self.rfcontext.clamp_point_to_symmetry(p)
+
+        # TODO: check sides to make sure that we aren't creating geometry
+        #       on a side that already has geometry!
+        bridge_cache = {}
+        for i0,shape0 in enumerate(self.shapes['I']):
+            sv0 = self._get_strip_verts(shape0[0])
+            dir0 = Direction(sv0[0].co-sv0[-1].co)
+            best_sv1,best_dist = None,0
+            for i1,shape1 in enumerate(self.shapes['I']):
+                if i1 <= i0: continue
+                sv1 = self._get_strip_verts(shape1[0])
+                dir1 = Direction(sv1[0].co-sv1[-1].co)
+                if len(sv0) != len(sv1): continue
+                if dir0.dot(dir1) < 0:
+                    sv1 = list(reversed(sv1))
+                    dir1.reverse()
+                # make sure the I strip are good candidates for bridging
+                # if math.degrees(dir0.angleBetween(dir1)) > 80: continue     # make sure strips are parallel enough
+                if math.degrees(dir0.angleBetween(Direction(sv1[0].co-sv0[0].co))) < 45: continue
+                if math.degrees(dir1.angleBetween(Direction(sv0[0].co-sv1[0].co))) < 45: continue
+                dist = min((v0.co-v1.co).length for v0 in sv0 for v1 in sv1)
+                if best_sv1 and best_dist < dist: continue
+                best_sv1 = sv1
+                best_dist = dist
+            if not best_sv1: continue
+            sv1,dist = best_sv1,best_dist
+            avg0 = (sv0[0].co-sv0[-1].co).length / (len(sv0)-1)
+            avg1 = (sv1[0].co-sv1[-1].co).length / (len(sv1)-1)
+
+            l0 = len(sv0)
+            if getattr(self, 'crosses', None) is None:
+                self.crosses = max(2, math.floor(dist / max(avg0,avg1)))
+            l1 = self.crosses
+
+            key = (tuple(sv0), tuple(sv1), l1, mirror_key, tuple(tuple(v.co) for v in chain(sv0, sv1)))
+            verts = self._bridge_cache.get(key, None)
+            if verts is None:
+                verts = []
+                for i in range(l0):
+                    for j in range(l1):
+                        if   j == 0:    verts += [sv0[i]]
+                        elif j == l1-1: verts += [sv1[i]]
+                        else:
+                            pi,pj = i / (l0-1), j / (l1-1)
+                            l,r = sv0[i].co,sv1[i].co
+                            lr = Vec(l)*(1-pj) + Vec(r)*pj
+                            verts += [nearest_sources_Point(lr)]
+            bridge_cache[key] = verts
+            edges,faces = [],[]
+            edges += [(i*l1+(j+0), i*l1+(j+1)) for i in range(l0) for j in range(l1-1)]
+            edges += [((i+0)*l1+j, (i+1)*l1+j) for j in range(1,l1-1) for i in range(l0-1)]
+            faces += [( (i+0)*l1+(j+0), (i+1)*l1+(j+0), (i+1)*l1+(j+1), (i+0)*l1+(j+1) ) for i in range(l0-1) for j in range(l1-1)]
+
+            self.previz += [{ 'type': 'I', 'data': shape0, 'verts': verts, 'edges': edges, 'faces': faces }]
+        self._bridge_cache = bridge_cache
+
+        self.recompute_stats = {
+            'components': len(components),
+            'recomputed': recomputed,
+            'time':       perf_counter() - time_start,
+        }
+        dprint('Patches recompute: %d components (%d recomputed) in %0.4fs' % (
+            self.recompute_stats['components'],
+            self.recompute_stats['recomputed'],
+            self.recompute_stats['time'],
+        ))
+
+        if False:
+            print('')
+            print('patches info:')
+            print('  %d components (%d recomputed)' % (len(components), recomputed))
+            print('  %d corners' % len(self.shapes['corners']))
+            for d,k in [('loop','O'),('loop','eye'),('loop','tri'),('loop','rect'),('loop','ngon'),('string','I'),('string','L'),('string','C'),('string','else')]:
+                print('  %d %s-shaped %s' % (len(self.shapes[k]), k, d))
+
+        tag_redraw_all('Patches recompute')
+        self.update_ui()
+
+    @staticmethod
+    def _get_strip_verts(strip, rev=False):
+        if len(strip) == 1: return list(strip[0].verts)
+        bmvs = [strip[0].nonshared_vert(strip[1])]
+        bmvs += [e0.shared_vert(e1) for e0,e1 in zip(strip[:-1], strip[1:])]
+        bmvs += [strip[-1].nonshared_vert(strip[-2])]
+        if rev: bmvs.reverse()
+        return bmvs
+
+    @profiler.function
+    def _compute_component(self, edges, min_angle):
+        '''
+        finds strips, corners, and shapes of a single connected component of boundary edges,
+        and generates previz for rect, L, and C shapes (I shapes are bridged across components)
+        '''
+        def nearest_sources_Point(p):
+            p,n,i,d = self.rfcontext.nearest_sources_Point(p)
+            return self.rfcontext.clamp_point_to_symmetry(p)
+
+        shapes = {
+            'O':    [],     # special loop
+            'eye':  [],     # loops
+            'tri':  [],
+            'rect': [],
+            'ngon': [],
+            'C':    [],     # strings
+            'L':    [],
+            'I':    [],
+            'else': [],
+            'corners': set(),
+        }
+        previz = { 'rect': [], 'L': [], 'C': [] }
 
 
         ###################
@@ -486,7 +664,7 @@ class Patches(RFTool):
                     strip.append(next_edges[0])
                     remaining_edges.remove(next_edges[0])
                 if isbad: continue
-                self.shapes['O'].append(strip)
+                shapes['O'].append(strip)
                 continue
             strip = [end_edges[0]]
             remaining_edges = set(edges) - set(strip)
@@ -531,7 +709,7 @@ class Patches(RFTool):
         string_corners = set()
         loop_corners = set()
         strings_strips = list()
-        loops_strips = list(self.shapes['O'])
+        loops_strips = list(shapes['O'])
 
         # find strips
         while remaining_corners:
@@ -555,13 +733,13 @@ class Patches(RFTool):
             if ignore: continue
             strings_strips.append(string_strips)
             if len(string_strips) == 1:
-                self.shapes['I'].append(string_strips)
+                shapes['I'].append(string_strips)
             elif len(string_strips) == 2:
-                self.shapes['L'].append(string_strips)
+                shapes['L'].append(string_strips)
             elif len(string_strips) == 3:
-                self.shapes['C'].append(string_strips)
+                shapes['C'].append(string_strips)
             else:
-                self.shapes['else'].append(string_strips)
+                shapes['else'].append(string_strips)
 
         # find loops
         while remaining_corners:
@@ -589,29 +767,23 @@ class Patches(RFTool):
             if len(loop_strips) > 2 and shared_verts != 1: continue
             loops_strips.append(loop_strips)
             if len(loop_strips) == 2:
-                self.shapes['eye'].append(loop_strips)
+                shapes['eye'].append(loop_strips)
             elif len(loop_strips) == 3:
-                self.shapes['tri'].append(loop_strips)
+                shapes['tri'].append(loop_strips)
             elif len(loop_strips) == 4:
-                self.shapes['rect'].append(loop_strips)
+                shapes['rect'].append(loop_strips)
             else:
-                self.shapes['ngon'].append(loop_strips)
+                shapes['ngon'].append(loop_strips)
 
-        self.shapes['corners'] = (string_corners | loop_corners)
+        shapes['corners'] = (string_corners | loop_corners)
 
         ###################
         # generate previz
 
-        def get_verts(strip, rev=False):
-            if len(strip) == 1: return list(strip[0].verts)
-            bmvs = [strip[0].nonshared_vert(strip[1])]
-            bmvs += [e0.shared_vert(e1) for e0,e1 in zip(strip[:-1], strip[1:])]
-            bmvs += [strip[-1].nonshared_vert(strip[-2])]
-            if rev: bmvs.reverse()
-            return bmvs
+        get_verts = self._get_strip_verts
 
         # rect
-        for shape in self.shapes['rect']:
+        for shape in shapes['rect']:
             s0,s1,s2,s3 = shape
             if len(s0) != len(s2) or len(s1) != len(s3): continue   # invalid rect
             sv0,sv1,sv2,sv3 = get_verts(s0),get_verts(s1),get_verts(s2,True),get_verts(s3,True)
@@ -641,9 +813,9 @@ class Patches(RFTool):
             edges += [((i+0)*l1+j, (i+1)*l1+j) for j in range(1,l1-1) for i in range(l0-1)]
             faces += [( (i+0)*l1+(j+0), (i+1)*l1+(j+0), (i+1)*l1+(j+1), (i+0)*l1+(j+1) ) for i in range(l0-1) for j in range(l1-1)]
 
-            self.previz += [{ 'type': 'rect', 'data': shape, 'verts': verts, 'edges': edges, 'faces': faces }]
+            previz['rect'] += [{ 'type': 'rect', 'data': shape, 'verts': verts, 'edges': edges, 'faces': faces }]
 
-        for shape in self.shapes['L']:
+        for shape in shapes['L']:
             s0,s1 = shape
             sv0,sv1 = get_verts(s0),get_verts(s1)
             l0,l1 = len(sv0),len(sv1)
@@ -680,9 +852,9 @@ class Patches(RFTool):
             edges += [((i+0)*l1+j, (i+1)*l1+j) for j in range(1,l1) for i in range(l0-1)]
             faces += [( (i+0)*l1+(j+0), (i+1)*l1+(j+0), (i+1)*l1+(j+1), (i+0)*l1+(j+1) ) for i in range(l0-1) for j in range(l1-1)]
 
-            self.previz += [{ 'type': 'L', 'data': shape, 'verts': verts, 'edges': edges, 'faces': faces }]
+            previz['L'] += [{ 'type': 'L', 'data': shape, 'verts': verts, 'edges': edges, 'faces': faces }]
 
-        for shape in self.shapes['C']:
+        for shape in shapes['C']:
             s0,s1,s2 = shape
             if len(s0) != len(s2): continue     # invalid C-shape
             sv0,sv1,sv2 = get_verts(s0),get_verts(s1),get_verts(s2,True)
@@ -722,69 +894,6 @@ class Patches(RFTool):
             edges += [((i+0)*l1+j, (i+1)*l1+j) for j in range(1,l1-1) for i in range(l0-1)]
             faces += [( (i+0)*l1+(j+0), (i+1)*l1+(j+0), (i+1)*l1+(j+1), (i+0)*l1+(j+1) ) for i in range(l0-1) for j in range(l1-1)]
 
-            self.previz += [{ 'type': 'C', 'data': shape, 'verts': verts, 'edges': edges, 'faces': faces }]
-
-        # TODO: check sides to make sure that we aren't creating geometry
-        #       on a side that already has geometry!
-        for i0,shape0 in enumerate(self.shapes['I']):
-            sv0 = get_verts(shape0[0])
-            dir0 = Direction(sv0[0].co-sv0[-1].co)
-            best_sv1,best_dist = None,0
-            for i1,shape1 in enumerate(self.shapes['I']):
-                if i1 <= i0: continue
-                sv1 = get_verts(shape1[0])
-                dir1 = Direction(sv1[0].co-sv1[-1].co)
-                if len(sv0) != len(sv1): continue
-                if dir0.dot(dir1) < 0:
-                    sv1 = list(reversed(sv1))
-                    dir1.reverse()
-                # make sure the I strip are good candidates for bridging
-                # if math.degrees(dir0.angleBetween(dir1)) > 80: continue     # make sure strips are parallel enough
-                if math.degrees(dir0.angleBetween(Direction(sv1[0].co-sv0[0].co))) < 45: continue
-                if math.degrees(dir1.angleBetween(Direction(sv0[0].co-sv1[0].co))) < 45: continue
-                dist = min((v0.co-v1.co).length for v0 in sv0 for v1 in sv1)
-                if best_sv1 and best_dist < dist: continue
-                best_sv1 = sv1
-                best_dist = dist
-            if not best_sv1: continue
-            sv1,dist = best_sv1,best_dist
-            avg0 = (sv0[0].co-sv0[-1].co).length / (len(sv0)-1)
-            avg1 = (sv1[0].co-sv1[-1].co).length / (len(sv1)-1)
-
-            l0 = len(sv0)
-            if getattr(self, 'crosses', None) is None:
-                self.crosses = max(2, math.floor(dist / max(avg0,avg1)))
-            l1 = self.crosses
-
-            verts,edges,faces = [],[],[]
-            for i in range(l0):
-                for j in range(l1):
-                    if   j == 0:    verts += [sv0[i]]
-                    elif j == l1-1: verts += [sv1[i]]
-                    else:
-                        pi,pj = i / (l0-1), j / (l1-1)
-                        l,r = sv0[i].co,sv1[i].co
-                        lr = Vec(l)*(1-pj) + Vec(r)*pj
-                        verts += [nearest_sources_Point(lr)]
-            edges += [(i*l1+(j+0), i*l1+(j+1)) for i in range(l0) for j in range(l1-1)]
-            edges += [((i+0)*l1+j, (i+1)*l1+j) for j in range(1,l1-1) for i in range(l0-1)]
-            faces += [( (i+0)*l1+(j+0), (i+1)*l1+(j+0), (i+1)*l1+(j+1), (i+0)*l1+(j+1) ) for i in range(l0-1) for j in range(l1-1)]
-
-            self.previz += [{ 'type': 'I', 'data': shape0, 'verts': verts, 'edges': edges, 'faces': faces }]
-
+            previz['C'] += [{ 'type': 'C', 'data': shape, 'verts': verts, 'edges': edges, 'faces': faces }]
 
-        if False:
-            print('')
-            print('patches info:')
-            print('  %d edges' % len(edges))
-            print('  %d strips' % len(strips))
-            print('  %d corners' % len(corners))
-            print('  %d string corners' % len(string_corners))
-            print('  %d loop corners' % len(loop_corners))
-            print('  %d strings' % len(strings_strips))
-            print('  %d loops' % len(loops_strips))
-            for d,k in [('loop','O'),('loop','eye'),('loop','tri'),('loop','rect'),('loop','ngon'),('string','I'),('string','L'),('string','C'),('string','else')]:
-                print('  %d %s-shaped %s' % (len(self.shapes[k]), k, d))
-
-        tag_redraw_all('Patches recompute')
-        self.update_ui()
+        return { 'shapes': shapes, 'previz': previz }
@@ -39,9 +39,7 @@ from .polystrips_ops   import PolyStrips_Ops
 from .polystrips_props import PolyStrips_Props
 from .polystrips_utils import (
     RFTool_PolyStrips_Strip,
-    hash_face_pair,
-    crawl_strip,
-    is_boundaryvert, is_boundaryedge,
+    RFTool_PolyStrips_StripGraph,
     process_stroke_filter, process_stroke_source,
     process_stroke_get_next, process_stroke_get_marks,
     mark_info,
@@ -112,53 +110,15 @@ class PolyStrips(RFTool, PolyStrips_Props, PolyStrips_Ops):
         self.strips = []
         self._var_cut_count.disabled = True
 
+        if not hasattr(self, 'strip_graph'): self.strip_graph = RFTool_PolyStrips_StripGraph()
+        if force: self.strip_graph.invalidate(getattr(self, 'mod_strips', ()))
+
         # get selected quads
         bmquads = set(bmf for bmf in self.rfcontext.get_selected_faces() if len(bmf.verts) == 4)
         if not bmquads: return
 
-        # find junctions at corners
-        junctions = set()
-        for bmf in bmquads:
-            # skip if in middle of a selection
-            if not any(is_boundaryvert(bmv, bmquads) for bmv in bmf.verts): continue
-            # skip if in middle of possible strip
-            edge0,edge1,edge2,edge3 = [is_boundaryedge(bme, bmquads) for bme in bmf.edges]
-            if (edge0 or edge2) and not (edge1 or edge3): continue
-            if (edge1 or edge3) and not (edge0 or edge2): continue
-            junctions.add(bmf)
-
-        # find junctions that might be in middle of strip but are ends to other strips
-        boundaries = set((bme,bmf) for bmf in bmquads for bme in bmf.edges if is_boundaryedge(bme, bmquads))
-        while boundaries:
-            bme,bmf = boundaries.pop()
-            for bme_ in bmf.neighbor_edges(bme):
-                strip = crawl_strip(bmf, bme_, bmquads, junctions)
-                if strip is None: continue
-                junctions.add(strip[-1])
-
-        # find strips between junctions
-        touched = set()
-        for bmf0 in junctions:
-            bme0,bme1,bme2,bme3 = bmf0.edges
-            edge0,edge1,edge2,edge3 = [is_boundaryedge(bme, bmquads) for bme in bmf0.edges]
-
-            def add_strip(bme):
-                strip = crawl_strip(bmf0, bme, bmquads, junctions)
-                if not strip:
-                    return
-                bmf1 = strip[-1]
-                if len(strip) > 1 and hash_face_pair(bmf0, bmf1) not in touched:
-                    touched.add(hash_face_pair(bmf0,bmf1))
-                    touched.add(hash_face_pair(bmf1,bmf0))
-                    self.strips.append(RFTool_PolyStrips_Strip(strip))
-
-            if not edge0: add_strip(bme0)
-            if not edge1: add_strip(bme1)
-            if not edge2: add_strip(bme2)
-            if not edge3: add_strip(bme3)
-            if options['polystrips max strips'] and len(self.strips) > options['polystrips max strips']:
-                self.strips = []
-                break
+        # find strips between junctions, reusing strips whose faces were not touched
+        self.strips = list(self.strip_graph.update(bmquads, max_strips=options['polystrips max strips']))
 
         self.update_strip_viz()
         if len(self.strips) == 1:
@@ -63,6 +63,59 @@ def crawl_strip(bmf0, bme0_2, only_bmfs, stop_bmfs, touched=None):
     if next_part is None: return None
     return [bmf0] + next_part
 
+def find_strips(bmquads, max_strips=None):
+    '''
+    returns list of strips (lists of quads) running between junctions of the given quads.
+    returns empty list if more than max_strips were found
+    '''
+    strips = []
+    if not bmquads: return strips
+
+    # find junctions at corners
+    junctions = set()
+    for bmf in bmquads:
+        # skip if in middle of a selection
+        if not any(is_boundaryvert(bmv, bmquads) for bmv in bmf.verts): continue
+        # skip if in middle of possible strip
+        edge0,edge1,edge2,edge3 = [is_boundaryedge(bme, bmquads) for bme in bmf.edges]
+        if (edge0 or edge2) and not (edge1 or edge3): continue
+        if (edge1 or edge3) and not (edge0 or edge2): continue
+        junctions.add(bmf)
+
+    # find junctions that might be in middle of strip but are ends to other strips
+    boundaries = set((bme,bmf) for bmf in bmquads for bme in bmf.edges if is_boundaryedge(bme, bmquads))
+    while boundaries:
+        bme,bmf = boundaries.pop()
+        for bme_ in bmf.neighbor_edges(bme):
+            strip = crawl_strip(bmf, bme_, bmquads, junctions)
+            if strip is None: continue
+            junctions.add(strip[-1])
+
+    # find strips between junctions
+    touched = set()
+    for bmf0 in junctions:
+        bme0,bme1,bme2,bme3 = bmf0.edges
+        edge0,edge1,edge2,edge3 = [is_boundaryedge(bme, bmquads) for bme in bmf0.edges]
+
+        def add_strip(bme):
+            strip = crawl_strip(bmf0, bme, bmquads, junctions)
+            if not strip:
+                return
+            bmf1 = strip[-1]
+            if len(strip) > 1 and hash_face_pair(bmf0, bmf1) not in touched:
+                touched.add(hash_face_pair(bmf0,bmf1))
+                touched.add(hash_face_pair(bmf1,bmf0))
+                strips.append(strip)
+
+        if not edge0: add_strip(bme0)
+        if not edge1: add_strip(bme1)
+        if not edge2: add_strip(bme2)
+        if not edge3: add_strip(bme3)
+        if max_strips and len(strips) > max_strips:
+            return []
+
+    return strips
+
 def strip_centers(strip):
     return [bmf.center() for bmf in strip]
     pts = []
@@ -275,7 +328,7 @@ class RFTool_PolyStrips_Strip:
     def recompute_curve(self):
         pts = strip_centers(self.bmf_strip)
         self.curve = CubicBezier.create_from_points(pts)
-        self.curve.tessellate_uniform(lambda p,q:(p-q).length, split=50)
+        self.curve.tessellate_uniform(split=50)
 
     def capture_edges(self):
         self.bmes = []
@@ -293,7 +346,7 @@ class RFTool_PolyStrips_Strip:
             diffdir = halfdiff.normalized()
             center = bmvs[0].co + halfdiff
 
-            t = self.curve.approximate_t_at_point_tessellation(center, lambda p,q:(p-q).length)
+            t = self.curve.approximate_t_at_point_tessellation(center)
             pos,der = self.curve.eval(t),self.curve.eval_derivative(t).normalized()
 
             rad = halfdiff.length
@@ -305,7 +358,7 @@ class RFTool_PolyStrips_Strip:
             self.bmes += [(bme, t, rad, rot, off_cross, off_der, off_norm)]
 
     def update(self, nearest_sources_Point, raycast_sources_Point, update_face_normal):
-        self.curve.tessellate_uniform(lambda p,q:(p-q).length, split=50)
+        self.curve.tessellate_uniform(split=50)
         length = self.curve.approximate_totlength_tessellation()
         for bme,t,rad,rot,off_cross,off_der,off_norm in self.bmes:
             pos,norm,_,_ = raycast_sources_Point(self.curve.eval(t))
@@ -325,3 +378,57 @@ class RFTool_PolyStrips_Strip:
             if v1: bmv1.co_normal = (v1, n1)
         for bmf in self.bmf_strip:
             update_face_normal(bmf)
+
+
+class RFTool_PolyStrips_StripGraph:
+    '''
+    keeps strips (RFTool_PolyStrips_Strip) of selected quads across target changes.
+    when the selected quads and their geometry are unchanged, previous strips are returned as-is.
+    otherwise strips are found again (see find_strips), but a strip's Bezier curve and captured
+    edges are rebuilt only if one of its faces was touched (moved, reconnected, or (de)selected)
+    '''
+
+    def __init__(self):
+        self.bmquads = set()
+        self.signatures = {}
+        self.strips = []
+        self.face_strips = {}
+
+    @staticmethod
+    def face_signature(bmf):
+        # everything RFTool_PolyStrips_Strip reads from a face and its edges
+        return (
+            tuple(bmf.edges),
+            tuple(len(bme.link_faces) for bme in bmf.edges),
+            tuple(tuple(bmv.co) for bmv in bmf.verts),
+            tuple(bmf.normal),
+        )
+
+    def invalidate(self, strips):
+        # strips whose curves were edited directly must be rebuilt
+        strips = set(strips)
+        self.strips = [strip for strip in self.strips if strip not in strips]
+        self.bmquads = None
+
+    def strips_of_face(self, bmf):
+        return self.face_strips.get(bmf, [])
+
+    def update(self, bmquads, max_strips=None):
+        signatures = {bmf: self.face_signature(bmf) for bmf in bmquads}
+        if bmquads == self.bmquads and signatures == self.signatures:
+            return self.strips
+
+        prev = {tuple(strip.bmf_strip): strip for strip in self.strips}
+        touched = {bmf for (bmf, sig) in signatures.items() if self.signatures.get(bmf, None) != sig}
+        strips = []
+        for bmf_strip in find_strips(bmquads, max_strips=max_strips):
+            strip = prev.get(tuple(bmf_strip), None)
+            if not strip or any(bmf in touched for bmf in bmf_strip):
+                strip = RFTool_PolyStrips_Strip(bmf_strip)
+            strips.append(strip)
+
+        self.bmquads, self.signatures, self.strips = set(bmquads), signatures, strips
+        self.face_strips = {}
+        for strip in strips:
+            for bmf in strip: self.face_strips.setdefault(bmf, []).append(strip)
+        return strips
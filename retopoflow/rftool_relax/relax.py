@@ -24,6 +24,7 @@ import time
 from ..rftool import RFTool
 from ..rfwidgets.rfwidget_default import RFWidget_Default_Factory
 from ..rfwidgets.rfwidget_brushfalloff import RFWidget_BrushFalloff_Factory
+from .relax_utils import RelaxSolver
 
 from ...addon_common.common.maths import (
     Vec, Vec2D,
@@ -224,7 +225,7 @@ class Relax(RFTool):
         is_visible = lambda bmv: self.rfcontext.is_visible(bmv.co, bmv.normal, occlusion_test_override=True)
 
         self._bmverts = []
-        self._boundary = []
+        self._boundary = None
         for bmv in self.rfcontext.iter_verts():
             if self.sel_only and not bmv.select: continue
             if opt_mask_boundary == 'exclude' and bmv.is_on_boundary(): continue
@@ -235,8 +236,8 @@ class Relax(RFTool):
             self._bmverts.append(bmv)
 
         if opt_mask_boundary == 'slide':
-            # find all boundary edges
-            self._boundary = [(bme.verts[0].co, bme.verts[1].co) for bme in self.rfcontext.iter_edges() if not bme.is_manifold]
+            # boundary as it is before relaxing
+            self._boundary = self.rfcontext.get_boundary_accel()
 
         # print(f'Relaxing max of {len(self._bmverts)} bmverts')
         self.rfcontext.split_target_visualization(verts=self._bmverts)
@@ -276,19 +277,7 @@ class Relax(RFTool):
         if not verts or not edges: return
         vert_strength = vert_strength or {}
 
-        # gather options
-        opt_mask_boundary   = options['relax mask boundary']
-        opt_mask_symmetry   = options['relax mask symmetry']
-        # opt_mask_occluded   = options['relax mask hidden']
-        # opt_mask_selected   = options['relax mask selected']
-        opt_steps           = options['relax steps']
-        opt_edge_length     = options['relax edge length']
-        opt_face_radius     = options['relax face radius']
-        opt_face_sides      = options['relax face sides']
-        opt_face_angles     = options['relax face angles']
-        opt_correct_flipped = options['relax correct flipped faces']
-        opt_straight_edges  = options['relax straight edges']
-        opt_mult            = options['relax force multiplier']
+        opt_steps = options['relax steps']
 
         cur_time = time.time()
         time_delta = cur_time - self._time
@@ -296,153 +285,16 @@ class Relax(RFTool):
         strength = (5.0 / opt_steps) * self.rfwidgets['brushstroke'].strength * time_delta
         radius = self.rfwidgets['brushstroke'].get_scaled_radius()
 
-        # capture all verts involved in relaxing
-        chk_verts = set(verts)
-        chk_verts.update(self.rfcontext.get_edges_verts(edges))
-        chk_verts.update(self.rfcontext.get_faces_verts(faces))
-        chk_edges = self.rfcontext.get_verts_link_edges(chk_verts)
-        chk_faces = self.rfcontext.get_verts_link_faces(chk_verts)
-
-        displace = {}
-        def reset_forces():
-            nonlocal displace
-            displace.clear()
-        def add_force(bmv, f):
-            nonlocal displace, verts, vert_strength
-            if bmv not in verts or bmv not in vert_strength: return
-            cur = displace[bmv] if bmv in displace else Vec((0,0,0))
-            displace[bmv] = cur + f
-
-        def relax_2d():
-            pass
-
-        def relax_3d():
-            reset_forces()
-
-            # compute average edge length
-            avg_edge_len = sum(bme.calc_length() for bme in edges) / len(edges)
-
-            # push edges closer to average edge length
-            if opt_edge_length:
-                for bme in chk_edges:
-                    if bme not in edges: continue
-                    bmv0,bmv1 = bme.verts
-                    vec = bme.vector()
-                    edge_len = vec.length
-                    f = vec * (0.1 * (avg_edge_len - edge_len) * strength) #/ edge_len
-                    add_force(bmv0, -f)
-                    add_force(bmv1, +f)
-
-            # push verts if neighboring faces seem flipped (still WiP!)
-            if opt_correct_flipped:
-                bmf_flipped = { bmf for bmf in chk_faces if bmf.is_flipped() }
-                for bmf in bmf_flipped:
-                    # find a non-flipped neighboring face
-                    for bme in bmf.edges:
-                        bmfs = set(bme.link_faces)
-                        bmfs.discard(bmf)
-                        if len(bmfs) != 1: continue
-                        bmf_other = next(iter(bmfs))
-                        if bmf_other not in chk_faces: continue
-                        if bmf_other in bmf_flipped: continue
-                        # pull edge toward bmf_other center
-                        bmf_other_center = bmf_other.center()
-                        bme_center = bme.calc_center()
-                        vec = bmf_other_center - bme_center
-                        bmv0,bmv1 = bme.verts
-                        add_force(bmv0, vec * strength * 5)
-                        add_force(bmv1, vec * strength * 5)
-
-            # push verts to straighten edges (still WiP!)
-            if opt_straight_edges:
-                for bmv in chk_verts:
-                    if bmv.is_boundary: continue
-                    bmes = bmv.link_edges
-                    #if len(bmes) != 4: continue
-                    center = Point.average(bme.other_vert(bmv).co for bme in bmes)
-                    add_force(bmv, (center - bmv.co) * 0.1)
-
-            # attempt to "square" up the faces
-            for bmf in chk_faces:
-                if bmf not in faces: continue
-                bmvs = bmf.verts
-                cnt = len(bmvs)
-                ctr = Point.average(bmv.co for bmv in bmvs)
-                rels = [bmv.co - ctr for bmv in bmvs]
-
-                # push verts toward average dist from verts to face center
-                if opt_face_radius:
-                    avg_rel_len = sum(rel.length for rel in rels) / cnt
-                    for rel, bmv in zip(rels, bmvs):
-                        rel_len = rel.length
-                        f = rel * ((avg_rel_len - rel_len) * strength * 2) #/ rel_len
-                        add_force(bmv, f)
-
-                # push verts toward equal edge lengths
-                if opt_face_sides:
-                    avg_face_edge_len = sum(bme.length for bme in bmf.edges) / cnt
-                    for bme in bmf.edges:
-                        bmv0, bmv1 = bme.verts
-                        vec = bme.vector()
-                        edge_len = vec.length
-                        f = vec * ((avg_face_edge_len - edge_len) * strength) / edge_len
-                        add_force(bmv0, f * -0.5)
-                        add_force(bmv1, f * 0.5)
-
-                # push verts toward equal spread
-                if opt_face_angles:
-                    avg_angle = 2.0 * math.pi / cnt
-                    for i0 in range(cnt):
-                        i1 = (i0 + 1) % cnt
-                        rel0,bmv0 = rels[i0],bmvs[i0]
-                        rel1,bmv1 = rels[i1],bmvs[i1]
-                        if rel0.length < 0.00001 or rel1.length < 0.00001: continue
-                        vec = bmv1.co - bmv0.co
-                        vec_len = vec.length
-                        fvec0 = rel0.cross(vec).cross(rel0).normalize()
-                        fvec1 = rel1.cross(rel1.cross(vec)).normalize()
-                        angle = rel0.angle(rel1)
-                        f_mag = (0.05 * (avg_angle - angle) * strength) / cnt #/ vec_len
-                        add_force(bmv0, fvec0 * -f_mag)
-                        add_force(bmv1, fvec1 * -f_mag)
-
-        # perform smoothing
-        for step in range(opt_steps):
-            if options['relax algorithm'] == '3D':
-                relax_3d()
-            elif options['relax algorithm'] == '2D':
-                relax_2d()
-
-            if len(displace) <= 1: continue
-
-            # compute max displacement length
-            displace_max = max(displace[bmv].length * (opt_mult * vert_strength[bmv]) for bmv in displace)
-            if displace_max > radius * 0.125:
-                # limit the displace_max
-                mult = radius * 0.125 / displace_max
-            else:
-                mult = 1.0
-
-            # update
-            for bmv in displace:
-                co = bmv.co + displace[bmv] * (opt_mult * vert_strength[bmv]) * mult
-
-                if opt_mask_symmetry == 'maintain' and bmv.is_on_symmetry_plane():
-                    snap_to_symmetry = self.rfcontext.symmetry_planes_for_point(bmv.co)
-                    co = self.rfcontext.snap_to_symmetry(co, snap_to_symmetry)
-
-                if opt_mask_boundary == 'slide' and bmv.is_on_boundary():
-                    p, d = None, None
-                    for (v0, v1) in self._boundary:
-                        p_ = closest_point_segment(co, v0, v1)
-                        d_ = (p_ - co).length
-                        if p is None or d_ < d: p, d = p_, d_
-                    if p is not None:
-                        co = p
-
-                bmv.co = co
-                self.rfcontext.snap_vert(bmv)
-            self.rfcontext.update_verts_faces(displace)
-        # print(f'relaxed {len(verts)} ({len(chk_verts)}) in {time.time() - st} with {strength}')
+        if options['relax algorithm'] != '3D':
+            # 2D relax is not implemented
+            return
+
+        solver = RelaxSolver(
+            self.rfcontext, verts, vert_strength, self._boundary,
+            radius=radius, strength=strength,
+        )
+        solver.solve()
+        solver.write_back()
+        # print(f'relaxed {len(verts)} in {time.time() - st} with {strength}')
 
         self.rfcontext.dirty()
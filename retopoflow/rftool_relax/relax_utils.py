@@ -0,0 +1,312 @@
+'''
+Copyright (C) 2022 CG Cookie
+http://cgcookie.com
+hello@cgcookie.com
+
+Created by Jonathan Denning, Jonathan Williamson, and Patrick Moore
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import math
+from itertools import chain
+
+import numpy as np
+
+from ...addon_common.common.maths import Point
+from ...addon_common.common.profiler import profiler
+from ...config.options import options
+
+
+def coords_array(bmvs):
+    # returns (n,3) array of local coords of bmverts
+    return np.fromiter(chain.from_iterable(bmv.co for bmv in bmvs), dtype=np.float64, count=3*len(bmvs)).reshape((-1, 3))
+
+def scatter_add(out, idx, vals):
+    # out[idx] += vals, accumulating repeated indices
+    n = len(out)
+    for i in range(3):
+        out[:,i] += np.bincount(idx, weights=vals[:,i], minlength=n)
+
+def normalized(vecs):
+    lens = np.linalg.norm(vecs, axis=1)
+    lens[lens == 0] = 1
+    return vecs / lens[:,None]
+
+class RelaxSolver:
+    '''
+    vectorized version of the 3D relax algorithm.  the region around the brushed verts
+    is extracted into NumPy arrays (world-space coords, CSR vert->neighbor and face->vert
+    adjacency, masks), forces are computed in vectorized passes for each step, and the
+    results are written back in bulk followed by a single snap to the sources.
+    '''
+
+    @profiler.function
+    def __init__(self, rfcontext, verts, vert_strength, boundary, *, radius, strength):
+        self.rfcontext = rfcontext
+        rftarget = rfcontext.rftarget
+        unwrap = rftarget._unwrap
+
+        self.opt_mask_boundary   = options['relax mask boundary']
+        self.opt_mask_symmetry   = options['relax mask symmetry']
+        self.opt_steps           = options['relax steps']
+        self.opt_edge_length     = options['relax edge length']
+        self.opt_face_radius     = options['relax face radius']
+        self.opt_face_sides      = options['relax face sides']
+        self.opt_face_angles     = options['relax face angles']
+        self.opt_correct_flipped = options['relax correct flipped faces']
+        self.opt_straight_edges  = options['relax straight edges']
+        self.opt_mult            = options['relax force multiplier']
+        self.radius = radius
+        self.strength = strength
+
+        # gather region: brushed verts, their edges and faces, and all verts needed to compute forces
+        self.rfverts = list(verts)
+        bmvs  = [unwrap(bmv) for bmv in self.rfverts]
+        bmes  = { bme for bmv in bmvs for bme in bmv.link_edges }
+        bmfs  = { bmf for bmv in bmvs for bmf in bmv.link_faces }
+        chk_bmvs = set(bmvs)
+        chk_bmvs.update(bmv for bme in bmes for bmv in bme.verts)
+        chk_bmvs.update(bmv for bmf in bmfs for bmv in bmf.verts)
+        chk_bmfs = { bmf for bmv in chk_bmvs for bmf in bmv.link_faces } if self.opt_correct_flipped else set()
+        all_bmvs = set(chk_bmvs)
+        if self.opt_straight_edges:
+            all_bmvs.update(bme.other_vert(bmv) for bmv in chk_bmvs for bme in bmv.link_edges)
+        if self.opt_correct_flipped:
+            all_bmvs.update(bmv for bmf in chk_bmfs for bmv in bmf.verts)
+
+        # moving verts are first in arrays
+        all_bmvs.difference_update(bmvs)
+        self.bmvs = bmvs + list(all_bmvs)
+        index = { bmv:i for (i, bmv) in enumerate(self.bmvs) }
+        self.count = len(bmvs)
+
+        xform = rftarget.xform
+        self.mx  = np.array(xform.mx_p, dtype=np.float64)
+        self.imx = np.array(xform.imx_p, dtype=np.float64)
+        local = coords_array(self.bmvs)
+        self.co = local @ self.mx[:3,:3].T + self.mx[:3,3]
+
+        self.vstrength = np.zeros(len(self.bmvs))
+        self.vstrength[:self.count] = [vert_strength[rfv] for rfv in self.rfverts]
+
+        # edges of brushed verts
+        self.edges = np.array([(index[bme.verts[0]], index[bme.verts[1]]) for bme in bmes], dtype=np.int64).reshape((-1, 2))
+
+        # faces of brushed verts (CSR: corners of face i are face_verts[face_start[i]:face_start[i+1]])
+        self.face_verts, self.face_start, self.corner_face, self.corner_next = self._build_faces(bmfs, index)
+
+        # neighbors of non-boundary verts in chk_verts, for straightening edges
+        if self.opt_straight_edges:
+            owners, nbrs = [], []
+            for bmv in chk_bmvs:
+                if bmv.is_boundary: continue
+                i = index[bmv]
+                for bme in bmv.link_edges:
+                    owners.append(i)
+                    nbrs.append(index[bme.other_vert(bmv)])
+            self.nbr_owner = np.array(owners, dtype=np.int64)
+            self.nbr_vert  = np.array(nbrs, dtype=np.int64)
+            self.nbr_count = np.bincount(self.nbr_owner, minlength=len(self.bmvs))
+
+        # flipped faces and their neighbors across manifold edges
+        if self.opt_correct_flipped:
+            chk_bmfs = list(chk_bmfs)
+            findex = { bmf:i for (i, bmf) in enumerate(chk_bmfs) }
+            self.chk_face_verts, self.chk_face_start, self.chk_corner_face, self.chk_corner_next = self._build_faces(chk_bmfs, index)
+            prev = np.empty_like(self.chk_corner_next)
+            prev[self.chk_corner_next] = np.arange(len(prev))
+            self.chk_corner_prev = prev
+            self.normals_local = np.array([tuple(bmv.normal) for bmv in self.bmvs], dtype=np.float64).reshape((-1, 3))
+            flips = []
+            for bmf in chk_bmfs:
+                for bme in bmf.edges:
+                    others = [o for o in bme.link_faces if o != bmf]
+                    if len(others) != 1 or others[0] not in findex: continue
+                    flips.append((findex[bmf], index[bme.verts[0]], index[bme.verts[1]], findex[others[0]]))
+            self.flips = np.array(flips, dtype=np.int64).reshape((-1, 4))
+
+        # masks for post-processing moved verts
+        self.moved = np.zeros(self.count, dtype=bool)
+        self.on_boundary = np.zeros(self.count, dtype=bool)
+        self.boundary = boundary    # Accel3DSegments
+        if self.opt_mask_boundary == 'slide' and boundary:
+            self.on_boundary[:] = [rfv.is_on_boundary() for rfv in self.rfverts]
+        mm = rftarget.mirror_mod
+        self.symmetry = [mm.x, mm.y, mm.z]
+        self.symmetry_threshold = mm.symmetry_threshold * rftarget.unit_scaling_factor / 2.0
+
+    @staticmethod
+    def _build_faces(bmfs, index):
+        counts = [len(bmf.verts) for bmf in bmfs]
+        face_verts = np.array([index[bmv] for bmf in bmfs for bmv in bmf.verts], dtype=np.int64)
+        face_start = np.zeros(len(counts) + 1, dtype=np.int64)
+        face_start[1:] = np.cumsum(counts)
+        corner_face = np.repeat(np.arange(len(counts)), counts)
+        corner_next = np.arange(len(face_verts)) + 1
+        corner_next[face_start[1:] - 1] = face_start[:-1]
+        return (face_verts, face_start, corner_face, corner_next)
+
+    def _face_centers(self, face_verts, face_start, corner_face):
+        nfaces = len(face_start) - 1
+        counts = np.diff(face_start)
+        centers = np.zeros((nfaces, 3))
+        scatter_add(centers, corner_face, self.co[face_verts])
+        return centers / counts[:,None], counts
+
+    def _forces(self):
+        co = self.co
+        strength = self.strength
+        displace = np.zeros_like(co)
+        touched = np.zeros(len(co), dtype=bool)
+        def add(idx, f):
+            scatter_add(displace, idx, f)
+            touched[idx] = True
+
+        # push edges closer to average edge length
+        if self.opt_edge_length and len(self.edges):
+            v0, v1 = self.edges[:,0], self.edges[:,1]
+            vec = co[v1] - co[v0]
+            lens = np.linalg.norm(vec, axis=1)
+            avg_edge_len = lens.mean()
+            f = vec * (0.1 * (avg_edge_len - lens) * strength)[:,None]
+            add(v0, -f)
+            add(v1, +f)
+
+        # push verts if neighboring faces seem flipped
+        if self.opt_correct_flipped and len(self.flips):
+            fv, fc = self.chk_face_verts, self.chk_corner_face
+            local = co @ self.imx[:3,:3].T + self.imx[:3,3]
+            p0 = local[fv[self.chk_corner_prev[self.chk_corner_prev]]]
+            p1 = local[fv[self.chk_corner_prev]]
+            p2 = local[fv]
+            fn = np.zeros((len(self.chk_face_start) - 1, 3))
+            scatter_add(fn, fc, np.cross(p0 - p1, p2 - p1))
+            flipped = np.zeros(len(fn), dtype=bool)
+            np.logical_or.at(flipped, fc, np.einsum('ij,ij->i', self.normals_local[fv], fn[fc]) <= 0)
+            centers,_ = self._face_centers(fv, self.chk_face_start, fc)
+            sel = flipped[self.flips[:,0]] & ~flipped[self.flips[:,3]]
+            if sel.any():
+                _, v0, v1, g = self.flips[sel].T
+                vec = (centers[g] - (co[v0] + co[v1]) / 2) * (strength * 5)
+                add(v0, vec)
+                add(v1, vec)
+
+        # push verts to straighten edges
+        if self.opt_straight_edges and len(self.nbr_owner):
+            sums = np.zeros_like(co)
+            scatter_add(sums, self.nbr_owner, co[self.nbr_vert])
+            has = self.nbr_count > 0
+            idx = np.nonzero(has)[0]
+            centers = sums[idx] / self.nbr_count[idx][:,None]
+            add(idx, (centers - co[idx]) * 0.1)
+
+        # attempt to "square" up the faces
+        if len(self.face_verts) and (self.opt_face_radius or self.opt_face_sides or self.opt_face_angles):
+            fv, fc, fnext = self.face_verts, self.corner_face, self.corner_next
+            centers, counts = self._face_centers(fv, self.face_start, fc)
+            cnt = counts[fc]
+            rels = co[fv] - centers[fc]
+            rel_lens = np.linalg.norm(rels, axis=1)
+
+            # push verts toward average dist from verts to face center
+            if self.opt_face_radius:
+                avg_rel_len = np.bincount(fc, weights=rel_lens) / counts
+                add(fv, rels * ((avg_rel_len[fc] - rel_lens) * strength * 2)[:,None])
+
+            # push verts toward equal edge lengths
+            if self.opt_face_sides:
+                v0, v1 = fv, fv[fnext]
+                vec = co[v1] - co[v0]
+                lens = np.linalg.norm(vec, axis=1)
+                avg_face_edge_len = np.bincount(fc, weights=lens) / counts
+                safe = np.where(lens > 0, lens, 1)
+                f = vec * (((avg_face_edge_len[fc] - lens) * strength) / safe)[:,None]
+                f[lens == 0] = 0
+                add(v0, f * -0.5)
+                add(v1, f * 0.5)
+
+            # push verts toward equal spread
+            if self.opt_face_angles:
+                avg_angle = 2.0 * math.pi / cnt
+                rel0, rel1 = rels, rels[fnext]
+                len0, len1 = rel_lens, rel_lens[fnext]
+                ok = (len0 >= 0.00001) & (len1 >= 0.00001)
+                v0, v1 = fv[ok], fv[fnext][ok]
+                rel0, rel1, len0, len1 = rel0[ok], rel1[ok], len0[ok], len1[ok]
+                vec = co[v1] - co[v0]
+                fvec0 = normalized(np.cross(np.cross(rel0, vec), rel0))
+                fvec1 = normalized(np.cross(rel1, np.cross(rel1, vec)))
+                cos_angle = np.clip(np.einsum('ij,ij->i', rel0, rel1) / (len0 * len1), -1, 1)
+                angle = np.arccos(cos_angle)
+                f_mag = (0.05 * (avg_angle[ok] - angle) * strength) / cnt[ok]
+                add(v0, fvec0 * -f_mag[:,None])
+                add(v1, fvec1 * -f_mag[:,None])
+
+        # only brushed verts are moved
+        displace[self.count:] = 0
+        touched[self.count:] = False
+        return displace, touched
+
+    def _is_on_symmetry(self, co):
+        local = co @ self.imx[:3,:3].T + self.imx[:3,3]
+        on = np.zeros(len(co), dtype=bool)
+        for i in range(3):
+            if self.symmetry[i]: on |= np.abs(local[:,i]) <= self.symmetry_threshold
+        return on
+
+    @profiler.function
+    def solve(self):
+        rfcontext = self.rfcontext
+        count = self.count
+        mult_v = self.opt_mult * self.vstrength[:count]
+        for step in range(self.opt_steps):
+            displace, touched = self._forces()
+            touched = touched[:count]
+            if touched.sum() <= 1: continue
+
+            # limit the max displacement
+            d = displace[:count] * mult_v[:,None]
+            displace_max = np.linalg.norm(d[touched], axis=1).max()
+            if displace_max > self.radius * 0.125:
+                d *= self.radius * 0.125 / displace_max
+
+            co_prev = self.co[:count]
+            co = co_prev + d
+            co[~touched] = co_prev[~touched]
+
+            if self.opt_mask_symmetry == 'maintain' and any(self.symmetry):
+                for i in np.nonzero(touched & self._is_on_symmetry(co_prev))[0]:
+                    planes = rfcontext.symmetry_planes_for_point(Point(tuple(co_prev[i])))
+                    co[i] = tuple(rfcontext.snap_to_symmetry(Point(tuple(co[i])), planes))
+
+            if self.opt_mask_boundary == 'slide' and self.boundary:
+                for i in np.nonzero(touched & self.on_boundary)[0]:
+                    p, _ = self.boundary.closest(Point(tuple(co[i])))
+                    if p is not None: co[i] = tuple(p)
+
+            self.co[:count] = co
+            self.moved |= touched
+
+    @profiler.function
+    def write_back(self):
+        # write back moved verts, then snap them to sources in one pass
+        moved = self.moved
+        if not moved.any(): return []
+        rfverts = [rfv for (rfv, m) in zip(self.rfverts, moved) if m]
+        for rfv, co in zip(rfverts, self.co[:self.count][moved]):
+            rfv.co = Point(tuple(co))
+        self.rfcontext.snap_verts(rfverts)
+        self.rfcontext.update_verts_faces(rfverts)
+        return rfverts
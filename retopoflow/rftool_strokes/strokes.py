@@ -978,26 +978,8 @@ class Strokes(RFTool):
         # TODO: remove colocated faces
         if self.mousedown is None: return
         delta = Vec2D(self.actions.mouse - self.mousedown)
-        set2D_vert = self.rfcontext.set2D_vert
-        update_verts = []
         merge_dist = self.rfcontext.drawing.scale(options['strokes merge dist'])
-        for bmv,xy in self.bmverts:
-            if not xy: continue
-            xy_updated = xy + delta
-            for bmv1,xy1 in self.vis_bmverts:
-                if not xy1: continue
-                if bmv1 == bmv: continue
-                if not bmv1.is_valid: continue
-                d = (xy_updated - xy1).length
-                if (xy_updated - xy1).length > merge_dist:
-                    continue
-                bmv1.merge_robust(bmv)
-                self.rfcontext.select(bmv1)
-                update_verts += [bmv1]
-                break
-        if update_verts:
-            self.rfcontext.update_verts_faces(update_verts)
-            #self.set_next_state()
+        self.rfcontext.merge2D_snapped_verts(self.bmverts, self.vis_bmverts, delta, merge_dist)
 
     @FSM.on_state('move', 'enter')
     def move_enter(self):
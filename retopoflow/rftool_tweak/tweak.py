@@ -32,6 +32,7 @@ from ...addon_common.common.drawing import (
 
 from ...addon_common.common.boundvar import BoundBool, BoundInt, BoundFloat, BoundString
 from ...addon_common.common.profiler import profiler
+from ...addon_common.common.debug import dprint
 from ...addon_common.common.maths import Point, Point2D, Vec2D, Color, closest_point_segment
 from ...addon_common.common.fsm import FSM
 from ...addon_common.common.globals import Globals
@@ -220,10 +221,11 @@ class Tweak(RFTool):
         if opt_mask_selected == 'exclude': self.bmverts = [(bmv,sympl,p2d,s) for (bmv,sympl,p2d,s) in self.bmverts if not bmv.select]
         if opt_mask_selected == 'only':    self.bmverts = [(bmv,sympl,p2d,s) for (bmv,sympl,p2d,s) in self.bmverts if bmv.select]
 
-        if opt_mask_boundary == 'slide':
-            self._boundary = [(bme.verts[0].co, bme.verts[1].co) for bme in self.rfcontext.iter_edges() if not bme.is_manifold]
-        else:
-            self._boundary = []
+        # boundary as it is before moving
+        self._boundary = self.rfcontext.get_boundary_accel() if opt_mask_boundary == 'slide' else None
+
+        self._snap_hints = [None] * len(self.bmverts)
+        self.rfcontext.reset_snap_stats()
 
         self.bmfaces = set([f for bmv,_ in nearest for f in bmv.link_faces])
         self.mousedown = self.rfcontext.actions.mousedown
@@ -248,19 +250,24 @@ class Tweak(RFTool):
         opt_mask_boundary = options['tweak mask boundary']
 
         delta = Vec2D(self.rfcontext.actions.mouse - self.mousedown)
-        set2D_vert = self.rfcontext.set2D_vert
+        snap_to_symmetry = self.rfcontext.snap_to_symmetry
         update_face_normal = self.rfcontext.update_face_normal
 
-        for bmv,sympl,xy,strength in self.bmverts:
-            co = set2D_vert(bmv, xy + delta * strength, sympl)
-            if not co: co = bmv.co  # vert cannot move there
-
-            if opt_mask_boundary == 'slide' and bmv.is_on_boundary():
-                p, d = None, None
-                for (v0, v1) in self._boundary:
-                    p_ = closest_point_segment(co, v0, v1)
-                    d_ = (p_ - co).length
-                    if p is None or d_ < d: p, d = p_, d_
+        # raycast all verts at once, starting with faces hit in previous tick
+        xys = [xy + delta * strength for (_,_,xy,strength) in self.bmverts]
+        hits = self.rfcontext.raycast_sources_Point2D_batch(xys, self._snap_hints)
+
+        for (bmv,sympl,_,_),(xyz,norm,_,_) in zip(self.bmverts, hits):
+            if xyz is None:
+                co = bmv.co  # vert cannot move there
+            else:
+                if sympl: xyz = snap_to_symmetry(xyz, sympl)
+                bmv.co = xyz
+                bmv.normal = norm
+                co = xyz
+
+            if opt_mask_boundary == 'slide' and self._boundary and bmv.is_on_boundary():
+                p, _ = self._boundary.closest(co)
                 if p is not None:
                     bmv.co = p
                     self.rfcontext.snap_vert(bmv)
@@ -269,5 +276,7 @@ class Tweak(RFTool):
 
     @FSM.on_state('move', 'exit')
     def move_exit(self):
+        stats = self.rfcontext.snap_stats
+        dprint(f'Tweak raycasts: {stats["coherent"]} coherent, {stats["full"]} full, {stats["missed"]} missed')
         self.rfcontext.clear_split_target_visualization()
         self._timer.done()
@@ -0,0 +1,1252 @@
+#!/usr/bin/python3
+
+'''
+Copyright (C) 2022 CG Cookie
+http://cgcookie.com
+hello@cgcookie.com
+
+Created by Jonathan Denning, Jonathan Williamson
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Headless benchmark suite for RetopoFlow core geometry operations.
+
+Generates synthetic sources (grids, UV spheres, noisy scans) and targets,
+then times the operations that matter during a RetopoFlow session.  No
+display or 3D View is needed; a fixed orthographic projection stands in for
+the viewport.
+
+usage:
+    blender --background --factory-startup --python scripts/benchmark.py -- [options]
+
+options (after the `--`):
+    --output FILE       write results as JSON to FILE (default: print to stdout)
+    --sources LIST      comma-separated source face counts (default: 10000,100000,500000,2000000)
+    --targets LIST      comma-separated target face counts (default: 1000,10000,50000)
+    --kinds LIST        comma-separated source kinds: grid,sphere,scan (default: all)
+    --repeat N          number of repeats per timing; best and mean are reported (default: 3)
+    --queries N         number of random queries per nearest*/raycast timing (default: 1000)
+    --seed N            random seed (default: 0)
+    --verify            check accelerated nearest queries against brute force on jittered targets
+                        (and other optimized paths against their reference implementations)
+    --merge-verts N     visible vert count for the automerge lookup benchmark (default: 100000)
+    --stroke-samples N  sample count of stroke for the bezier fitting benchmark (default: 10000)
+
+Compare two runs with:
+    python3 scripts/benchmark.py --compare old.json new.json
+'''
+
+import os
+import re
+import sys
+import copy
+import json
+import math
+import time
+import random
+import argparse
+import itertools
+import importlib
+import importlib.util
+
+
+addon_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+addon_module_name = 'retopoflow_benchmark'
+
+default_sources = [10_000, 100_000, 500_000, 2_000_000]
+default_targets = [1_000, 10_000, 50_000]
+default_kinds   = ['grid', 'sphere', 'scan']
+
+region_size = (1920, 1080)
+
+
+#################################################################################################
+# argument handling
+
+def get_args():
+    argv = sys.argv[sys.argv.index('--')+1:] if '--' in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description='RetopoFlow headless benchmark suite')
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--sources', default=','.join(map(str, default_sources)))
+    parser.add_argument('--targets', default=','.join(map(str, default_targets)))
+    parser.add_argument('--kinds', default=','.join(default_kinds))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verify', action='store_true')
+    parser.add_argument('--merge-verts', type=int, default=100_000)
+    parser.add_argument('--stroke-samples', type=int, default=10_000)
+    parser.add_argument('--compare', nargs=2, default=None, metavar=('OLD', 'NEW'))
+    args = parser.parse_args(argv)
+    args.sources = [int(v) for v in args.sources.split(',') if v]
+    args.targets = [int(v) for v in args.targets.split(',') if v]
+    args.kinds   = [v.strip() for v in args.kinds.split(',') if v.strip()]
+    return args
+
+
+#################################################################################################
+# comparing results (does not need Blender)
+
+def compare(fn_old, fn_new):
+    old = json.load(open(fn_old, 'rt'))
+    new = json.load(open(fn_new, 'rt'))
+    flatten = lambda results: {
+        (r['source'], r.get('target', ''), r['name']): r['best']
+        for r in results['results']
+    }
+    old, new = flatten(old), flatten(new)
+    print(f'{"source":<20} {"target":<14} {"operation":<32} {"old":>10} {"new":>10} {"ratio":>8}')
+    for key in sorted(old.keys() & new.keys()):
+        o, n = old[key], new[key]
+        ratio = (n / o) if o else float('inf')
+        print(f'{key[0]:<20} {key[1]:<14} {key[2]:<32} {o:10.5f} {n:10.5f} {ratio:8.2f}')
+
+
+#################################################################################################
+# importing RetopoFlow
+
+def import_addon():
+    # import the add-on under a fixed name so relative imports work regardless of folder name
+    if addon_module_name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            addon_module_name,
+            os.path.join(addon_root, '__init__.py'),
+            submodule_search_locations=[addon_root],
+        )
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[addon_module_name] = module
+        spec.loader.exec_module(module)
+    imp = lambda path: importlib.import_module(f'{addon_module_name}.{path}')
+    return {
+        'rfmesh':    imp('retopoflow.rfmesh.rfmesh'),
+        'maths':     imp('addon_common.common.maths'),
+        'bezier':    imp('addon_common.common.bezier'),
+        'textmetrics': imp('addon_common.common.textmetrics'),
+        'undostack': imp('addon_common.common.undostack'),
+        'polystrips_utils': imp('retopoflow.rftool_polystrips.polystrips_utils'),
+    }
+
+
+#################################################################################################
+# timing
+
+class Timings:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+        self.checks = []
+        self.context = {}
+
+    def set_context(self, **kwargs):
+        self.context = kwargs
+
+    def time(self, name, fn, *, setup=None, count=1, repeat=None):
+        times = []
+        for _ in range(repeat or self.repeat):
+            if setup: setup()
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        result = dict(self.context)
+        result.update({
+            'name':  name,
+            'count': count,
+            'best':  min(times),
+            'mean':  sum(times) / len(times),
+            'times': times,
+        })
+        self.results.append(result)
+        print(f'  {name:<32} best {result["best"]:10.5f}s  mean {result["mean"]:10.5f}s')
+        return result
+
+    def check(self, name, count, mismatches):
+        result = dict(self.context)
+        result.update({'name': name, 'count': count, 'mismatches': mismatches})
+        self.checks.append(result)
+        print(f'  {name:<32} {"ok" if not mismatches else f"{mismatches} MISMATCHES"} ({count} queries)')
+
+
+#################################################################################################
+# synthetic geometry
+
+def clear_scene():
+    import bpy
+    for obj in list(bpy.data.objects):
+        bpy.data.objects.remove(obj, do_unlink=True)
+    for mesh in list(bpy.data.meshes):
+        bpy.data.meshes.remove(mesh)
+
+def object_from_bmesh(name, bme):
+    import bpy
+    mesh = bpy.data.meshes.new(name)
+    bme.to_mesh(mesh)
+    bme.free()
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    return obj
+
+def create_grid(name, faces, size=2.0, z=0.0):
+    import bmesh
+    from mathutils import Matrix
+    n = max(1, round(math.sqrt(faces)))
+    bme = bmesh.new()
+    bmesh.ops.create_grid(bme, x_segments=n, y_segments=n, size=size/2, matrix=Matrix.Translation((0, 0, z)))
+    return object_from_bmesh(name, bme)
+
+def create_uvsphere(faces, radius):
+    import bmesh
+    # UV sphere has u_segments * v_segments faces, with v = u / 2
+    u = max(4, round(math.sqrt(faces * 2)))
+    v = max(3, u // 2)
+    bme = bmesh.new()
+    try:
+        bmesh.ops.create_uvsphere(bme, u_segments=u, v_segments=v, radius=radius)
+    except TypeError:
+        # Blender < 3.0 uses diameter (which is actually the radius)
+        bmesh.ops.create_uvsphere(bme, u_segments=u, v_segments=v, diameter=radius)
+    return bme
+
+def create_sphere(name, faces, radius=1.0):
+    return object_from_bmesh(name, create_uvsphere(faces, radius))
+
+def create_scan(name, faces, radius=1.0, noise=0.01, seed=0):
+    # a "scan" is a UV sphere with per-vertex noise, roughly resembling photogrammetry / scan data
+    import bmesh
+    rng = random.Random(seed)
+    bme = create_uvsphere(faces, radius)
+    for bmv in bme.verts:
+        bmv.co += bmv.co.normalized() * rng.uniform(-noise, noise)
+    bmesh.ops.triangulate(bme, faces=list(bme.faces))
+    return object_from_bmesh(name, bme)
+
+def create_target(name, faces):
+    # target is a grid floating just above the source, similar to in-progress retopology
+    obj = create_grid(name, faces, size=1.5, z=1.01)
+    return obj
+
+creators = {
+    'grid':   create_grid,
+    'sphere': create_sphere,
+    'scan':   create_scan,
+}
+
+
+#################################################################################################
+# fake view (orthographic projection looking down -Z)
+
+class OrthoView:
+    def __init__(self, maths, size=region_size, extent=1.2):
+        self.maths = maths
+        self.w, self.h = size
+        self.scale = min(self.w, self.h) / (2 * extent)
+        self.forward = maths.Direction((0, 0, -1))
+
+    def Point_to_Point2D(self, p):
+        return self.maths.Point2D((self.w / 2 + p.x * self.scale, self.h / 2 + p.y * self.scale))
+
+    def Point2D_to_Ray(self, p2d):
+        x = (p2d.x - self.w / 2) / self.scale
+        y = (p2d.y - self.h / 2) / self.scale
+        return self.maths.Ray(self.maths.Point((x, y, 100)), self.forward, max_dist=1000)
+
+    def Point_to_Ray(self, p, max_dist_offset=0):
+        o = self.maths.Point((p.x, p.y, 100))
+        return self.maths.Ray(o, self.forward, max_dist=max(0, (o - p).length + max_dist_offset))
+
+    def is_visible(self, rfsources):
+        def is_visible(point, normal=None):
+            p2d = self.Point_to_Point2D(point)
+            if not (0 <= p2d.x <= self.w and 0 <= p2d.y <= self.h): return False
+            ray = self.Point_to_Ray(point, max_dist_offset=-0.001)
+            if normal and normal.dot(ray.d) >= 0: return False
+            return not any(rfs.raycast_hit(ray) for rfs in rfsources)
+        return is_visible
+
+
+#################################################################################################
+# benchmarks
+
+def random_points(maths, rng, count, extent=1.0):
+    return [
+        maths.Point((rng.uniform(-extent, extent), rng.uniform(-extent, extent), rng.uniform(-extent, extent)))
+        for _ in range(count)
+    ]
+
+def bench_source(mods, timings, args, obj, rng):
+    RFSource = mods['rfmesh'].RFSource
+    maths = mods['maths']
+    view = OrthoView(maths)
+
+    rfsource = None
+    def setup():
+        nonlocal rfsource
+        rfsource = RFSource.new(obj)
+    timings.time('RFSource setup', setup)
+
+    def rebuild_bvh():
+        rfsource.dirty()
+        rfsource.get_bvh()
+    timings.time('source BVH construction', rebuild_bvh)
+
+    points = random_points(maths, rng, args.queries, extent=1.2)
+    timings.time('source nearest', lambda: [rfsource.nearest(p) for p in points], count=len(points))
+    timings.time('source nearest_batch', lambda: rfsource.nearest_batch(points), count=len(points))
+    if args.verify:
+        mismatches = 0
+        for (p, (bp,bn,bi,bd)) in zip(points, rfsource.nearest_batch(points)):
+            hp,hn,hi,hd = rfsource.nearest(p)
+            if hi != bi or (hp - bp).length > 0.00001 or (hn - bn).length > 0.00001 or abs(hd - bd) > 0.00001: mismatches += 1
+        timings.check('verify nearest_batch', len(points), mismatches)
+
+    rays = [view.Point2D_to_Ray(view.Point_to_Point2D(p)) for p in points]
+    timings.time('source raycast', lambda: [rfsource.raycast(r) for r in rays], count=len(rays))
+
+    # coherent raycasts: rays shifted slightly from previous rays, starting with previously hit faces
+    hints = [rfsource.raycast(r)[2] for r in rays]
+    xys = [view.Point_to_Point2D(p) for p in points]
+    rays_shifted = [view.Point2D_to_Ray(xy + maths.Vec2D((0.5, 0.5))) for xy in xys]
+    timings.time('source raycast_hint', lambda: [rfsource.raycast_hint(r, i) for (r, i) in zip(rays_shifted, hints)], count=len(rays))
+
+    # contours cuts: planes through hit points, crawled with array slicing and with BMesh crawl
+    hits = [(r, rfsource.raycast(r)[0]) for r in rays[:max(1, args.queries // 10)]]
+    planes = [
+        (r, maths.Plane(p, maths.Vec((rng.uniform(-1, 1), rng.uniform(-1, 1), rng.uniform(-1, 1))).normalized()))
+        for (r, p) in hits if p is not None
+    ]
+    timings.time('source plane slicer build', rfsource.get_plane_slicer, setup=lambda: setattr(rfsource, 'plane_slicer', None))
+    timings.time('source plane_intersection_crawl', lambda: [rfsource.plane_intersection_crawl(r, pl, walk_to_plane=True) for (r, pl) in planes], count=len(planes))
+    rfsource.get_plane_slicer = lambda: None      # fall back to BMesh crawl
+    timings.time('source plane_intersection_crawl (bmesh)', lambda: [rfsource.plane_intersection_crawl(r, pl, walk_to_plane=True) for (r, pl) in planes], count=len(planes), repeat=1)
+    if args.verify:
+        expected = [rfsource.plane_intersection_crawl(r, pl, walk_to_plane=True) for (r, pl) in planes]
+        del rfsource.get_plane_slicer
+        found = [rfsource.plane_intersection_crawl(r, pl, walk_to_plane=True) for (r, pl) in planes]
+        same = lambda crawl0, crawl1: len(crawl0) == len(crawl1) and all(
+            f00 == f10 and f01 == f11 and (c0 - c1).length < 0.00001
+            for ((f00, c0, f01), (f10, c1, f11)) in zip(crawl0, crawl1)
+        )
+        mismatches = sum(1 for (crawl0, crawl1) in zip(expected, found) if not same(crawl0, crawl1))
+        timings.check('verify plane_intersection_crawl', len(planes), mismatches)
+        # planes exactly through verts, crawled from every face around the vert: some faces cross
+        # the plane through the vert, others only touch it
+        slicer = rfsource.get_plane_slicer()
+        bmvs = rng.sample(list(rfsource.bme.verts), min(50, len(rfsource.bme.verts)))
+        mismatches, count = 0, 0
+        for bmv in bmvs:
+            plane = maths.Plane(maths.Point(bmv.co), maths.Vec((rng.uniform(-1, 1), rng.uniform(-1, 1), rng.uniform(-1, 1))).normalized())
+            plane_slice = slicer.slice(plane)
+            for bmf in bmv.link_faces:
+                if not same(rfsource._crawl(bmf, plane), plane_slice.crawl(bmf.index)): mismatches += 1
+                count += 1
+        timings.check('verify plane slice through verts', count, mismatches)
+    else:
+        del rfsource.get_plane_slicer
+
+    return rfsource
+
+def bench_snap_layers(mods, timings, args, rng):
+    # coherent (hinted) raycasts of a drag across two overlapping sources: a grid layer floating over
+    # part of a sphere.  hints start on the sphere, so rays that move under the grid must not keep
+    # snapping to the occluded sphere.
+    # --verify compares batched raycasts against raycast_sources_Point2D
+    import bpy
+    RFSource, maths = mods['rfmesh'].RFSource, mods['maths']
+    RetopoFlow_Sources = importlib.import_module(f'{addon_module_name}.retopoflow.rf.rf_sources').RetopoFlow_Sources
+    view = OrthoView(maths)
+    clear_scene()
+    objs = [create_sphere('layer_sphere', 10_000), create_grid('layer_grid', 2_500, size=1.0, z=1.05)]
+    class BenchSources(RetopoFlow_Sources):
+        # stand-in for RetopoFlow context, enough for raycasting sources
+        def __init__(self, rfsources):
+            self.rfsources = rfsources
+            self.snap_sources = {}
+            self.Point2D_to_Ray = view.Point2D_to_Ray
+            self.reset_snap_stats()
+    sources = BenchSources([RFSource.new(obj) for obj in objs])
+
+    # drags from left of grid layer (only sphere below) to right, across both edges of grid
+    starts = [maths.Point((-0.9, rng.uniform(-0.6, 0.6), 0)) for _ in range(max(1, args.queries // 10))]
+    ticks = [[view.Point_to_Point2D(p + maths.Vec((0.02 * t, 0, 0))) for p in starts] for t in range(90)]
+    def drag():
+        hints = [None] * len(starts)
+        return [sources.raycast_sources_Point2D_batch(xys, hints) for xys in ticks]
+    timings.set_context(source='layers_sphere_grid')
+    timings.time('snap drag batch', drag, count=len(starts) * len(ticks))
+    timings.time('snap drag full', lambda: [[sources.raycast_sources_Point2D(xy) for xy in xys] for xys in ticks], count=len(starts) * len(ticks))
+    if args.verify:
+        mismatches = 0
+        for (xys, hits) in zip(ticks, drag()):
+            for (xy, (hp,_,hi,hd)) in zip(xys, hits):
+                bp,_,bi,bd = sources.raycast_sources_Point2D(xy)
+                if (hp is None) != (bp is None): mismatches += 1
+                elif hp is not None and ((hp - bp).length > 0.00001 or abs(hd - bd) > 0.00001): mismatches += 1
+        timings.check('verify snap drag batch', len(starts) * len(ticks), mismatches)
+    del sources
+    for obj in objs: bpy.data.objects.remove(obj, do_unlink=True)
+
+def bench_target(mods, timings, args, obj, rfsource, rng):
+    RFTarget = mods['rfmesh'].RFTarget
+    maths = mods['maths']
+    UndoStack = mods['undostack'].UndoStack
+    view = OrthoView(maths)
+
+    import bpy
+    bpy.context.view_layer.objects.active = obj
+    obj.select_set(True)
+
+    rftarget = None
+    def setup():
+        nonlocal rftarget
+        rftarget = RFTarget.new(obj, 1.0)
+    timings.time('RFTarget setup', setup)
+
+    def rebuild_bvh():
+        rftarget.dirty()
+        rftarget.get_bvh()
+    timings.time('target BVH construction', rebuild_bvh)
+
+    is_visible = view.is_visible([rfsource])
+    vis_verts = None
+    def visibility():
+        nonlocal vis_verts
+        vis_verts = rftarget.visible_verts(is_visible)
+    timings.time('target visibility', visibility, count=rftarget.get_vert_count())
+    vis_edges = rftarget.visible_edges(is_visible, verts=vis_verts)
+    vis_faces = rftarget.visible_faces(is_visible, verts=vis_verts)
+
+    timings.time(
+        'Accel2D build',
+        lambda: maths.Accel2D(vis_verts, vis_edges, vis_faces, view.Point_to_Point2D),
+        count=len(vis_verts) + len(vis_edges) + len(vis_faces),
+    )
+
+    # knife cut lines against 2D segment grid of projected visible edges
+    seg_items = [(e, view.Point_to_Point2D(e.verts[0].co), view.Point_to_Point2D(e.verts[1].co)) for e in vis_edges]
+    seg_dist = 5.0
+    seg_accel = None
+    def build_segments():
+        nonlocal seg_accel
+        seg_accel = maths.Accel2DSegments(seg_items, cell_min=seg_dist)
+    timings.time('Accel2DSegments build', build_segments, count=len(seg_items))
+    cuts = [
+        (view.Point_to_Point2D(p0), view.Point_to_Point2D(p1))
+        for (p0, p1) in zip(random_points(maths, rng, args.queries, extent=0.75), random_points(maths, rng, args.queries, extent=0.75))
+    ]
+    timings.time('Accel2DSegments query_segment', lambda: [seg_accel.query_segment(p0, p1, seg_dist) for (p0, p1) in cuts], count=len(cuts))
+    if args.verify: verify_segments(timings, maths, seg_accel, seg_items, cuts[:100], seg_dist)
+
+    points = random_points(maths, rng, max(1, args.queries // 10), extent=0.75)
+    for p in points: p.z = 1.01
+    radius = 0.05
+    timings.time('target nearest_bmverts_Point', lambda: [rftarget.nearest_bmverts_Point(p, radius) for p in points], count=len(points))
+    timings.time('target nearest_bmvert_Point',  lambda: [rftarget.nearest_bmvert_Point(p) for p in points], count=len(points))
+    timings.time('target nearest_bmedge_Point',  lambda: [rftarget.nearest_bmedge_Point(p) for p in points], count=len(points))
+    timings.time('target nearest_bmedges_Point', lambda: [rftarget.nearest_bmedges_Point(p, radius) for p in points], count=len(points))
+    timings.time('target nearest_bmface_Point',  lambda: [rftarget.nearest_bmface_Point(p) for p in points], count=len(points))
+    timings.time('target nearest_bmfaces_Point', lambda: [rftarget.nearest_bmfaces_Point(p, radius) for p in points], count=len(points))
+
+    boundary = None
+    def build_boundary():
+        nonlocal boundary
+        rftarget.dirty()
+        boundary = rftarget.get_boundary_accel()
+    timings.time('boundary accel build', build_boundary)
+    timings.time('boundary closest', lambda: [boundary.closest(p) for p in points], count=len(points))
+
+    xys = [view.Point_to_Point2D(p) for p in points]
+    timings.time(
+        'target nearest2D_bmvert_Point2D',
+        lambda: [rftarget.nearest2D_bmvert_Point2D(xy, view.Point_to_Point2D, verts=vis_verts) for xy in xys],
+        count=len(xys),
+    )
+
+    # undo push / pop, mirroring rf_undo (deepcopy of RFTarget on push, rewrap on restore)
+    state = {'rftarget': rftarget}
+    def create_state(action):
+        return {'rftarget': copy.deepcopy(state['rftarget'])}
+    def restore_state(s):
+        state['rftarget'] = s['rftarget']
+        state['rftarget'].rewrap()
+        state['rftarget'].dirty()
+    undostack = UndoStack(create_state, restore_state)
+    timings.time('undo push', lambda: undostack.push('benchmark'))
+    timings.time('undo pop', lambda: undostack.pop(), setup=lambda: undostack.push('benchmark'))
+    rftarget = state['rftarget']
+
+    bmedges = list(rftarget.bme.edges)[:args.queries]
+    def face_loops():
+        rftarget.dirty()
+        for bme in bmedges: rftarget.get_face_loop(bme)
+    timings.time('target get_face_loop', face_loops, count=len(bmedges))
+
+    # write back to Blender mesh (as is done every time target changes)
+    timings.time('target to_mesh write-back', rftarget.clean, setup=rftarget.dirty)
+
+    bench_polystrips(mods, timings, args, rftarget, rng)
+
+    if args.verify: verify_target(timings, rftarget, points, radius, rng)
+
+    return rftarget
+
+def bench_merge(mods, timings, args, rng):
+    # automerge lookup (Knife/PolyPen/Strokes mergeSnapped): moved verts against visible verts in screen space
+    maths = mods['maths']
+    w, h = region_size
+    merge_dist = 10.0
+    vis_xys = [maths.Point2D((rng.uniform(0, w), rng.uniform(0, h))) for _ in range(args.merge_verts)]
+    moved = [maths.Point2D((rng.uniform(0, w), rng.uniform(0, h))) for _ in range(min(100, args.queries))]
+    timings.set_context(source=f'merge_{args.merge_verts}', target=f'moved_{len(moved)}')
+
+    def brute():
+        return [
+            next((i for (i, xy1) in enumerate(vis_xys) if (xy - xy1).length <= merge_dist), None)
+            for xy in moved
+        ]
+    def accel():
+        grid = maths.Accel2DPoints(vis_xys, merge_dist)
+        return [next(iter(grid.indices_within(xy)), None) for xy in moved]
+    timings.time('merge lookup brute force', brute, count=len(moved), repeat=1)
+    timings.time('merge lookup Accel2DPoints', accel, count=len(moved))
+    if args.verify:
+        expected, found = brute(), accel()
+        timings.check('verify Accel2DPoints', len(moved), sum(1 for (a, b) in zip(expected, found) if a != b))
+
+def bench_bezier(mods, timings, args, rng):
+    # fitting, tessellating, and arc-length queries of a long noisy brush stroke (spiral)
+    bezier, maths = mods['bezier'], mods['maths']
+    n = args.stroke_samples
+    stroke = [
+        maths.Point((
+            math.cos(i / n * 6 * math.pi) * (1 + i / n) + rng.uniform(-0.002, 0.002),
+            math.sin(i / n * 6 * math.pi) * (1 + i / n) + rng.uniform(-0.002, 0.002),
+            i / n + rng.uniform(-0.002, 0.002),
+        ))
+        for i in range(n)
+    ]
+    timings.set_context(source=f'stroke_{n}')
+    max_error = 0.01
+
+    fit = lambda: bezier.CubicBezierSpline.create_from_points([stroke], max_error, min_count_split=3)
+    timings.time('bezier fit spline', fit)
+    spline = fit()
+    timings.time('bezier tessellate spline', lambda: spline.tessellate_uniform(split=50))
+    spline.tessellate_uniform(split=50)
+    totlength = spline.approximate_totlength_tessellation()
+    intervals = [totlength * i / 1000 for i in range(1000)]
+    timings.time('bezier ts at intervals', lambda: spline.approximate_ts_at_intervals_tessellation(intervals), count=len(intervals))
+    points = rng.sample(stroke, min(args.queries, n))
+    timings.time('bezier ts at points', lambda: spline.approximate_ts_at_points_tessellation(points), count=len(points))
+    timings.time('bezier uniform lengths', lambda: spline.approximate_lengths_uniform())
+
+    if not args.verify: return
+    # compare against per-axis pure Python fit and scalar evaluation
+    from mathutils import Vector
+    mismatches, count = 0, 0
+    for _ in range(20):
+        i0 = rng.randrange(0, n - 20)
+        pts = stroke[i0:i0 + rng.randrange(20, min(2000, n - i0))]
+        l_d = [0] + [(p0 - p1).length for (p0, p1) in zip(pts[:-1], pts[1:])]
+        l_ad = list(itertools.accumulate(l_d))
+        l_t = [ad / l_ad[-1] for ad in l_ad]
+        expected = list(zip(*[bezier.fit_cubicbezier([p[i] for p in pts], l_t)[1:] for i in range(3)]))
+        fitted = bezier.fit_cubicbezier_np(bezier.points_to_np(pts), l_t)[1].tolist()
+        count += 1
+        if any((Vector(p0) - Vector(p1)).length > 0.0001 for (p0, p1) in zip(expected, fitted)): mismatches += 1
+    for cb in spline.cbs:
+        for (t, p, _) in cb.get_tessellate_uniform(split=50):
+            count += 1
+            if (p - cb.eval(t)).length > 0.00001: mismatches += 1
+        split = 100
+        for interval in [cb.approximate_length_uniform(split=split) * i / 10 for i in range(10)]:
+            d, p, expected = 0, cb.eval(0), 1
+            for i in range(split):
+                q = cb.eval((i + 1) / split)
+                d += (p - q).length
+                if interval <= d:
+                    expected = (i + 1) / split
+                    break
+                p = q
+            count += 1
+            if abs(cb.approximate_t_at_interval_uniform(interval, split=split) - expected) > 1.0 / split + 0.000001: mismatches += 1
+    timings.check('verify bezier', count, mismatches)
+
+def bench_wraptext(mods, timings, args):
+    # wrapping paragraphs of bundled help docs at several widths.  --verify compares line breaks
+    # against previous implementation, which measured every candidate line as a whole
+    try:
+        drawing = importlib.import_module(f'{addon_module_name}.addon_common.common.drawing')
+        ui_utilities = importlib.import_module(f'{addon_module_name}.addon_common.common.ui_utilities')
+        drawing.Drawing.initialize()
+    except Exception as e:
+        print(f'  skipping text wrapping benchmark (could not initialize drawing: {e})')
+        return
+    Drawing = drawing.Globals.drawing
+    wraptext = ui_utilities.helper_wraptext.__wrapped__     # skip lru_cache
+    help_path = os.path.join(addon_root, 'help')
+    paragraphs = [
+        ' '.join(paragraph.split('\n')).strip()
+        for fn in sorted(os.listdir(help_path)) if fn.endswith('.md')
+        for paragraph in open(os.path.join(help_path, fn), 'rt').read().split('\n\n')
+    ]
+    paragraphs = [p for p in paragraphs if p]
+    widths = [100, 250, 400, 800]
+    timings.set_context(source=f'help_{len(paragraphs)}_paragraphs')
+
+    def reference(text, width, fontsize=12):
+        Drawing.set_font_size(fontsize, fontid=0, force=True)
+        tw = Drawing.get_text_width
+        text = re.sub(r' +', ' ', text)
+        cline,*ltext = text.split(' ')
+        nlines = []
+        for cword in ltext:
+            nline = f'{cline} {cword}'
+            if tw(nline) <= width: cline = nline
+            else: nlines,cline = nlines+[cline],cword
+        nlines += [cline]
+        return '\n'.join(nlines)
+
+    def clear_caches():
+        Drawing.text_metrics.clear()
+    def wrap_all(fn):
+        return [fn(text=p, width=w) for w in widths for p in paragraphs]
+    timings.time('wraptext previous', lambda: wrap_all(lambda text, width: reference(text, width)), setup=clear_caches, repeat=1)
+    timings.time('wraptext', lambda: wrap_all(wraptext), setup=clear_caches)
+    if not args.verify: return
+    expected, found = wrap_all(lambda text, width: reference(text, width)), wrap_all(wraptext)
+    timings.check('verify wraptext line breaks', len(expected), sum(1 for (a, b) in zip(expected, found) if a != b))
+
+def bench_textmetrics(mods, timings, args):
+    # stress test of bounded text metrics cache with 1M distinct strings (dynamic labels)
+    # and a small working set of glyphs and words that should stay cached
+    import tracemalloc
+    textmetrics = mods['textmetrics']
+    cache = textmetrics.TextMetricsCache()
+    compute = lambda: {'width': 0, 'width raw': 0.0, 'height': 0, 'line height': 0}
+    words = [f'word{i}' for i in range(1000)]
+    count = 1_000_000
+    timings.set_context(source=f'text_metrics_{count}')
+    tracemalloc.start()
+    memory = []
+    def stress():
+        for i in range(count):
+            cache.get(f'Verts: {i}', 12, 0, compute)
+            cache.get(words[i % len(words)], 12, 0, compute)
+            if i % 100_000 == 99_999: memory.append(tracemalloc.get_traced_memory()[0])
+    timings.time('text metrics 1M distinct strings', stress, count=count, repeat=1)
+    tracemalloc.stop()
+    print(f'  memory after each 100k strings (KiB): {", ".join(str(m // 1024) for m in memory)}')
+    stats = cache.stats()
+    print(f'  hits {stats["hits"]}, misses {stats["misses"]}, evictions {stats["evictions"]}, size {stats["size"]} / {stats["max size"]}')
+    if not args.verify: return
+    mismatches = 0
+    if stats['size'] > stats['max size']: mismatches += 1
+    if stats['tables']['word']['misses'] != len(words): mismatches += 1    # working set never evicted
+    if memory and max(memory[1:] or memory) > memory[0] * 1.1: mismatches += 1
+    timings.check('verify text metrics bounded', 3, mismatches)
+
+def bench_stylesheets(mods, timings, args):
+    # loading bundled stylesheets by parsing and building selector tries vs loading compiled stylesheets.
+    # --verify compares computed styles of freshly parsed and compiled stylings for a corpus of selectors
+    import tempfile
+    try:
+        ui_styling = importlib.import_module(f'{addon_module_name}.addon_common.common.ui_styling')
+    except Exception as e:
+        print(f'  skipping stylesheet benchmark (could not import ui_styling: {e})')
+        return
+    UI_Styling = ui_styling.UI_Styling
+    paths = [
+        os.path.join(addon_root, 'addon_common', 'common', 'config', 'ui_defaultstyles.css'),
+        os.path.join(addon_root, 'config', 'ui.css'),
+    ]
+    variables = dict(ui_styling.css_variables)
+    timings.set_context(source=f'stylesheets_{len(paths)}')
+
+    def load_all():
+        # each load starts from same variables, as a fresh start would
+        ui_styling.css_variables.clear()
+        ui_styling.css_variables.update(variables)
+        stylings = []
+        for (i, path) in enumerate(paths):
+            styling = UI_Styling.from_file(path, defaults=(i == 0))
+            styling.optimize()
+            stylings.append(styling)
+        return stylings
+
+    compiled_cache = UI_Styling.compiled_cache
+    compiled_cache_path = compiled_cache.path
+    with tempfile.TemporaryDirectory() as path_cache:
+        compiled_cache.path = None
+        timings.time('stylesheets parse', load_all)
+        compiled_cache.path = path_cache
+        load_all()
+        timings.time('stylesheets compiled', load_all)
+        if args.verify:
+            compiled_cache.path = None
+            fresh = load_all()
+            compiled_cache.path = path_cache
+            compiled = load_all()
+    compiled_cache.path = compiled_cache_path
+    if not args.verify: return
+
+    rng = random.Random(args.seed)
+    elements = sorted({
+        sel
+        for styling in fresh for rule in styling.rules for selector in rule.selectors
+        for sel in selector if sel not in {'>', '+', '~'}
+    })
+    pseudoclasses = ['', '', ':hover', ':active', ':focus', ':disabled', ':checked', ':hover:active']
+    corpus = [[e] for e in elements]
+    corpus += [
+        [rng.choice(elements) + rng.choice(pseudoclasses) for _ in range(rng.randint(2, 6))]
+        for _ in range(args.queries)
+    ]
+    def computed(stylings, selector):
+        decls = [d for styling in stylings for d in styling.get_decllist(selector)]
+        return sorted((k, str(v)) for (k, v) in UI_Styling._expand_declarations(decls).items())
+    def stripped(styling, selector):
+        return [str(rule) for rule in styling.get_matching_rules(selector, full_trie=False)]
+    mismatches = sum(1 for selector in corpus if computed(fresh, selector) != computed(compiled, selector))
+    mismatches += sum(
+        1
+        for selector in corpus for (a, b) in zip(fresh, compiled)
+        if stripped(a, selector) != stripped(b, selector)
+    )
+    timings.check('verify compiled stylesheets', len(corpus), mismatches)
+
+def bench_markdown(mods, timings, args):
+    # parsing bundled help docs vs loading parsed docs from disk cache.
+    # --verify compares cached parses with fresh parses
+    import tempfile
+    markdown = importlib.import_module(f'{addon_module_name}.addon_common.common.markdown')
+    diskcache = importlib.import_module(f'{addon_module_name}.addon_common.common.diskcache')
+    Markdown = markdown.Markdown
+    help_path = os.path.join(addon_root, 'help')
+    docs = {
+        fn: Markdown.preprocess(open(os.path.join(help_path, fn), 'rt').read())
+        for fn in sorted(os.listdir(help_path)) if fn.endswith('.md')
+    }
+    timings.set_context(source=f'help_{len(docs)}_docs')
+    timings.time('markdown parse', lambda: [Markdown.parse(mdown) for mdown in docs.values()])
+    with tempfile.TemporaryDirectory() as path_cache:
+        cache = diskcache.DiskCache('markdown')
+        cache.path = path_cache
+        filenames = {fn: cache.get_filename(fn, mdown) for (fn, mdown) in docs.items()}
+        for (fn, mdown) in docs.items(): cache.save(filenames[fn], Markdown.parse(mdown))
+        timings.time('markdown cached', lambda: [cache.load(filename) for filename in filenames.values()])
+        if not args.verify: return
+        mismatches = sum(1 for (fn, mdown) in docs.items() if cache.load(filenames[fn]) != Markdown.parse(mdown))
+    timings.check('verify markdown cache', len(docs), mismatches)
+
+    # revisiting a help page through frame-capture path (no f_globals or f_locals given, same as
+    # helpsystem_open) must reuse UI elements built on first visit
+    ui_core = import_ui()
+    if not ui_core: return
+    document = BenchDocument(ui_core.UI_Element)
+    ui_mdown = ui_core.UI_Element(tagName='div', parent=document.body)
+    BoundBool = importlib.import_module(f'{addon_module_name}.addon_common.common.boundvar').BoundBool
+    options = importlib.import_module(f'{addon_module_name}.config.options').options
+    def open_page(fn):
+        nonlocal BoundBool, options     # captured by set_markdown from this frame for html fragments of help pages
+        ui_mdown.set_markdown(mdown_path=fn)
+    mismatches = 0
+    for fn in ['welcome.md', 'warnings.md', 'general.md']:
+        open_page(fn)
+        first = list(ui_mdown.children)
+        open_page('table_of_contents.md')
+        open_page(fn)
+        if len(first) != len(ui_mdown.children) or any(a is not b for (a, b) in zip(first, ui_mdown.children)): mismatches += 1
+    timings.check('verify markdown subtree reuse', 3, mismatches)
+
+def import_ui():
+    # returns ui_core module, or None if ui could not be initialized
+    try:
+        drawing = importlib.import_module(f'{addon_module_name}.addon_common.common.drawing')
+        drawing.Drawing.initialize()
+        ui_core = importlib.import_module(f'{addon_module_name}.addon_common.common.ui_core')
+        ui_draw = importlib.import_module(f'{addon_module_name}.addon_common.common.ui_draw')
+        if not ui_draw.UI_Draw._stylesheet:
+            ui_draw.UI_Draw.load_stylesheet(os.path.join(addon_root, 'config', 'ui.css'))
+    except Exception as e:
+        print(f'  skipping (could not initialize ui: {e})')
+        return None
+    return ui_core
+
+class BenchDocument:
+    # stand-in for UI_Document, which needs a 3D View area.  enough for cleaning, layout, and building draw lists
+    defer_cleaning = False
+    ignore_hover_change = False
+    activeElement = None
+    def __init__(self, UI_Element):
+        self.body = UI_Element(tagName='body', document=self)
+    def update_callbacks(self, *args, **kwargs): pass
+    def removed_element(self, *args, **kwargs): pass
+
+def layout_ui(mods, body):
+    # same steps as UI_Document.force_clean, followed by positioning done in UI_Element.draw
+    Size2D, Point2D = mods['maths'].Size2D, mods['maths'].Point2D
+    w, h = region_size
+    size = Size2D(width=w, max_width=w, height=h, max_height=h)
+    body.clean()
+    for _ in range(2):
+        body._layout(fitting_size=size, fitting_pos=Point2D((0, h-1)), parent_size=size, nonstatic_elem=body, table_data={})
+        body.set_view_size(size)
+    body._setup_ltwh()
+
+def all_ui_elements(e):
+    yield e
+    for child in (e._children_all or []): yield from all_ui_elements(child)
+
+def bench_layout(mods, timings, args, rng):
+    # reflow after changing text of single leaves in a synthetic document of ~5k elements, compared
+    # with reflowing all ancestors of changed leaf (previous behavior).
+    # --verify compares position and size of every element with those after a full reflow
+    ui_core = import_ui()
+    if not ui_core: return
+    UI_Element = ui_core.UI_Element
+
+    document = BenchDocument(UI_Element)
+    body = document.body
+    leaves = []
+    for i in range(50):
+        section = UI_Element(tagName='div', classes='section', parent=body)
+        UI_Element(tagName='h2', innerText=f'Section {i}', parent=section)
+        for j in range(33):
+            row = UI_Element(tagName='div', classes='row', parent=section)
+            UI_Element(tagName='label', innerText=f'Value {i}.{j}', parent=row)
+            leaves.append(UI_Element(tagName='span', innerText='0.000', parent=row))
+
+    layout = lambda: layout_ui(mods, body)
+    all_elements = lambda: all_ui_elements(body)
+    def change_leaf(reflow_ancestors):
+        leaf = leaves[rng.randrange(len(leaves))]
+        # mix of changes that keep and that change size of leaf
+        leaf.innerText = f'{rng.random():.3f}' if rng.random() < 0.5 else f'{rng.random() * 10**rng.randrange(6):.3f}'
+        if reflow_ancestors:
+            e = leaf
+            while e:
+                e._dirtying_flow = True
+                e = e._parent
+
+    timings.set_context(source=f'document_{sum(1 for _ in all_elements())}_elements')
+    timings.time('layout document', layout, repeat=1)
+    nchanges = 100
+    for (name, reflow_ancestors) in [('layout leaf changes previous', True), ('layout leaf changes', False)]:
+        reflowed = 0
+        def changes():
+            nonlocal reflowed
+            for _ in range(nchanges):
+                change_leaf(reflow_ancestors)
+                start = time.time()
+                layout()
+                reflowed += sum(1 for e in all_elements() if e._clean_debugging.get('layout', 0) >= start)
+        timings.time(name, changes, count=nchanges, repeat=1)
+        print(f'    {reflowed / nchanges:.1f} elements reflowed per change')
+    if not args.verify: return
+
+    geometry = lambda: [(e._l, e._t, e._w, e._h) for e in all_elements()]
+    mismatches = 0
+    for _ in range(20):
+        change_leaf(False)
+        layout()
+        incremental = geometry()
+        for e in all_elements(): e._dirtying_flow = True
+        layout()
+        mismatches += sum(1 for (a, b) in zip(incremental, geometry()) if a != b)
+    timings.check('verify incremental layout', 20, mismatches)
+
+def bench_drawlist(mods, timings, args):
+    # building the batched draw list for a document of overlapping dialogs with scrolled contents.
+    # no GPU is needed: only the CPU-side draw list and vertex arrays are built.
+    # --verify checks every command is listed once, overlapping commands keep tree order, and that
+    # quads and text runs match the elements they were built from
+    ui_core = import_ui()
+    if not ui_core: return
+    UI_Element = ui_core.UI_Element
+    UI_DrawList = importlib.import_module(f'{addon_module_name}.addon_common.common.ui_drawlist').UI_DrawList
+
+    document = BenchDocument(UI_Element)
+    body = document.body
+    titles = []
+    for i in range(8):
+        dialog = UI_Element(tagName='dialog', classes='framed', style=f'position: absolute; left: {40 + i * 150}px; top: {20 + i * 60}px; width: 300px', parent=body)
+        titles.append(f'Dialog {i}')
+        UI_Element(tagName='h1', innerText=titles[-1], parent=dialog)
+        contents = UI_Element(tagName='div', style='overflow-y: scroll; height: 400px', parent=dialog)
+        for j in range(40):
+            UI_Element(tagName='button', innerText=f'Button {i}.{j}', parent=contents)
+            UI_Element(tagName='label', innerText=f'Label {i}.{j}', parent=contents)
+    layout_ui(mods, body)
+    w, h = region_size
+    view = (0, h - 1, w, h)
+
+    timings.set_context(source=f'document_{sum(1 for _ in all_ui_elements(body))}_elements')
+    drawlist = UI_DrawList.build(body, view)
+    timings.time('drawlist build', lambda: UI_DrawList.build(body, view))
+    timings.time('drawlist vertex arrays', lambda: [b.vertex_arrays() for b in drawlist.batches if b.kind == 'quads'])
+    nquads = sum(len(b.items) for b in drawlist.batches if b.kind == 'quads')
+    print(f'    {nquads} quads and {drawlist.count - nquads} text runs in {len(drawlist.batches)} batches')
+    if not args.verify: return
+
+    commands = sorted(
+        (order, idx, batch.kind, item, bounds)
+        for (idx, batch) in enumerate(drawlist.batches)
+        for (item, order, bounds) in zip(batch.items, batch.orders, batch.bounds)
+    )
+    mismatches = sum(1 for (i, command) in enumerate(commands) if command[0] != i)
+    # overlapping commands must be drawn in tree order
+    overlaps = lambda a, b: a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+    for (i, (_, idx0, _, _, bounds0)) in enumerate(commands):
+        for (_, idx1, _, _, bounds1) in commands[i+1:]:
+            if idx1 < idx0 and overlaps(bounds0, bounds1): mismatches += 1
+    # quads are boxes of elements and text runs are texts of leaves
+    boxes = {(e._l, e._t, e._w, e._h) for e in all_ui_elements(body)}
+    texts = {e._innerTextAsIs for e in all_ui_elements(body) if e._innerTextAsIs}
+    for (_, _, kind, item, _) in commands:
+        if kind == 'quads': mismatches += item[0] not in boxes
+        else:               mismatches += item[0] not in texts
+    drawn_texts = {item[0] for (_, _, kind, item, _) in commands if kind == 'text'}
+    mismatches += sum(1 for title in titles if title not in drawn_texts)
+    for batch in drawlist.batches:
+        if batch.kind != 'quads': continue
+        arrays = batch.vertex_arrays()
+        mismatches += sum(1 for values in arrays.values() if len(values) != 6 * len(batch.items))
+    timings.check('verify drawlist', len(commands), mismatches)
+
+def bench_hittest(mods, timings, args, rng):
+    # finding element under mouse in a document with a long scrolling list (like keymap editor), walking
+    # the tree (get_under_mouse) compared with using hit index.
+    # --verify compares both at random points for random scroll positions and after changing visibility
+    ui_core = import_ui()
+    if not ui_core: return
+    UI_Element = ui_core.UI_Element
+    UI_HitIndex = importlib.import_module(f'{addon_module_name}.addon_common.common.ui_hitindex').UI_HitIndex
+    Point2D = mods['maths'].Point2D
+
+    document = BenchDocument(UI_Element)
+    body = document.body
+    dialog = UI_Element(tagName='dialog', classes='framed', style='position: absolute; left: 100px; top: 40px; width: 600px', parent=body)
+    UI_Element(tagName='h1', innerText='Keymap', parent=dialog)
+    scroller = UI_Element(tagName='div', style='overflow-y: scroll; height: 800px', parent=dialog)
+    rows = []
+    for i in range(2000):
+        row = UI_Element(tagName='div', atomic=(i % 7 == 0), parent=scroller)
+        UI_Element(tagName='label', innerText=f'Action {i}', parent=row)
+        UI_Element(tagName='button', innerText=f'Key {i}', can_hover=(i % 5 != 0), parent=row)
+        rows.append(row)
+    popup = UI_Element(tagName='dialog', classes='framed', style='position: absolute; left: 400px; top: 300px; width: 300px', parent=body)
+    for i in range(20): UI_Element(tagName='button', innerText=f'Option {i}', parent=popup)
+    layout_ui(mods, body)
+
+    w, h = region_size
+    random_point = lambda: Point2D((rng.uniform(-10, w + 10), rng.uniform(-10, h + 10)))
+    points = [random_point() for _ in range(args.queries)]
+    timings.set_context(source=f'document_{sum(1 for _ in all_ui_elements(body))}_elements')
+    timings.time('hit index build', lambda: UI_HitIndex(body))
+    index = UI_HitIndex(body)
+    timings.time('hit test walk', lambda: [body.get_under_mouse(p) for p in points], count=len(points))
+    timings.time('hit test index', lambda: [index.get_under_mouse(p) for p in points], count=len(points))
+    if not args.verify: return
+
+    mismatches, count = 0, 0
+    def compare(index=None):
+        nonlocal mismatches, count
+        for _ in range(1000):
+            p = random_point()
+            if rng.random() < 0.5: p = Point2D((round(p.x), round(p.y)))     # on element boundaries
+            under = body.get_under_mouse(p)
+            if index: mismatches += index.get_under_mouse(p) is not under
+            mismatches += body.get_under_mouse_indexed(p) is not under
+            count += 1
+    body._hit_index = index
+    for _ in range(10):
+        scroller.scrollTop = rng.uniform(0, 100000)
+        row = rows[rng.randrange(len(rows))]
+        row.is_visible = not row._is_visible
+        mismatches += index.is_valid            # changing visibility must invalidate index
+        compare()                               # falls back to walking tree
+        layout_ui(mods, body)
+        body._hit_index = index = UI_HitIndex(body)
+        compare(index)
+    timings.check('verify hit index', count, mismatches)
+
+def bench_images(mods, timings, args):
+    # decoding all bundled png images with pure-Python reader (ext/png.py) vs zlib+NumPy decoder, and
+    # loading decoded images from disk cache.
+    # --verify compares pixels of both decoders for every bundled image, and of images loaded from disk cache
+    import tempfile
+    import numpy as np
+    png = importlib.import_module(f'{addon_module_name}.addon_common.ext.png')
+    pngdecode = importlib.import_module(f'{addon_module_name}.addon_common.common.pngdecode')
+    paths = [
+        os.path.join(addon_root, *folder, fn)
+        for folder in [('icons',), ('images',), ('help',), ('addon_common', 'common', 'images')]
+        if os.path.isdir(os.path.join(addon_root, *folder))
+        for fn in sorted(os.listdir(os.path.join(addon_root, *folder)))
+        if fn.endswith('.png')
+    ]
+    datas = [open(path, 'rb').read() for path in paths]
+    def decode_pypng(data):
+        w, h, rows, _ = png.Reader(bytes=data).asRGBA8()
+        return np.array([np.frombuffer(bytes(r), dtype=np.uint8) for r in rows], dtype=np.uint8).reshape(h, w, 4)
+    timings.set_context(source=f'images_{len(paths)}')
+    timings.time('png decode pypng', lambda: [decode_pypng(data) for data in datas], count=len(datas), repeat=1)
+    timings.time('png decode numpy', lambda: [pngdecode.decode_png(data) for data in datas], count=len(datas))
+
+    try:
+        ui_core = importlib.import_module(f'{addon_module_name}.addon_common.common.ui_core')
+    except Exception as e:
+        ui_core = None
+        print(f'  skipping disk cache (could not import ui_core: {e})')
+    with tempfile.TemporaryDirectory() as path_cache:
+        if ui_core:
+            path_prev, ui_core.image_diskcache.path = ui_core.image_diskcache.path, path_cache
+            try:
+                for path in paths: ui_core.load_image_png(path)
+                timings.time('png load cached', lambda: [ui_core.load_image_png(path) for path in paths], count=len(paths))
+                cached = [ui_core.load_image_png(path) for path in paths] if args.verify else None
+            finally:
+                ui_core.image_diskcache.path = path_prev
+        if not args.verify: return
+
+    mismatches = 0
+    for (i, data) in enumerate(datas):
+        expected = decode_pypng(data)
+        decoded = pngdecode.decode_png(data)
+        if decoded is None: print(f'    {os.path.basename(paths[i])}: not handled by decode_png')
+        elif not np.array_equal(decoded, expected): mismatches += 1
+        if cached and not np.array_equal(cached[i], expected): mismatches += 1
+    timings.check('verify png decode', len(datas), mismatches)
+
+def bench_preloader(mods, timings, args):
+    # preloading bundled icon set in background worker processes.
+    # --verify checks that every icon was preloaded and matches decode_png
+    import numpy as np
+    try:
+        ui_core = importlib.import_module(f'{addon_module_name}.addon_common.common.ui_core')
+        image_preloader = importlib.import_module(f'{addon_module_name}.addon_common.common.image_preloader')
+    except Exception as e:
+        print(f'  skipping (could not import image preloader: {e})')
+        return
+    pngdecode = importlib.import_module(f'{addon_module_name}.addon_common.common.pngdecode')
+    ImagePreloader = image_preloader.ImagePreloader
+    path_images = ImagePreloader.find_images([('icons',)])
+    def clear():
+        for path in path_images: ui_core.load_image._cache.pop(os.path.basename(path), None)
+    def preload():
+        ImagePreloader.start([('icons',)])
+        ImagePreloader.wait(timeout=120)
+    timings.set_context(source=f'icons_{len(path_images)}')
+    timings.time('preload icons', preload, setup=clear, count=len(path_images))
+    decoding = ImagePreloader.timings()
+    if decoding: print(f'    per image decode: max {max(decoding.values()):0.5f}s, total {sum(decoding.values()):0.5f}s')
+    if not args.verify: return
+
+    clear()
+    ImagePreloader.start([('icons',)])
+    mismatches = 0 if ImagePreloader.wait(timeout=120) else 1
+    done, total = ImagePreloader.progress()
+    mismatches += (done != total) + (total != len(path_images))
+    for path in path_images:
+        img = ui_core.load_image._cache.get(os.path.basename(path), None)
+        expected = pngdecode.decode_png(open(path, 'rb').read())
+        if img is None or expected is None or not np.array_equal(img, expected): mismatches += 1
+        if path not in ImagePreloader.timings(): mismatches += 1
+    timings.check('verify preloaded icons', len(path_images), mismatches)
+
+def bench_polystrips(mods, timings, args, rftarget, rng):
+    # PolyStrips strip detection on a cross-shaped selection of target quads (two crossing bands)
+    from mathutils import Vector
+    utils = mods['polystrips_utils']
+    rftarget.rewrap()
+    faces = [f for f in rftarget.get_faces() if len(f.verts) == 4]
+    band = lambda v: abs(v) < 0.1
+    bmquads = {f for f in faces if band(f.center().x) or band(f.center().y)}
+    if not bmquads: return
+
+    timings.time('polystrips full rebuild', lambda: utils.RFTool_PolyStrips_StripGraph().update(bmquads))
+    graph = utils.RFTool_PolyStrips_StripGraph()
+    graph.update(bmquads)
+    verts = list({v for f in bmquads for v in f.verts})
+    def move_few():
+        for v in rng.sample(verts, min(4, len(verts))): v.co = v.co + Vector((0, 0, 0.0001))
+    timings.time('polystrips incremental update', lambda: graph.update(bmquads), setup=move_few)
+
+    if not args.verify: return
+    def check(label):
+        found = graph.update(bmquads)
+        expected = utils.find_strips(bmquads)
+        mismatches = 0 if [list(s) for s in found] == expected else 1
+        for strip in found:
+            fresh = utils.RFTool_PolyStrips_Strip(list(strip))
+            if any((p0 - p1).length > 0.000001 for (p0, p1) in zip(strip.curve.points(), fresh.curve.points())):
+                mismatches += 1
+        timings.check(f'verify polystrips {label}', len(found) + 1, mismatches)
+    check('after moving few verts')
+    bmquads = bmquads - set(rng.sample(sorted(bmquads, key=lambda f: f.center().x), min(3, len(bmquads))))
+    check('after deselecting faces')
+
+def verify_segments(timings, maths, accel, items, cuts, dist):
+    # every segment that Knife._get_crosses would report must be among the query candidates
+    from mathutils.geometry import intersect_line_line_2d
+    closest = maths.closest2d_point_segment
+    mismatches = 0
+    for (p0, p1) in cuts:
+        found = {id(key) for (key, _, _) in accel.query_segment(p0, p1, dist)}
+        for (key, c0, c1) in items:
+            hit = (
+                (closest(c0, p0, p1) - c0).length <= dist or
+                (closest(c1, p0, p1) - c1).length <= dist or
+                (closest(p0, c0, c1) - p0).length <= dist or
+                (closest(p1, c0, c1) - p1).length <= dist or
+                intersect_line_line_2d(p0, p1, c0, c1) is not None
+            )
+            if hit and id(key) not in found: mismatches += 1
+    timings.check('verify Accel2DSegments', len(cuts) * len(items), mismatches)
+
+def verify_target(timings, rftarget, points, radius, rng):
+    # compares accelerated nearest queries against brute force.
+    # first moves a few verts (incremental index updates), then jitters all verts (full rebuild)
+    from mathutils import Vector
+    rftarget.rewrap()
+    verts = rftarget.get_verts()
+    jitter = lambda: Vector((rng.uniform(-0.01, 0.01), rng.uniform(-0.01, 0.01), rng.uniform(-0.01, 0.01)))
+
+    def brute(elems, fn_dist, point):
+        dists = [(elem, fn_dist(elem, point)) for elem in elems if elem.is_valid and not elem.hide]
+        return dists
+
+    def check(label):
+        bmverts = [bmv for bmv in rftarget.bme.verts if not bmv.hide]
+        vert_dist = lambda bmv, p: (rftarget.xform.l2w_point(bmv.co) - p).length
+        edge_dist = lambda bme, p: rftarget._dist_bmedge_Point(bme, p)[0]
+        face_dist = lambda bmf, p: rftarget._dist_bmface_Point(bmf, p)[0]
+        mismatches = 0
+        for p in points:
+            for (elems, fn_dist, fn_nearest, fn_range) in [
+                (bmverts,              vert_dist, rftarget.nearest_bmvert_Point, rftarget.nearest_bmverts_Point),
+                (rftarget.bme.edges,   edge_dist, rftarget.nearest_bmedge_Point, rftarget.nearest_bmedges_Point),
+                (rftarget.bme.faces,   face_dist, rftarget.nearest_bmface_Point, rftarget.nearest_bmfaces_Point),
+            ]:
+                dists = brute(elems, fn_dist, p)
+                _,d = fn_nearest(p)
+                if abs(min(d for (_, d) in dists) - d) > 0.000001: mismatches += 1
+                expected = {elem for (elem, d) in dists if d <= radius}
+                found = {rftarget._unwrap(elem) for (elem, _) in fn_range(p, radius)}
+                if expected != found: mismatches += 1
+        boundary = rftarget.get_boundary_accel()
+        for p in points:
+            _,d = boundary.closest(p)
+            _,d_ = boundary.closest_brute_force(p)
+            if (d is None) != (d_ is None) or (d is not None and abs(d - d_) > 0.000001): mismatches += 1
+        timings.check(f'verify {label}', len(points) * 7, mismatches)
+        # cached face loops (shared by member edges) against crawling from each edge
+        mismatches = 0
+        bmedges = rng.sample(list(rftarget.bme.edges), min(200, len(rftarget.bme.edges)))
+        for bme in bmedges:
+            edges,looped = rftarget.get_face_loop(bme)
+            expected = {rftarget._unwrap(e) for (e, _) in rftarget.iter_quadstrip(bme)}
+            if {rftarget._unwrap(e) for e in edges} != expected: mismatches += 1
+            if looped != rftarget.is_quadstrip_looped(bme): mismatches += 1
+        timings.check(f'verify face loops {label}', len(bmedges) * 2, mismatches)
+        # face loop records keyed by or crawling deleted edges are pruned once topology changes
+        dead = [e for (e, l) in rftarget.face_loops.items() if not e.is_valid or not all(le.is_valid for le in l.edges)]
+        timings.check(f'verify face loops pruned {label}', len(rftarget.face_loops), len(dead))
+
+    for v in rng.sample(verts, min(10, len(verts))): v.co = v.co + jitter()
+    rftarget.dirty()
+    check('after moving few verts')
+
+    for v in verts: v.co = v.co + jitter()
+    rftarget.dirty()
+    check('after moving all verts')
+
+    # automerge splices a moved vert into a far away vert, relinking its edges and faces without
+    # changing edge or face counts.  grids must not keep bins of relinked elements at old positions
+    far = lambda v0, v1: v0 is not v1 and not {bmv for bmf in v0.bmelem.link_faces for bmv in bmf.verts} & {bmv for bmf in v1.bmelem.link_faces for bmv in bmf.verts}
+    rftarget.nearest_bmedge_Point(points[0])
+    rftarget.nearest_bmface_Point(points[0])
+    for _ in range(10):
+        v0, v1 = rng.sample(verts, 2)
+        if not (v0.is_valid and v1.is_valid and far(v0, v1)): continue
+        v1.co = v1.co + jitter()
+        v0.merge(v1)
+        rftarget.dirty()
+    check('after merging verts')
+
+
+def run(args):
+    import bpy
+    mods = import_addon()
+    timings = Timings(args.repeat)
+    rng = random.Random(args.seed)
+
+    for kind in args.kinds:
+        creator = creators[kind]
+        for nsource in args.sources:
+            clear_scene()
+            src_name = f'{kind}_{nsource}'
+            print(f'source {src_name}')
+            src_obj = creator(src_name, nsource) if kind != 'scan' else creator(src_name, nsource, seed=args.seed)
+            timings.set_context(source=src_name, source_faces=len(src_obj.data.polygons))
+            rfsource = bench_source(mods, timings, args, src_obj, rng)
+            for ntarget in args.targets:
+                tar_name = f'target_{ntarget}'
+                print(f'  target {tar_name}')
+                tar_obj = create_target(tar_name, ntarget)
+                timings.set_context(
+                    source=src_name, source_faces=len(src_obj.data.polygons),
+                    target=tar_name, target_faces=len(tar_obj.data.polygons),
+                )
+                bench_target(mods, timings, args, tar_obj, rfsource, rng)
+                bpy.data.objects.remove(tar_obj, do_unlink=True)
+            del rfsource
+
+    bench_snap_layers(mods, timings, args, rng)
+    bench_merge(mods, timings, args, rng)
+    bench_bezier(mods, timings, args, rng)
+    bench_wraptext(mods, timings, args)
+    bench_textmetrics(mods, timings, args)
+    bench_stylesheets(mods, timings, args)
+    bench_markdown(mods, timings, args)
+    bench_layout(mods, timings, args, rng)
+    bench_drawlist(mods, timings, args)
+    bench_hittest(mods, timings, args, rng)
+    bench_images(mods, timings, args)
+    bench_preloader(mods, timings, args)
+
+    hive = json.load(open(os.path.join(addon_root, 'hive.json'), 'rt'))
+    return {
+        'retopoflow': hive['version'],
+        'blender':    bpy.app.version_string,
+        'python':     sys.version,
+        'date':       time.strftime('%Y-%m-%d %H:%M:%S'),
+        'args':       {k:v for (k,v) in vars(args).items() if k != 'compare'},
+        'results':    timings.results,
+        'checks':     timings.checks,
+    }
+
+
+if __name__ == '__main__':
+    args = get_args()
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+    results = run(args)
+    if args.output:
+        json.dump(results, open(args.output, 'wt'), indent=2)
+        print(f'wrote results to {args.output}')
+    else:
+        print(json.dumps(results, indent=2))
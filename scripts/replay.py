@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+
+'''
+Copyright (C) 2022 CG Cookie
+http://cgcookie.com
+hello@cgcookie.com
+
+Created by Jonathan Denning, Jonathan Williamson
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Replays actions recorded by RetopoFlow (enable `record actions` option) and
+reports per-step timings along with a checksum of the resulting target mesh.
+
+The recording stores the starting target mesh, view, and tool, so the blend file
+only needs to contain the same sources and target object that were used when recording.
+
+RetopoFlow requires a 3D View, so this must run in a windowed (not --background)
+Blender session.  The session runs unattended and quits when the replay is done.
+
+usage:
+    blender FILE.blend --python scripts/replay.py -- RECORDING.json [--report REPORT.json] [--keep-open]
+'''
+
+import os
+import sys
+import argparse
+
+import bpy
+
+
+def parse_args():
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    parser = argparse.ArgumentParser(prog='replay.py')
+    parser.add_argument('recording', help='recorded actions (RetopoFlow_record.json)')
+    parser.add_argument('--report', default=None, help='write replay report as JSON to file')
+    parser.add_argument('--keep-open', action='store_true', help='do not quit RetopoFlow and Blender when done')
+    return parser.parse_args(argv)
+
+def get_record_module():
+    for name, module in sys.modules.items():
+        if name.endswith('.retopoflow.rf.rf_record'): return module
+    return None
+
+def get_view3d():
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type != 'VIEW_3D': continue
+            for region in area.regions:
+                if region.type == 'WINDOW': return (window, area, region)
+    return (None, None, None)
+
+def start_replay(args):
+    rf_record = get_record_module()
+    if not rf_record:
+        print('replay.py: could not find RetopoFlow add-on.  is it installed and enabled?')
+        return None
+    window, area, region = get_view3d()
+    if not area:
+        print('replay.py: could not find a 3D View')
+        return None
+
+    rf_record.RetopoFlow_Record.replay_filename = os.path.abspath(args.recording)
+    rf_record.RetopoFlow_Record.replay_report_filename = os.path.abspath(args.report) if args.report else None
+    rf_record.RetopoFlow_Record.replay_quit = not args.keep_open
+
+    override = {'window': window, 'screen': window.screen, 'area': area, 'region': region}
+    if hasattr(bpy.context, 'temp_override'):
+        with bpy.context.temp_override(**override):
+            if bpy.context.mode != 'EDIT_MESH': bpy.ops.object.mode_set(mode='EDIT')
+            bpy.ops.cgcookie.retopoflow('INVOKE_DEFAULT')
+    else:
+        if bpy.context.mode != 'EDIT_MESH': bpy.ops.object.mode_set(override, mode='EDIT')
+        bpy.ops.cgcookie.retopoflow(override, 'INVOKE_DEFAULT')
+    return None
+
+if bpy.app.background:
+    print('replay.py: RetopoFlow cannot run in background mode.  run without --background')
+    sys.exit(1)
+
+# wait for Blender to finish setting up the window before starting RetopoFlow
+args = parse_args()
+bpy.app.timers.register(lambda: start_replay(args), first_interval=1.0)